@@ -1,14 +1,35 @@
+import argparse
+import bisect
 import asyncio
 import aiohttp
+import aiohttp.web
+import certifi
+import contextvars
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 import ccxt.async_support as ccxt
+import numpy as np
+import gzip
+import heapq
 import json
+import math
+import multiprocessing
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
 import time
+import zlib
 from decimal import Decimal, ROUND_DOWN
 import os
+import sys
 from datetime import datetime
+from enum import Enum
+from collections import deque, namedtuple
+from contextlib import AsyncExitStack, asynccontextmanager
 
 # Logging ayarları
 logging.basicConfig(
@@ -22,6 +43,2039 @@ ADMIN_CHAT_ID = os.getenv('ADMIN_CHAT_ID')  # Admin chat ID'si
 # Bu adresleri ENV değişkenlerinden veya güvenli bir yapılandırma dosyasından alın
 MEXC_WALLET_ADDRESS = os.getenv('MEXC_WALLET_ADDRESS', 'YOUR_MEXC_WALLET_ADDRESS_HERE')
 GATE_IO_WALLET_ADDRESS = os.getenv('GATE_IO_WALLET_ADDRESS', 'YOUR_GATE_IO_WALLET_ADDRESS_HERE')
+# Tarayıcı modunda izlenecek coinler (virgülle ayrılmış). Boş bırakılırsa iki borsada da
+# USDT paritesi olan tüm coinler kullanılır.
+SCAN_COINS = os.getenv('SCAN_COINS', '')
+# WebSocket akış motoru (STREAMING_ENABLED=true ile açılır). Uç noktalar, yerel bir test
+# sunucusuna yönlendirmek için ENV üzerinden değiştirilebilir.
+STREAMING_ENABLED = os.getenv('STREAMING_ENABLED', 'false').lower() == 'true'
+GATE_WS_URL = os.getenv('GATE_WS_URL', 'wss://api.gateio.ws/ws/v4/')
+MEXC_WS_URL = os.getenv('MEXC_WS_URL', 'wss://wbs.mexc.com/ws')
+# Borsa istemcilerinin paylaştığı HTTP bağlantı havuzu
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))  # Toplam eşzamanlı bağlantı
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_KEEPALIVE = int(os.getenv('HTTP_KEEPALIVE', '60'))  # Boştaki bağlantının açık tutulma süresi (saniye)
+HTTP_DNS_TTL = int(os.getenv('HTTP_DNS_TTL', '300'))  # DNS önbellek süresi (saniye)
+HTTP_PREWARM_CONNECTIONS = int(os.getenv('HTTP_PREWARM_CONNECTIONS', '2'))  # Emir sunucusu başına sıcak tutulan bağlantı
+# Hız sınırı kovasında yalnızca emir kuyruğunun harcayabileceği token (ccxt maliyet birimi, 1 = sıradan istek)
+RATE_LIMIT_ORDER_RESERVE = float(os.getenv('RATE_LIMIT_ORDER_RESERVE', '1'))
+# REST tarama modunda coin başına uyarlanır yoklama: borsa başına saniyede taramanın harcayabileceği istek
+# (toplu ticker ve derinlik için emir defteri istekleri) ve coin başına yoklama aralığı sınırları (saniye)
+ADAPTIVE_POLLING = os.getenv('ADAPTIVE_POLLING', 'true').lower() == 'true'
+POLL_BUDGET = float(os.getenv('POLL_BUDGET', '5'))
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '2'))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '300'))
+# Tarayıcının bölüneceği işçi süreç sayısı (0: tarama ana süreçte yapılır). Her işçi coin evreninin bir
+# dilimini kendi borsa istemcileriyle tarar; işlem ve Telegram ana süreçte kalır.
+SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', '0'))
+# Fırsatın fiyat görüntüsü bu süreden (saniye) eskiyse işlem başlatılmaz; fiyat yeniden çekilmez
+QUOTE_DEADLINE = float(os.getenv('QUOTE_DEADLINE', '3'))
+# Market verisi önbelleği: yeniden başlatmalarda load_markets indirmesini atlamak için
+MARKET_CACHE_DIR = os.getenv('MARKET_CACHE_DIR', '.cache')
+MARKET_CACHE_TTL = int(os.getenv('MARKET_CACHE_TTL', str(6 * 3600)))  # Saniye
+# Tick kaydı: görülen her ticker/defter görüntüsü sabit genişlikli segment dosyalarına eklenir
+TICK_RECORDING = os.getenv('TICK_RECORDING', 'false').lower() == 'true'
+TICK_DIR = os.getenv('TICK_DIR', 'ticks')
+TICK_DEPTH = int(os.getenv('TICK_DEPTH', '10'))  # Kayıt başına saklanan kademe sayısı
+TICK_SEGMENT_MB = int(os.getenv('TICK_SEGMENT_MB', '64'))  # Segment bu boyuta ulaşınca yenisi açılır
+# Aşama süresi metrikleri (Prometheus metin biçimi) için yerel HTTP uç noktası; METRICS_PORT=0 kapatır
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+# Benchmark sonuçlarının (sürüm başına JSON) saklandığı dizin
+BENCHMARK_DIR = os.getenv('BENCHMARK_DIR', 'benchmarks')
+# Çekim ücreti/ağ kayıtları: toplu yenileme aralığı ve kayıt başına geçerlilik süresi (saniye)
+FEE_REFRESH_INTERVAL = int(os.getenv('FEE_REFRESH_INTERVAL', '600'))
+FEE_REGISTRY_TTL = int(os.getenv('FEE_REGISTRY_TTL', '1800'))
+# Aynı anda yürütülebilecek ve sırada bekleyebilecek işlem sayıları
+MAX_CONCURRENT_TRADES = int(os.getenv('MAX_CONCURRENT_TRADES', '2'))
+MAX_QUEUED_TRADES = int(os.getenv('MAX_QUEUED_TRADES', '5'))
+# Kapanışta süren işlemlerin bitmesi için beklenecek en uzun süre (saniye); sonra iptal edilir
+SHUTDOWN_TRADE_TIMEOUT = float(os.getenv('SHUTDOWN_TRADE_TIMEOUT', '120'))
+# Envanter modu: iki borsada da coin ve USDT tutulur, alış/satış aynı anda yapılır
+INVENTORY_MODE = os.getenv('INVENTORY_MODE', 'false').lower() == 'true'
+INVENTORY_COINS = os.getenv('INVENTORY_COINS', '')  # Envanter tutulan coinler (virgülle ayrılmış)
+INVENTORY_MIN_SHARE = float(os.getenv('INVENTORY_MIN_SHARE', '0.25'))  # Bir borsadaki pay bunun altına düşünce dengelenir
+REBALANCE_INTERVAL = int(os.getenv('REBALANCE_INTERVAL', '300'))  # Saniye
+# Coin bazında zorunlu çekim ağı, örn. {"WHITE": "ERC20"}. Belirtilmeyen coinlerde en ucuz ortak ağ seçilir.
+WITHDRAW_NETWORKS = json.loads(os.getenv('WITHDRAW_NETWORKS', '{}'))
+USDT_NETWORK = os.getenv('USDT_NETWORK', 'TRC20')  # USDT'nin alış borsasına geri gönderileceği ağ
+
+# Gate.io ve MEXC'ye ek olarak taranacak ccxt borsaları, örn. "binance,okx" veya "kucoin:kucoin".
+# Kimlik bilgileri <AD>_API_KEY, <AD>_SECRET ve gerekiyorsa <AD>_PASSWORD ENV değişkenlerinden okunur.
+EXTRA_EXCHANGES = os.getenv('EXTRA_EXCHANGES', '')
+
+# Borsaların görünen adları (ek borsalar kayıt sırasında ccxt adıyla eklenir)
+EXCHANGE_NAMES = {'gate': 'Gate.io', 'mexc': 'MEXC'}
+
+
+class QuoteSnapshot(namedtuple('QuoteSnapshot', 'buy_exchange sell_exchange buy_price sell_price captured_at')):
+    """Fırsatın hesaplandığı en iyi alış (ask) / satış (bid) fiyatlarının değiştirilemez görüntüsü.
+    captured_at: fiyatların alınmaya başlandığı an (time.time(); süreçler arasında karşılaştırılabilir)"""
+    __slots__ = ()
+
+    def age(self):
+        return time.time() - self.captured_at
+
+
+def make_direction(buy_name, sell_name):
+    """Alış ve satış borsasından yön anahtarı üretir, örn. 'gate_to_mexc'"""
+    return f"{buy_name}_to_{sell_name}"
+
+
+def split_direction(direction):
+    """Yön anahtarını (alış borsası, satış borsası) çiftine ayırır"""
+    buy_name, sell_name = direction.split('_to_')
+    return buy_name, sell_name
+
+
+class MarketCache:
+    """load_markets sonuçlarını (market + currency) diskte gzip sıkıştırılmış JSON olarak saklar
+    (sadece veri: dizindeki bir dosya okunurken kod çalıştırılamaz)"""
+
+    def __init__(self, directory=MARKET_CACHE_DIR, ttl=MARKET_CACHE_TTL, read_only=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.read_only = read_only  # Tarama işçileri önbelleği sadece okur; yazan tek süreç koordinatördür
+
+    def path(self, exchange_id):
+        return os.path.join(self.directory, f"markets_{exchange_id}.json.gz")
+
+    def load(self, exchange_id):
+        """(markets, currencies, yaş_saniye) döndürür; önbellek yoksa veya okunamıyorsa None"""
+        try:
+            with open(self.path(exchange_id), 'rb') as f:
+                payload = json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"{exchange_id} market önbelleği okunamadı, yok sayılıyor: {e}")
+            return None
+        # Farklı ccxt sürümünün ürettiği market yapısına güvenilmez
+        if payload.get('ccxt_version') != ccxt.__version__:
+            return None
+        return payload['markets'], payload['currencies'], time.time() - payload['saved_at']
+
+    def save(self, exchange_id, markets, currencies):
+        """Önbelleği atomik olarak yazar: benzersiz adlı geçici dosya + rename (eşzamanlı yazanlar çakışmaz)"""
+        if self.read_only:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        payload = {
+            'ccxt_version': ccxt.__version__,
+            'saved_at': time.time(),
+            'markets': markets,
+            'currencies': currencies,
+        }
+        data = gzip.compress(json.dumps(payload, separators=(',', ':')).encode(), compresslevel=6)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f"markets_{exchange_id}.", suffix='.tmp',
+                                         delete=False) as f:
+            f.write(data)
+        try:
+            os.replace(f.name, self.path(exchange_id))
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+
+def tick_dtype(depth):
+    """Sabit genişlikli kayıt tipi: zaman, borsa/coin kimliği, türü ve depth kademe alış/satış fiyat-miktarı"""
+    return np.dtype([
+        ('ts', '<f8'),
+        ('exchange', 'u1'),
+        ('coin', '<u4'),
+        ('kind', 'u1'),  # 0: sadece en iyi fiyat (ticker), 1: emir defteri görüntüsü
+        ('bid_price', '<f8', (depth,)),
+        ('bid_amount', '<f4', (depth,)),
+        ('ask_price', '<f8', (depth,)),
+        ('ask_amount', '<f4', (depth,)),
+    ])
+
+
+class TickRecorder:
+    """Görülen her ticker ve defter görüntüsünü sabit genişlikli ikili segment dosyalarına ekler.
+    Kayıtlar bellekte tamponlanır, dolunca veya flush ile diske yazılır; segmentler boyuta göre döndürülür."""
+
+    TICKER, BOOK = 0, 1
+
+    def __init__(self, directory=TICK_DIR, depth=TICK_DEPTH, segment_bytes=TICK_SEGMENT_MB * 1024 * 1024, buffer_size=4096):
+        self.directory = directory
+        self.depth = depth
+        self.dtype = tick_dtype(depth)
+        self.segment_bytes = segment_bytes
+        self.buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self.buffered = 0
+        self.file = None
+        self.segment_size = 0
+        self.symbols = {'depth': depth, 'exchanges': [], 'coins': []}  # Kimlik = listedeki sıra
+        self.exchange_ids = {}
+        self.coin_ids = {}
+        os.makedirs(directory, exist_ok=True)
+        self.load_symbols()
+
+    def symbols_path(self):
+        return os.path.join(self.directory, 'symbols.json')
+
+    def load_symbols(self):
+        try:
+            with open(self.symbols_path()) as f:
+                symbols = json.load(f)
+        except FileNotFoundError:
+            return
+        if symbols.get('depth') != self.depth:
+            raise ValueError(f"{self.directory} kayıtları {symbols.get('depth')} kademe ile yazılmış (TICK_DEPTH={self.depth})")
+        self.symbols = symbols
+        self.exchange_ids = {name: i for i, name in enumerate(symbols['exchanges'])}
+        self.coin_ids = {coin: i for i, coin in enumerate(symbols['coins'])}
+
+    def save_symbols(self):
+        tmp_path = f"{self.symbols_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.symbols, f)
+        os.replace(tmp_path, self.symbols_path())
+
+    def symbol_id(self, ids, key, name):
+        if name not in ids:
+            ids[name] = len(self.symbols[key])
+            self.symbols[key].append(name)
+            self.save_symbols()  # Yeni sembol nadirdir; okuyucu her zaman güncel sözlüğü görür
+        return ids[name]
+
+    def record(self, exchange, coin, bids, asks, kind=BOOK, ts=None):
+        """Tek bir görüntüyü tampona ekler; bids/asks (fiyat, miktar) listeleridir (ticker için tek kademe)"""
+        row = self.buffer[self.buffered]
+        row['ts'] = time.time() if ts is None else ts
+        row['exchange'] = self.symbol_id(self.exchange_ids, 'exchanges', exchange)
+        row['coin'] = self.symbol_id(self.coin_ids, 'coins', coin)
+        row['kind'] = kind
+        for prefix, levels in (('bid', bids), ('ask', asks)):
+            prices, amounts = row[f'{prefix}_price'], row[f'{prefix}_amount']
+            count = min(len(levels), self.depth)
+            prices[:] = np.nan
+            amounts[:] = np.nan
+            for k in range(count):
+                prices[k] = levels[k][0]
+                amounts[k] = levels[k][1] if levels[k][1] is not None else np.nan
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def record_ticker(self, exchange, coin, ticker):
+        """fetch_ticker(s) veya akış sonucundaki en iyi alış/satış fiyatını kaydeder"""
+        if ticker.get('bid') is None and ticker.get('ask') is None:
+            return
+        self.record(
+            exchange, coin,
+            [(ticker.get('bid'), ticker.get('bidVolume'))] if ticker.get('bid') is not None else [],
+            [(ticker.get('ask'), ticker.get('askVolume'))] if ticker.get('ask') is not None else [],
+            kind=self.TICKER,
+        )
+
+    def flush(self):
+        """Tampondaki kayıtları geçerli segmentin sonuna ekler; segment dolduysa yenisini açar"""
+        if not self.buffered:
+            return
+        if self.file is None or self.segment_size >= self.segment_bytes:
+            self.rotate(float(self.buffer[0]['ts']))
+        data = self.buffer[:self.buffered].tobytes()
+        self.file.write(data)
+        self.file.flush()
+        self.segment_size += len(data)
+        self.buffered = 0
+
+    def rotate(self, start_ts):
+        """Yeni segment açar; dosya adı ilk kaydın zamanını (ms) taşır ve okuyucu bununla sıralar"""
+        if self.file:
+            self.file.close()
+        path = os.path.join(self.directory, f"ticks-{int(start_ts * 1000):015d}.bin")
+        self.file = open(path, 'ab')
+        self.segment_size = self.file.tell()
+
+    def close(self):
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class TickReader:
+    """TickRecorder segmentlerini belleğe eşleyerek (memmap) okur; coin ve zaman aralığına göre dilimler.
+    Sadece eşleşen kayıtlar kopyalanır, segmentlerin tamamı RAM'e yüklenmez."""
+
+    def __init__(self, directory=TICK_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, 'symbols.json')) as f:
+            self.symbols = json.load(f)
+        self.dtype = tick_dtype(self.symbols['depth'])
+
+    def segments(self):
+        """(başlangıç zamanı, yol) listesini zamana göre sıralı döndürür"""
+        result = []
+        for name in os.listdir(self.directory):
+            if name.startswith('ticks-') and name.endswith('.bin'):
+                result.append((int(name[6:-4]) / 1000, os.path.join(self.directory, name)))
+        return sorted(result)
+
+    def map_segment(self, path):
+        """Segmenti salt okunur eşler; yazım sırasında kesilmiş son kayıt yok sayılır"""
+        count = os.path.getsize(path) // self.dtype.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+
+    def iter_slices(self, coin=None, exchange=None, start=None, end=None, kind=None):
+        """Filtreye uyan kayıtları segment segment (zaman sırasıyla) yapılandırılmış numpy dizileri olarak üretir
+        (start dahil, end hariç). Bellekte aynı anda sadece bir segmentin eşleşen kayıtları bulunur.
+        Hiç kaydedilmemiş bir coin veya borsa istenirse hiçbir şey üretilmez."""
+        if (coin and coin not in self.symbols['coins']) or (exchange and exchange not in self.symbols['exchanges']):
+            return
+        coin_id = self.symbols['coins'].index(coin) if coin else None
+        exchange_id = self.symbols['exchanges'].index(exchange) if exchange else None
+        segments = self.segments()
+        for index, (segment_start, path) in enumerate(segments):
+            # Bir sonraki segment aralığın başından önce başlıyorsa bu segment tamamen aralığın dışındadır
+            if start is not None and index + 1 < len(segments) and segments[index + 1][0] <= start:
+                continue
+            if end is not None and segment_start >= end:
+                break
+            ticks = self.map_segment(path)
+            if ticks is None:
+                continue
+            # Kayıtlar ekleme sırasındadır: zaman sınırları ikili aramayla bulunur
+            low = np.searchsorted(ticks['ts'], start, 'left') if start is not None else 0
+            high = np.searchsorted(ticks['ts'], end, 'left') if end is not None else len(ticks)
+            window = ticks[low:high]
+            mask = np.ones(len(window), dtype=bool)
+            if coin_id is not None:
+                mask &= window['coin'] == coin_id
+            if exchange_id is not None:
+                mask &= window['exchange'] == exchange_id
+            if kind is not None:
+                mask &= window['kind'] == kind
+            yield np.asarray(window[mask])
+
+    def read(self, coin=None, exchange=None, start=None, end=None, kind=None):
+        """Filtreye uyan tüm kayıtları tek dizi olarak döndürür"""
+        parts = list(self.iter_slices(coin, exchange, start, end, kind))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=self.dtype)
+
+    def iter_books(self, coin=None, start=None, end=None):
+        """Defter görüntülerini BacktestEngine'in beklediği sözlük biçiminde üretir"""
+        exchanges, coins = self.symbols['exchanges'], self.symbols['coins']
+        for ticks in self.iter_slices(coin=coin, start=start, end=end, kind=TickRecorder.BOOK):
+            yield from self._book_records(ticks, exchanges, coins)
+
+    @staticmethod
+    def _book_records(ticks, exchanges, coins):
+        # Sütunlar dilim başına bir kez Python listelerine çevrilir (kayıt başına numpy çağrısından çok daha hızlı)
+        columns = [ticks[name].tolist() for name in ('ts', 'exchange', 'coin', 'bid_price', 'bid_amount', 'ask_price', 'ask_amount')]
+        bid_counts = (~np.isnan(ticks['bid_price'])).sum(axis=1).tolist()
+        ask_counts = (~np.isnan(ticks['ask_price'])).sum(axis=1).tolist()
+        for ts, exchange, coin, bid_prices, bid_amounts, ask_prices, ask_amounts, bid_count, ask_count in zip(*columns, bid_counts, ask_counts):
+            yield {
+                'ts': ts,
+                'exchange': exchanges[exchange],
+                'coin': coins[coin],
+                'bids': [list(level) for level in zip(bid_prices[:bid_count], bid_amounts[:bid_count])],
+                'asks': [list(level) for level in zip(ask_prices[:ask_count], ask_amounts[:ask_count])],
+            }
+
+
+class LatencyHistogram:
+    """Sabit kovalı süre histogramı (Prometheus için) + yüzdelikler için son örneklerin halka tamponu"""
+
+    # Saniye; milisaniyelik API çağrılarından saatlik transferlere kadar
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+               30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+    __slots__ = ('counts', 'count', 'sum', 'recent')
+
+    def __init__(self, window=1024):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # Son kova +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """Son örneklerden yüzdelikleri (saniye) döndürür; örnek yoksa None"""
+        if not self.recent:
+            return None
+        return [float(v) for v in np.percentile(np.fromiter(self.recent, dtype=np.float64), qs)]
+
+
+class StageTimer:
+    """`with` bloğunun süresini histograma yazar (blok hata ile çıksa da)"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class LatencyMetrics:
+    """Aşama (ve borsa) bazında süre histogramları; Prometheus metin çıktısı ve yüzdelik özeti üretir"""
+
+    def __init__(self, prefix='arbitrage_stage_seconds'):
+        self.prefix = prefix
+        self.histograms = {}  # (aşama, borsa veya None) -> LatencyHistogram
+
+    def histogram(self, stage, exchange=None):
+        key = (stage, exchange)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        return histogram
+
+    def time(self, stage, exchange=None):
+        """Kullanım: `with latency_metrics.time('order_placement', 'gate'): ...`"""
+        return StageTimer(self.histogram(stage, exchange))
+
+    async def timed(self, stage, exchange, awaitable):
+        """Bir awaitable'ı süresini ölçerek bekler (asyncio.gather içinde kullanmak için)"""
+        with self.time(stage, exchange):
+            return await awaitable
+
+    def observe(self, stage, seconds, exchange=None):
+        self.histogram(stage, exchange).observe(seconds)
+
+    def render_prometheus(self):
+        """Prometheus metin biçimi (0.0.4)"""
+        lines = [
+            f"# HELP {self.prefix} Arbitraj aşamalarının süresi (saniye)",
+            f"# TYPE {self.prefix} histogram",
+        ]
+        for (stage, exchange), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            labels = f'stage="{stage}"' + (f',exchange="{exchange}"' if exchange else '')
+            cumulative = 0
+            for bound, count in zip(histogram.BUCKETS + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.prefix}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.prefix}_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"{self.prefix}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """(aşama, borsa, örnek sayısı, p50, p95, p99) satırları; yüzdelikler son örneklerden"""
+        rows = []
+        for (stage, exchange), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            percentiles = histogram.percentiles()
+            if percentiles:
+                rows.append((stage, exchange, histogram.count, *percentiles))
+        return rows
+
+
+class MetricsServer:
+    """latency_metrics'i /metrics altında Prometheus metin biçiminde sunan yerel HTTP sunucusu"""
+
+    def __init__(self, metrics, host=METRICS_HOST, port=METRICS_PORT):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        app = aiohttp.web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self.runner = aiohttp.web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = aiohttp.web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Metrik sunucusu başlatıldı: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _handle(self, request):
+        return aiohttp.web.Response(
+            body=self.metrics.render_prometheus().encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+
+# Tüm aşama süreleri tek kayıtta toplanır (/metrics ve /latency buradan okur)
+latency_metrics = LatencyMetrics()
+
+
+class FeeRegistry:
+    """Borsa/coin/ağ bazında çekim ücreti, minimum çekim ve yatırma/çekme durumunu bellekte tutar"""
+
+    def __init__(self, ttl=FEE_REGISTRY_TTL):
+        self.ttl = ttl  # Saniye; daha eski kayıtlar bilinmiyor sayılır
+        self.entries = {}  # (borsa, coin, ağ) -> kayıt
+        self.networks = {}  # (borsa, coin) -> ağ kümesi
+        self.version = 0  # Her toplu güncellemede artar; türetilmiş önbellekler bununla geçersizlenir
+        self.changed = set()  # Son drain_changes'ten beri kaydı değişen, tazelenen veya süresi dolan coinler
+        self.expired = set()  # Süresinin dolduğu bildirilmiş kayıt anahtarları
+        self.next_expiry = math.inf  # Süresi dolmamış kayıtlardan en erken dolacak olanın anı
+
+    def _merge(self, exchange, coin, network, fetched_at, **fields):
+        key = (exchange, coin, network)
+        entry = self.entries.get(key)
+        if entry is None or fetched_at - entry['updated_at'] > self.ttl:
+            self.changed.add(coin)
+        if entry is None:
+            entry = self.entries[key] = {
+                'fee': None,
+                'min_withdraw': None,
+                'withdraw_enabled': False,
+                'deposit_enabled': False,
+                'updated_at': fetched_at,
+            }
+            self.networks.setdefault((exchange, coin), set()).add(network)
+        for field, value in fields.items():
+            if value is not None:
+                if entry[field] != value:
+                    self.changed.add(coin)
+                entry[field] = value
+        entry['updated_at'] = max(entry['updated_at'], fetched_at)
+        self.expired.discard(key)
+        self.next_expiry = min(self.next_expiry, entry['updated_at'] + self.ttl)
+
+    def snapshot(self):
+        """Kayıtların kopyası (koordinatörden tarama işçilerine gönderilir)"""
+        return {key: dict(entry) for key, entry in self.entries.items()}
+
+    def restore(self, entries):
+        """snapshot() çıktısıyla kayıtları değiştirir; kaydı değişen veya silinen coinler işaretlenir"""
+        for key in set(self.entries) | set(entries):
+            if self.entries.get(key) != entries.get(key):
+                self.changed.add(key[1])
+        self.entries = {key: dict(entry) for key, entry in entries.items()}
+        self.networks = {}
+        for exchange, coin, network in self.entries:
+            self.networks.setdefault((exchange, coin), set()).add(network)
+        self.expired = set()
+        self.next_expiry = -math.inf  # Süresi dolmuş gelen kayıtlar bir sonraki drain_changes'te bulunur
+        self.version += 1
+
+    def expire(self, now=None):
+        """Süresi yeni dolan kayıtların coinlerini değişmiş sayar (get() bu kayıtları artık döndürmez).
+        En erken dolacak kaydın anı tutulur; o ana kadar kayıtlar taranmaz."""
+        now = now or time.time()
+        if now <= self.next_expiry:
+            return
+        self.next_expiry = math.inf
+        for key, entry in self.entries.items():
+            expires_at = entry['updated_at'] + self.ttl
+            if now > expires_at:
+                if key not in self.expired:
+                    self.expired.add(key)
+                    self.changed.add(key[1])
+                    self.version += 1
+            else:
+                self.next_expiry = min(self.next_expiry, expires_at)
+
+    def drain_changes(self):
+        """Değişen ve süresi dolan coinleri döndürür ve listeyi sıfırlar"""
+        self.expire()
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def update_from_currencies(self, exchange, currencies, fetched_at=None):
+        """ccxt fetch_currencies / exchange.currencies yapısından kayıtları günceller"""
+        fetched_at = fetched_at or time.time()
+        self.version += 1
+        for code, currency in currencies.items():
+            for network, info in (currency.get('networks') or {}).items():
+                withdraw_limits = (info.get('limits') or {}).get('withdraw') or {}
+                self._merge(
+                    exchange, code, network, fetched_at,
+                    fee=info.get('fee'),
+                    min_withdraw=withdraw_limits.get('min'),
+                    withdraw_enabled=info.get('withdraw'),
+                    deposit_enabled=info.get('deposit'),
+                )
+
+    def update_from_fees(self, exchange, fees, fetched_at=None):
+        """ccxt fetch_deposit_withdraw_fees yapısından ağ bazlı çekim ücretlerini günceller"""
+        fetched_at = fetched_at or time.time()
+        self.version += 1
+        for code, item in fees.items():
+            for network, info in (item.get('networks') or {}).items():
+                self._merge(exchange, code, network, fetched_at, fee=(info.get('withdraw') or {}).get('fee'))
+
+    def get(self, exchange, coin, network):
+        """Kaydı döndürür; yoksa veya süresi dolmuşsa None"""
+        entry = self.entries.get((exchange, coin, network))
+        if entry is None or time.time() - entry['updated_at'] > self.ttl:
+            return None
+        return entry
+
+    def select_network(self, source, destination, coin, preferred=None):
+        """Kaynakta çekime, hedefte yatırmaya açık ağı seçer (tercih yoksa en düşük ücretli)"""
+        candidates = [preferred] if preferred else self.networks.get((source, coin), ())
+        best = None
+        for network in candidates:
+            entry = self.get(source, coin, network)
+            target = self.get(destination, coin, network)
+            if not entry or not entry['withdraw_enabled'] or entry['fee'] is None:
+                continue
+            if not target or not target['deposit_enabled']:
+                continue
+            if best is None or entry['fee'] < best[1]['fee']:
+                best = (network, entry)
+        return best
+
+
+class EligibilityIndex:
+    """İşlem yapılabilir coin dizini: iki borsada da aktif X/USDT marketi olan ve alış borsasından çekim,
+    satış borsasına yatırma açık ortak bir ağı bulunan coinler, yön başına seçilen ağla tutulur.
+    Market yüklemeleri ve ücret kaydı güncellemelerinde sadece değişen coinler yeniden hesaplanır."""
+
+    def __init__(self, fee_registry):
+        self.fee_registry = fee_registry
+        self.listings = {}  # Borsa adı -> aktif USDT paritesi olan coin kümesi
+        self.routes = {}  # Coin -> {yön: ağ}; yolu olmayan coin burada bulunmaz
+
+    @staticmethod
+    def usdt_bases(markets):
+        return {
+            market['base'] for market in markets.values()
+            if market.get('quote') == 'USDT' and market.get('spot', True) and market.get('active') is not False
+        }
+
+    def update_markets(self, name, markets):
+        """Borsanın market listesini günceller; listelemesi değişen coinleri yeniden hesaplar"""
+        bases = self.usdt_bases(markets or {})
+        changed = bases.symmetric_difference(self.listings.get(name, set()))
+        self.listings[name] = bases
+        self.recompute(changed)
+        return changed
+
+    def refresh(self):
+        """Ücret kaydında değişen veya süresi dolan coinleri yeniden hesaplar"""
+        changed = self.fee_registry.drain_changes()
+        self.recompute(changed)
+        return changed
+
+    def recompute(self, coins):
+        names = list(self.listings)
+        for coin in coins:
+            listed = [name for name in names if coin in self.listings[name]]
+            routes = {}
+            for buy_name in listed:
+                for sell_name in listed:
+                    if buy_name == sell_name:
+                        continue
+                    selected = self.fee_registry.select_network(buy_name, sell_name, coin, WITHDRAW_NETWORKS.get(coin))
+                    if selected:
+                        routes[make_direction(buy_name, sell_name)] = selected[0]
+            if routes:
+                self.routes[coin] = routes
+            else:
+                self.routes.pop(coin, None)
+
+    def is_eligible(self, coin, direction=None):
+        routes = self.routes.get(coin)
+        return bool(routes) and (direction is None or direction in routes)
+
+    def coins(self):
+        return sorted(self.routes)
+
+    def reason(self, coin):
+        """Coin uygun değilse nedenini (Türkçe), uygunsa None döndürür"""
+        if coin in self.routes:
+            return None
+        listed = [name for name, bases in self.listings.items() if coin in bases]
+        if len(listed) < 2:
+            where = ', '.join(EXCHANGE_NAMES.get(name, name) for name in listed) or 'hiçbir borsada'
+            return f"{coin}/USDT marketi en az iki borsada aktif değil (listelendiği yer: {where})"
+        return f"{coin} için borsalar arasında çekim ve yatırmaya açık ortak bir ağ yok"
+
+
+class OrderValidationError(ValueError):
+    """Emir veya çekim yerel hassasiyet/limit kurallarına uymuyor; borsaya gönderilmeden reddedildi"""
+
+
+class OrderBuilder:
+    """Market ve para birimi hassasiyet/limitlerini market verisinden bir kez türetip önbellekte tutar;
+    emir ve çekim miktarlarını ağ çağrısı yapmadan aşağı yuvarlar, doğrular ve ccxt çağrı argümanlarını döndürür"""
+
+    def __init__(self):
+        self.modes = {}  # Borsa adı -> ccxt precisionMode
+        self.markets = {}  # Borsa adı -> sembol -> kural
+        self.currencies = {}  # Borsa adı -> coin -> çekim hassasiyeti
+
+    @staticmethod
+    def decimal(value):
+        return Decimal(str(value)) if value is not None else None
+
+    def load(self, name, exchange):
+        """Borsanın spot USDT marketleri ve para birimleri için kuralları yeniden oluşturur"""
+        mode = getattr(exchange, 'precisionMode', ccxt.TICK_SIZE)
+        markets = {}
+        for symbol, market in (exchange.markets or {}).items():
+            if market.get('quote') != 'USDT' or not market.get('spot', True):
+                continue
+            precision = market.get('precision') or {}
+            limits = market.get('limits') or {}
+            amount_limits, cost_limits = limits.get('amount') or {}, limits.get('cost') or {}
+            markets[symbol] = {
+                'amount_precision': self.decimal(precision.get('amount')),
+                'cost_precision': self.decimal(precision.get('cost')),
+                'min_amount': self.decimal(amount_limits.get('min')),
+                'max_amount': self.decimal(amount_limits.get('max')),
+                'min_cost': self.decimal(cost_limits.get('min')),
+                'max_cost': self.decimal(cost_limits.get('max')),
+            }
+        self.modes[name] = mode
+        self.markets[name] = markets
+        self.currencies[name] = {
+            code: self.decimal(currency.get('precision')) for code, currency in (exchange.currencies or {}).items()
+        }
+
+    def quantize(self, name, value, precision):
+        """Değeri borsanın hassasiyet biçimine (ondalık basamak, anlamlı basamak veya adım) göre aşağı yuvarlar"""
+        if precision is None or value <= 0:
+            return value
+        mode = self.modes.get(name, ccxt.TICK_SIZE)
+        if mode == ccxt.DECIMAL_PLACES:
+            step = Decimal(1).scaleb(-int(precision))
+        elif mode == ccxt.SIGNIFICANT_DIGITS:
+            step = Decimal(1).scaleb(value.adjusted() - int(precision) + 1)
+        else:
+            step = precision
+        return (value / step).to_integral_value(ROUND_DOWN) * step
+
+    def rule(self, name, symbol):
+        rule = self.markets.get(name, {}).get(symbol)
+        if rule is None:
+            raise OrderValidationError(f"{EXCHANGE_NAMES.get(name, name)} {symbol} için market kuralı yok")
+        return rule
+
+    @staticmethod
+    def check_range(label, value, minimum, maximum, unit):
+        if minimum is not None and value < minimum:
+            raise OrderValidationError(f"{label} {value} {unit}, minimum {minimum} {unit}")
+        if maximum is not None and value > maximum:
+            raise OrderValidationError(f"{label} {value} {unit}, maksimum {maximum} {unit}")
+
+    def market_buy(self, name, symbol, cost, price=None):
+        """Harcanacak USDT tutarıyla piyasa alışı (createMarketBuyOrderRequiresPrice kapalı). Tutar yuvarlanır,
+        min/maks tutar ve fiyat verilirse tahmini miktar kontrol edilir. Dönüş: create_market_buy_order argümanları"""
+        rule = self.rule(name, symbol)
+        cost = self.quantize(name, Decimal(str(cost)), rule['cost_precision'])
+        self.check_range(f"{symbol} alış tutarı", cost, rule['min_cost'], rule['max_cost'], 'USDT')
+        if price:
+            self.check_range(f"{symbol} tahmini alış miktarı", cost / Decimal(str(price)),
+                             rule['min_amount'], None, symbol.split('/')[0])
+        return {'symbol': symbol, 'amount': float(cost)}
+
+    def market_sell(self, name, symbol, amount, price=None):
+        """Coin miktarıyla piyasa satışı. Miktar lot adımına aşağı yuvarlanır, min/maks miktar ve fiyat
+        verilirse tahmini tutar kontrol edilir. Dönüş: create_market_sell_order argümanları"""
+        rule = self.rule(name, symbol)
+        amount = self.quantize(name, Decimal(str(amount)), rule['amount_precision'])
+        self.check_range(f"{symbol} satış miktarı", amount, rule['min_amount'], rule['max_amount'], symbol.split('/')[0])
+        if price:
+            self.check_range(f"{symbol} tahmini satış tutarı", amount * Decimal(str(price)), rule['min_cost'], None, 'USDT')
+        return {'symbol': symbol, 'amount': float(amount)}
+
+    def withdrawal(self, name, code, amount, min_withdraw=None):
+        """Çekim miktarını para biriminin hassasiyetine aşağı yuvarlar ve minimum çekimi kontrol eder.
+        Dönüş: withdraw için code ve amount argümanları"""
+        amount = self.quantize(name, Decimal(str(amount)), self.currencies.get(name, {}).get(code))
+        if amount <= 0:
+            raise OrderValidationError(f"{EXCHANGE_NAMES.get(name, name)} {code} çekim miktarı sıfır")
+        self.check_range(f"{code} çekim miktarı", amount, self.decimal(min_withdraw) or None, None, code)
+        return {'code': code, 'amount': float(amount)}
+
+
+def create_http_session():
+    """Borsa istemcilerinin paylaştığı, keep-alive ve DNS önbellekli aiohttp oturumu (event loop içinde çağrılmalı)"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        enable_cleanup_closed=True,
+        ssl=ssl.create_default_context(cafile=certifi.where()),  # ccxt'nin kendi oturumundaki CA paketi
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+# İsteğin hız sınırı kuyruğu; görevlerle birlikte kopyalanır, varsayılan piyasa verisi taramasıdır
+request_lane = contextvars.ContextVar('request_lane', default='market')
+
+
+class RequestPriority:
+    """Bloğun içindeki borsa isteklerini verilen kuyruğa alır (daha öncelikli bir kuyruktaysa düşürmez)"""
+
+    def __init__(self, lane):
+        self.lane = lane
+        self.token = None
+
+    def __enter__(self):
+        lane = min(self.lane, request_lane.get(), key=RateLimitScheduler.LANES.index)
+        self.token = request_lane.set(lane)
+        return self
+
+    def __exit__(self, *exc):
+        request_lane.reset(self.token)
+        return False
+
+
+class RateLimitScheduler:
+    """Borsa başına ağırlıklı token kovası; ccxt'nin kendi Throttler'ının yerine istemciye takılır.
+    Bekleyen istekler öncelik sırasıyla geçer: emir/iptal/çekim > dolum takibi > piyasa verisi.
+    Alt kuyruklar kovada RATE_LIMIT_ORDER_RESERVE kadar token bırakmak zorunda olduğundan tarama
+    patlaması sırasında gelen emir beklemeden gönderilir."""
+
+    LANES = ('order', 'fill', 'market')
+
+    def __init__(self, name, token_bucket, reserve=RATE_LIMIT_ORDER_RESERVE):
+        self.name = name
+        self.refill_rate = token_bucket.get('refillRate', 1.0)  # ms başına token (ccxt birimi)
+        self.default_cost = token_bucket.get('defaultCost', 1.0)
+        self.reserve = reserve
+        self.capacity = token_bucket.get('capacity', 1.0) + reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.queues = {lane: deque() for lane in self.LANES}  # (future, maliyet, kuyruğa girdiği an)
+        self.wakeup = asyncio.Event()
+        self.task = None  # Kuyrukları boşaltan görev (referansı tutulur; close() iptal eder)
+        self.loop = None  # ccxt open() atar; kullanılmaz
+        self.sent = {lane: 0 for lane in self.LANES}
+
+    @classmethod
+    def install(cls, client, reserve=RATE_LIMIT_ORDER_RESERVE):
+        """ccxt istemcisinin REST kısıtlayıcısını bu zamanlayıcıyla değiştirir"""
+        client.throttle = cls(client.id, client.tokenBucket, reserve)
+        return client.throttle
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * 1000 * self.refill_rate)
+        self.updated = now
+
+    def __call__(self, cost=None):
+        """ccxt fetch2 içinden çağrılır; isteğin gönderilebileceği an tamamlanan future döndürür"""
+        future = asyncio.get_running_loop().create_future()
+        cost = self.default_cost if cost is None else cost
+        self.queues[request_lane.get()].append((future, cost, time.perf_counter()))
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return future
+
+    def next_request(self):
+        """Bekleyen en öncelikli kuyruğu döndürür (iptal edilmiş istekler atlanır)"""
+        for lane in self.LANES:
+            queue = self.queues[lane]
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if queue:
+                return lane, queue
+        return None, None
+
+    async def run(self):
+        try:
+            while True:
+                lane, queue = self.next_request()
+                if lane is None:
+                    return
+                self.refill()
+                threshold = 0 if lane == 'order' else self.reserve
+                if self.tokens >= threshold:
+                    future, cost, queued = queue.popleft()
+                    self.tokens -= cost
+                    self.sent[lane] += 1
+                    future.set_result(None)
+                    latency_metrics.observe(f'rate_limit_{lane}', time.perf_counter() - queued, self.name)
+                    continue
+                # Kova dolana kadar uyunur; daha öncelikli bir istek gelirse hemen yeniden değerlendirilir
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), (threshold - self.tokens) / self.refill_rate / 1000)
+                except asyncio.TimeoutError:
+                    pass
+        except Exception as e:
+            # Bekleyen istekler askıda kalmasın: hata isteği yapan çağrıya iletilir
+            logger.error(f"{self.name} hız sınırı zamanlayıcısı hatası: {e}", exc_info=True)
+            self.fail_pending(e)
+
+    def fail_pending(self, error=None):
+        """Bekleyen tüm istekleri verilen hatayla (yoksa iptal ederek) sonlandırır"""
+        for queue in self.queues.values():
+            while queue:
+                future = queue.popleft()[0]
+                if not future.done():
+                    if error is None:
+                        future.cancel()
+                    else:
+                        future.set_exception(error)
+
+    async def close(self):
+        """Zamanlayıcı görevini durdurur ve bekleyen istekleri iptal eder"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        self.fail_pending()
+
+    def pending(self):
+        return {lane: len(queue) for lane, queue in self.queues.items()}
+
+
+class ExchangeRegistry:
+    """Ad -> ccxt istemcisi kaydı; yapılandırmadan herhangi bir ccxt borsası eklenebilir"""
+
+    # Özel uç nokta anahtarlarından vadeli/türev ürünlere ait olanlar (spot emirleri buralara gitmez)
+    DERIVATIVE_KEYS = ('future', 'contract', 'delivery', 'option', 'swap', 'dapi', 'fapi', 'eapi', 'broker')
+    # ccxt birleşik metodu -> hız sınırı kuyruğu (geri kalan her şey piyasa verisi kuyruğundan geçer)
+    REQUEST_LANES = {
+        'create_order': 'order', 'create_market_buy_order': 'order', 'create_market_sell_order': 'order',
+        'create_limit_buy_order': 'order', 'create_limit_sell_order': 'order', 'cancel_order': 'order',
+        'cancel_all_orders': 'order', 'withdraw': 'order',
+        'fetch_order': 'fill', 'fetch_open_orders': 'fill', 'fetch_closed_orders': 'fill', 'fetch_my_trades': 'fill',
+        'fetch_withdrawals': 'fill', 'fetch_deposits': 'fill', 'fetch_balance': 'fill', 'fetch_deposit_address': 'fill',
+    }
+
+    def __init__(self):
+        self.clients = {}
+        self.session = None  # Ayarlanırsa tüm yeni istemcilere paylaşılan aiohttp oturumu olarak verilir
+
+    def add(self, name, exchange_id=None, config=None):
+        """ccxt sınıfından istemci oluşturup kaydeder (exchange_id verilmezse ad ccxt kimliği sayılır)"""
+        exchange_class = getattr(ccxt, exchange_id or name, None)
+        if exchange_class is None:
+            raise ValueError(f"Bilinmeyen ccxt borsası: {exchange_id or name}")
+        config = dict(config or {})
+        if self.session is not None:
+            # ccxt 'session' verilen istemcide kendi oturumunu açmaz ve close() ile paylaşılanı kapatmaz
+            config.setdefault('session', self.session)
+        options = {
+            'defaultType': 'spot', # Ensure spot trading
+            'createMarketBuyOrderRequiresPrice': False, # Piyasa alışında harcanacak USDT miktarı verilir
+            **config.pop('options', {}),
+        }
+        client = exchange_class({'sandbox': False, 'enableRateLimit': True, **config, 'options': options})
+        RateLimitScheduler.install(client)
+        for method, lane in self.REQUEST_LANES.items():
+            if hasattr(client, method):
+                setattr(client, method, self.with_priority(getattr(client, method), lane))
+        return self.register(name, client)
+
+    @staticmethod
+    def with_priority(method, lane):
+        """İstemci metodunu, içindeki tüm istekler verilen hız sınırı kuyruğundan geçecek şekilde sarar"""
+        async def call(*args, **kwargs):
+            with RequestPriority(lane):
+                return await method(*args, **kwargs)
+        return call
+
+    def register(self, name, client):
+        """Hazır bir istemciyi (örn. FakeExchange) kaydeder"""
+        self.clients[name] = client
+        EXCHANGE_NAMES.setdefault(name, client.name)
+        return client
+
+    def add_from_env(self, spec):
+        """EXTRA_EXCHANGES biçimindeki ("ad" veya "ad:ccxt_kimliği", virgülle ayrılmış) borsaları ekler"""
+        for item in (part.strip() for part in spec.split(',')):
+            if not item:
+                continue
+            name, _, exchange_id = item.partition(':')
+            name = name.strip().lower()
+            prefix = name.upper()
+            config = {'apiKey': os.getenv(f'{prefix}_API_KEY'), 'secret': os.getenv(f'{prefix}_SECRET')}
+            if os.getenv(f'{prefix}_PASSWORD'):
+                config['password'] = os.getenv(f'{prefix}_PASSWORD')
+            self.add(name, exchange_id.strip() or name, config)
+
+    def get(self, name):
+        return self.clients[name]
+
+    def private_hosts(self, name):
+        """Borsanın spot emir/bakiye/çekim isteklerinin gittiği 'https://host' köklerini döndürür
+        (ccxt urls['api'] içindeki 'private' anahtarlı adresler; hiç yoksa türev olmayan tüm adresler)"""
+        client = self.clients[name]
+        urls = []
+
+        def walk(node, path):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    walk(value, path + (str(key).lower(),))
+            elif isinstance(node, str) and not any(word in key for key in path for word in self.DERIVATIVE_KEYS):
+                urls.append((path, node))
+
+        walk((getattr(client, 'urls', None) or {}).get('api'), ())
+        private = [url for path, url in urls if any('private' in key for key in path)] or [url for _, url in urls]
+        hosts = set()
+        for url in private:
+            if hasattr(client, 'implode_hostname'):
+                url = client.implode_hostname(url)
+            scheme, _, rest = url.partition('://')
+            if rest:
+                hosts.add(f"{scheme}://{rest.split('/')[0]}")
+        return sorted(hosts)
+
+    def names(self):
+        return list(self.clients)
+
+    def items(self):
+        return list(self.clients.items())
+
+    def __len__(self):
+        return len(self.clients)
+
+    async def close(self):
+        """Hız sınırı zamanlayıcılarını ve istemcileri kapatır (paylaşılan oturum sahibince kapatılır)"""
+        await asyncio.gather(*(
+            client.throttle.close() for client in self.clients.values()
+            if isinstance(getattr(client, 'throttle', None), RateLimitScheduler)
+        ))
+        await asyncio.gather(*(client.close() for client in self.clients.values()), return_exceptions=True)
+
+
+class OrderBook:
+    """Tek bir sembol için bellekte tutulan, artımlı güncellenen emir defteri"""
+
+    def __init__(self):
+        self.bids = {}  # fiyat -> miktar
+        self.asks = {}
+        self.sequence = None  # Borsanın güncelleme numarası (sıra kontrolü için)
+        self.updated_at = 0.0  # time.monotonic() cinsinden son güncelleme
+        self.valid = False  # Anlık görüntü alınana veya senkron bozulana kadar False
+
+    @staticmethod
+    def _apply_levels(side, levels):
+        for level in levels:
+            price = float(level[0])
+            amount = float(level[1])
+            if amount == 0:
+                side.pop(price, None)
+            else:
+                side[price] = amount
+
+    def apply_snapshot(self, bids, asks, sequence=None):
+        """Defteri tamamen yeniler"""
+        self.bids = {}
+        self.asks = {}
+        self._apply_levels(self.bids, bids)
+        self._apply_levels(self.asks, asks)
+        self.sequence = sequence
+        self.updated_at = time.monotonic()
+        self.valid = True
+
+    def invalidate(self):
+        """Defteri yeniden senkron gerekene kadar geçersiz işaretler"""
+        self.sequence = None
+        self.valid = False
+
+    def apply_delta(self, bids, asks, first_sequence=None, last_sequence=None):
+        """Artımlı güncelleme uygular. Sıra numarasında boşluk varsa False döner (yeniden senkron gerekir)"""
+        if self.sequence is not None and last_sequence is not None:
+            if last_sequence <= self.sequence:
+                return True  # Eski güncelleme, zaten defterde
+            if first_sequence is not None and first_sequence > self.sequence + 1:
+                return False
+        self._apply_levels(self.bids, bids)
+        self._apply_levels(self.asks, asks)
+        if last_sequence is not None:
+            self.sequence = last_sequence
+        self.updated_at = time.monotonic()
+        return True
+
+    def best_bid(self):
+        return max(self.bids) if self.bids else None
+
+    def best_ask(self):
+        return min(self.asks) if self.asks else None
+
+    def levels(self, side, depth=None):
+        """Fiyata göre sıralı (fiyat, miktar) listesi döndürür; bids azalan, asks artan"""
+        book = self.bids if side == 'bids' else self.asks
+        ordered = sorted(book.items(), reverse=(side == 'bids'))
+        return ordered[:depth] if depth else ordered
+
+    def age(self):
+        return time.monotonic() - self.updated_at
+
+
+class OrderBookStore:
+    """Borsa ve sembol bazında emir defterlerini bellekte tutar"""
+
+    def __init__(self):
+        self.books = {}  # (borsa, sembol) -> OrderBook
+        self.listeners = []  # Her güncellemede çağrılır: callback(borsa, sembol)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self, exchange, symbol):
+        """Bir defter güncellendiğinde dinleyicileri haberdar eder"""
+        for callback in self.listeners:
+            callback(exchange, symbol)
+
+    def get(self, exchange, symbol):
+        return self.books.get((exchange, symbol))
+
+    def get_or_create(self, exchange, symbol):
+        book = self.books.get((exchange, symbol))
+        if book is None:
+            book = self.books[(exchange, symbol)] = OrderBook()
+        return book
+
+    def discard(self, exchange, symbol):
+        self.books.pop((exchange, symbol), None)
+
+    def get_quote(self, exchange, symbol, max_age=None):
+        """En iyi alış/satış fiyatını döndürür; defter yoksa veya bayatsa None"""
+        book = self.books.get((exchange, symbol))
+        if book is None or not book.valid:
+            return None
+        if max_age is not None and book.age() > max_age:
+            return None
+        bid = book.best_bid()
+        ask = book.best_ask()
+        if bid is None or ask is None:
+            return None
+        return {'bid': bid, 'ask': ask, 'age': book.age()}
+
+
+class StreamingQuoteEngine:
+    """Gate.io ve MEXC emir defteri kanallarına abone olup OrderBookStore'u günceller"""
+
+    EXCHANGES = ('gate', 'mexc')  # Akışı desteklenen borsalar; diğerleri REST'ten okunur
+    MEXC_MAX_SUBSCRIPTIONS = 30  # MEXC bağlantı başına en fazla 30 abonelik kabul ediyor
+
+    def __init__(self, store, gate_url=GATE_WS_URL, mexc_url=MEXC_WS_URL, depth=20, snapshot_fetcher=None, session=None):
+        self.store = store
+        self.gate_url = gate_url
+        self.mexc_url = mexc_url
+        self.depth = depth
+        # Gate.io artımlı akışında boşluk olursa REST'ten anlık görüntü almak için:
+        # async (sembol) -> (bids, asks, sequence)
+        self.snapshot_fetcher = snapshot_fetcher
+        self.coins = []
+        # Verilirse paylaşılan (create_http_session) oturum kullanılır ve motor onu kapatmaz;
+        # verilmezse motor start'ta kendi oturumunu açar
+        self.own_session = session is None
+        self.session = session
+        self.tasks = []
+        self.resyncing = set()
+        self.resync_tasks = set()  # Süren anlık görüntü istekleri (referans tutulur; stop() iptal eder)
+
+    async def start(self, coins):
+        """Verilen coinler için akışı başlatır"""
+        await self.stop()
+        self.coins = list(coins)
+        if self.own_session:
+            self.session = aiohttp.ClientSession()
+        self.tasks = [asyncio.create_task(self._run_connection('gate', self.gate_url, self.coins))]
+        for i in range(0, len(self.coins), self.MEXC_MAX_SUBSCRIPTIONS):
+            chunk = self.coins[i:i + self.MEXC_MAX_SUBSCRIPTIONS]
+            self.tasks.append(asyncio.create_task(self._run_connection('mexc', self.mexc_url, chunk)))
+        logger.info(f"WebSocket akışı başlatıldı: {len(self.coins)} coin")
+
+    async def stop(self):
+        """Tüm bağlantıları ve süren yeniden senkron isteklerini kapatır"""
+        tasks = self.tasks + list(self.resync_tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = []
+        self.resync_tasks.clear()
+        self.resyncing.clear()
+        if self.own_session and self.session:
+            await self.session.close()
+            self.session = None
+
+    @property
+    def is_running(self):
+        return any(not task.done() for task in self.tasks)
+
+    async def _run_connection(self, exchange, url, coins):
+        """Tek bir WebSocket bağlantısını, kopmalarda artan beklemeyle yeniden kurarak çalıştırır"""
+        backoff = 1
+        while True:
+            try:
+                async with self.session.ws_connect(url, heartbeat=20) as ws:
+                    for message in self.subscription_messages(exchange, coins):
+                        await ws.send_json(message)
+                    logger.info(f"{exchange} WebSocket bağlantısı kuruldu ({len(coins)} coin)")
+                    backoff = 1
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self.handle_message(exchange, json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{exchange} WebSocket hatası: {e}")
+            # Bağlantı koptu: bu borsanın defterleri artık güncel değil
+            for coin in coins:
+                self.store.discard(exchange, f"{coin}/USDT")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def subscription_messages(self, exchange, coins):
+        """Borsaya gönderilecek abonelik mesajlarını üretir"""
+        if exchange == 'gate':
+            return [
+                {
+                    'time': int(time.time()),
+                    'channel': 'spot.order_book_update',
+                    'event': 'subscribe',
+                    'payload': [f"{coin}_USDT", '100ms'],
+                }
+                for coin in coins
+            ]
+        return [{
+            'method': 'SUBSCRIPTION',
+            'params': [f"spot@public.limit.depth.v3.api@{coin}USDT@{self.depth}" for coin in coins],
+        }]
+
+    def handle_message(self, exchange, data):
+        """Ham WebSocket mesajını ilgili borsanın ayrıştırıcısına yönlendirir"""
+        if exchange == 'gate':
+            self.handle_gate_message(data)
+        else:
+            self.handle_mexc_message(data)
+
+    def handle_gate_message(self, data):
+        """Gate.io spot.order_book_update mesajını işler"""
+        if data.get('channel') != 'spot.order_book_update' or data.get('event') != 'update':
+            return
+        result = data.get('result') or {}
+        symbol = result.get('s', '').replace('_', '/')
+        if not symbol:
+            return
+        book = self.store.get_or_create('gate', symbol)
+        if result.get('full'):
+            book.apply_snapshot(result.get('b', []), result.get('a', []), result.get('u'))
+            self.store.notify('gate', symbol)
+            return
+        if not book.valid:
+            # Henüz anlık görüntü yok; artımlı güncellemeler tek başına anlamsız
+            self._request_resync(symbol)
+            return
+        if not book.apply_delta(result.get('b', []), result.get('a', []), result.get('U'), result.get('u')):
+            logger.warning(f"Gate.io {symbol} emir defterinde sıra boşluğu, yeniden senkronize ediliyor")
+            book.invalidate()
+            self._request_resync(symbol)
+            return
+        self.store.notify('gate', symbol)
+
+    def handle_mexc_message(self, data):
+        """MEXC spot@public.limit.depth.v3.api mesajını işler (her mesaj tam görüntüdür)"""
+        channel = data.get('c', '')
+        if not channel.startswith('spot@public.limit.depth.v3.api'):
+            return
+        payload = data.get('d') or {}
+        raw_symbol = data.get('s', '')
+        if not raw_symbol.endswith('USDT'):
+            return
+        symbol = f"{raw_symbol[:-4]}/USDT"
+        bids = [(level['p'], level['v']) for level in payload.get('bids', [])]
+        asks = [(level['p'], level['v']) for level in payload.get('asks', [])]
+        version = payload.get('r')
+        self.store.get_or_create('mexc', symbol).apply_snapshot(bids, asks, int(version) if version else None)
+        self.store.notify('mexc', symbol)
+
+    def _request_resync(self, symbol):
+        if not self.snapshot_fetcher or symbol in self.resyncing:
+            return
+        self.resyncing.add(symbol)
+        task = asyncio.create_task(self._resync(symbol))
+        self.resync_tasks.add(task)
+        task.add_done_callback(self.resync_tasks.discard)
+
+    async def _resync(self, symbol):
+        try:
+            bids, asks, sequence = await self.snapshot_fetcher(symbol)
+            self.store.get_or_create('gate', symbol).apply_snapshot(bids, asks, sequence)
+            self.store.notify('gate', symbol)
+        except Exception as e:
+            logger.error(f"Gate.io {symbol} anlık görüntü alma hatası: {e}")
+        finally:
+            self.resyncing.discard(symbol)
+
+
+class OrderTracker:
+    """Emirleri ID üzerinden fetch_order ile, artan aralıklarla sorgulayarak gerçekleşene kadar izler"""
+
+    FINAL_STATUSES = ('closed', 'canceled', 'expired', 'rejected')
+
+    def __init__(self, initial_delay=0.2, max_delay=2.0, backoff=1.5, timeout=60):
+        self.initial_delay = initial_delay  # İlk sorgudan önceki bekleme (saniye)
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+
+    async def wait_for_fill(self, exchange, order, symbol, timeout=None):
+        """Emir kapanana (veya iptal edilene / süre dolana) kadar bekler ve gerçekleşme özetini döndürür"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        delay = self.initial_delay
+        # Market emirleri çoğu zaman oluşturma yanıtında zaten kapalı gelir
+        while order.get('status') not in self.FINAL_STATUSES:
+            if time.monotonic() >= deadline:
+                logger.warning(f"{exchange.id} emri {order.get('id')} zaman aşımına uğradı (durum: {order.get('status')})")
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * self.backoff, self.max_delay)
+            try:
+                order = await exchange.fetch_order(order['id'], symbol)
+            except ccxt.NetworkError as e:
+                logger.warning(f"{exchange.id} emir sorgulama hatası, tekrar denenecek: {e}")
+        return self.summarize(order, symbol)
+
+    @staticmethod
+    def summarize(order, symbol):
+        """Emirden gerçekleşen miktar, ortalama fiyat ve ücret düşülmüş net tutarları çıkarır"""
+        base, quote = symbol.split('/')
+        filled = order.get('filled') or 0.0
+        cost = order.get('cost') or 0.0
+        average = order.get('average') or (cost / filled if filled else None)
+        base_fee = 0.0
+        quote_fee = 0.0
+        fees = order.get('fees') or ([order['fee']] if order.get('fee') else [])
+        for fee in fees:
+            if fee.get('currency') == base:
+                base_fee += fee.get('cost') or 0.0
+            elif fee.get('currency') == quote:
+                quote_fee += fee.get('cost') or 0.0
+        return {
+            'id': order.get('id'),
+            'status': order.get('status'),
+            'filled': filled,
+            'average': average,
+            'cost': cost,
+            'base_fee': base_fee,
+            'quote_fee': quote_fee,
+            'net_base': filled - base_fee,  # Alışta elde kalan coin
+            'net_quote': cost - quote_fee,  # Satışta elde kalan USDT
+        }
+
+
+class TradeState(Enum):
+    """Bir arbitraj işleminin aşamaları"""
+    PENDING = 'pending'
+    BOUGHT = 'bought'
+    WITHDRAWING = 'withdrawing'
+    IN_FLIGHT = 'in_flight'
+    CREDITED = 'credited'
+    SOLD = 'sold'
+    RETURNING = 'returning'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class ArbitrageTrade:
+    """Tek bir arbitraj işleminin durumunu ve geçiş geçmişini tutar"""
+
+    FINAL_STATES = (TradeState.COMPLETED, TradeState.FAILED)
+
+    def __init__(self, coin):
+        self.coin = coin
+        self.state = TradeState.PENDING
+        self.details = {}  # Emir/çekim/yatırma kayıtları
+        self.history = [(TradeState.PENDING, time.time())]
+
+    @property
+    def is_finished(self):
+        return self.state in self.FINAL_STATES
+
+    def transition(self, state, **details):
+        """Yeni duruma geçer ve ilgili kayıtları saklar"""
+        self.details.update(details)
+        self.state = state
+        self.history.append((state, time.time()))
+        logger.info(f"İşlem {self.coin}: {state.value}")
+
+    def duration(self):
+        return self.history[-1][1] - self.history[0][1]
+
+
+class TradeLimiter:
+    """Eşzamanlı işlem sayısını sınırlar. Semafordan farkı: limit çalışırken değiştirilebilir; süren ve
+    bekleyen işlemler aynı sayaçta kalır, limit düşürülünce yeni işlem sayaç limitin altına inene kadar bekler."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self.condition = asyncio.Condition()
+
+    async def set_limit(self, limit):
+        async with self.condition:
+            self.limit = limit
+            self.condition.notify_all()  # Limit arttıysa bekleyenler hemen başlar
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.running < self.limit)
+            self.running += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.running -= 1
+            self.condition.notify_all()
+
+
+class TransferWatcher:
+    """Kaynak borsadaki çekimi ID/txid üzerinden hedef borsanın yatırma kaydıyla eşleştirip hesaba geçene kadar izler"""
+
+    FAILED_STATUSES = ('failed', 'canceled')
+
+    def __init__(self, initial_delay=5, max_delay=30, backoff=1.5, timeout=3600):
+        self.initial_delay = initial_delay  # Saniye
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+
+    @staticmethod
+    def normalize_txid(txid):
+        txid = (txid or '').strip().lower()
+        return txid[2:] if txid.startswith('0x') else txid
+
+    async def wait_for_credit(self, source, destination, code, withdrawal, on_txid=None, timeout=None):
+        """Yatırma hesaba geçince yatırma kaydını döndürür. Çekim durumu yatırma görülene kadar her turda
+        izlenir; çekim başarısız/iptal olursa hemen, süre dolarsa sonunda RuntimeError fırlatır."""
+        withdrawal_id = withdrawal.get('id')
+        txid = self.normalize_txid(withdrawal.get('txid'))
+        # Kayıtları çekimden biraz öncesinden itibaren iste (borsa saatleri arasındaki farka karşı)
+        since = int((withdrawal.get('timestamp') or time.time() * 1000) - 10 * 60 * 1000)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        delay = self.initial_delay
+        if txid and on_txid:
+            on_txid(txid)
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * self.backoff, self.max_delay)
+
+            # Çekim (txid ve durum için) ve yatırma kayıtları eşzamanlı sorgulanır
+            withdrawals, deposits = await asyncio.gather(
+                source.fetch_withdrawals(code, since),
+                destination.fetch_deposits(code, since),
+                return_exceptions=True
+            )
+            if isinstance(withdrawals, Exception):
+                logger.warning(f"{source.id} çekim kaydı sorgulama hatası: {withdrawals}")
+                withdrawals = []
+            if isinstance(deposits, Exception):
+                logger.warning(f"{destination.id} yatırma kaydı sorgulama hatası: {deposits}")
+                deposits = []
+
+            for record in withdrawals:
+                if record.get('id') != withdrawal_id:
+                    continue
+                if record.get('status') in self.FAILED_STATUSES:
+                    raise RuntimeError(f"{source.id} çekimi {withdrawal_id} başarısız oldu (durum: {record.get('status')})")
+                record_txid = self.normalize_txid(record.get('txid'))
+                if record_txid and record_txid != txid:
+                    txid = record_txid
+                    if on_txid:
+                        on_txid(txid)
+
+            if not txid:
+                continue
+            for record in deposits:
+                if self.normalize_txid(record.get('txid')) == txid and record.get('status') == 'ok':
+                    return record
+
+        raise RuntimeError(f"{code} transferi {withdrawal_id} zaman aşımına uğradı (txid: {txid or 'yok'})")
+
+
+class OpportunityEvaluator:
+    """Fiyatı değişen coinleri biriktirir; bir güncelleme patlamasını debounce penceresi sonunda tek değerlendirmeye indirger"""
+
+    def __init__(self, debounce=0.05):
+        self.debounce = debounce  # Saniye
+        self.dirty = set()
+        self.wakeup = asyncio.Event()
+
+    def mark_dirty(self, coin):
+        self.dirty.add(coin)
+        self.wakeup.set()
+
+    async def next_batch(self, timeout=None):
+        """Değişen coin kümesini döndürür; timeout içinde değişiklik olmazsa boş küme"""
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return set()
+        if self.debounce > 0:
+            # Pencere boyunca gelen diğer güncellemeler aynı partiye eklenir
+            await asyncio.sleep(self.debounce)
+        self.wakeup.clear()
+        coins, self.dirty = self.dirty, set()
+        return coins
+
+
+class PollScheduler:
+    """REST tarama modunda coin başına yoklama zamanlayıcısı. Spread'i oynak ve min_profit_percentage eşiğine
+    yakın coinler sık, durgun olanlar seyrek yoklanır. Vadesi gelen coinler borsa başına tek bir toplu ticker
+    isteğiyle (fetch_tickers) çekilir; derinlik için çekilen emir defterleri de ilgili borsanın bütçesinden düşülür.
+    Borsa başına saniyede `budget` istek aşılmaz: bütçesi bir isteğe yetmeyen borsa varsa tarama bekler."""
+
+    def __init__(self, budget=POLL_BUDGET, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 horizon=0.25, smoothing=0.3, tick=1.0):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # Spread rastgele yürüyüş sayılır: eşiğe beklenen ulaşma süresi (fark / oynaklık)^2 saniyedir,
+        # coin bu sürenin `horizon` kesri kadar sonra yeniden yoklanır
+        self.horizon = horizon
+        self.smoothing = smoothing  # Oynaklık EWMA katsayısı
+        self.tick = tick  # Taranacak coin yokken döngünün en uzun uyuma süresi
+        self.heap = []  # (vade, coin); eski kayıtlar `due` ile karşılaştırılıp atlanır
+        self.due = {}  # Coin -> geçerli vade
+        self.stats = {}  # Coin -> {'pct', 'volatility', 'interval', 'heat', 'observed_at'}
+        self.allowance = {}  # Borsa adı -> harcanabilir istek
+        self.updated = time.monotonic()
+
+    def sync(self, coins, now):
+        """Coin evrenine yeni eklenenleri hemen vadeli yapar, evrenden çıkanları bırakır"""
+        universe = set(coins)
+        for coin in universe.difference(self.due):
+            self.due[coin] = now
+            heapq.heappush(self.heap, (now, coin))
+        for coin in set(self.due).difference(universe):
+            del self.due[coin]
+            self.stats.pop(coin, None)
+
+    def refill(self, names, now):
+        elapsed = now - self.updated
+        self.updated = now
+        for name in names:
+            # En fazla bir saniyelik bütçe birikir
+            self.allowance[name] = min(self.budget, self.allowance.get(name, self.budget) + elapsed * self.budget)
+
+    def charge(self, name, requests=1):
+        self.allowance[name] = self.allowance.get(name, self.budget) - requests
+
+    def take(self, coins, names):
+        """Vadesi gelmiş coinleri döndürür ve toplu ticker isteği için her borsanın bütçesinden bir istek düşer.
+        Bütçesi bir isteğe yetmeyen borsa varsa boş liste döner (coinler vadeli kalır)."""
+        now = time.monotonic()
+        self.sync(coins, now)
+        self.refill(names, now)
+        if any(self.allowance[name] < 1 for name in names):
+            return []
+        ready = []
+        while self.heap and self.heap[0][0] <= now:
+            due, coin = heapq.heappop(self.heap)
+            if self.due.get(coin) == due:
+                ready.append(coin)
+        if ready:
+            for name in names:
+                self.charge(name)
+        return ready
+
+    def delay(self, names):
+        """Bir sonraki take çağrısının coin döndürebileceği ana kadar beklenecek süre (en fazla `tick`)"""
+        now = time.monotonic()
+        wait = min(self.heap[0][0] - now, self.tick) if self.heap else self.tick
+        for name in names:
+            wait = max(wait, (1 - self.allowance.get(name, self.budget)) / self.budget)
+        return min(max(wait, 0.0), self.tick)
+
+    def observe(self, coin, pct, threshold, default_interval):
+        """Coinin son kâr oranına (None: kullanılabilir yol yok) göre oynaklığı ve sonraki vadeyi günceller"""
+        now = time.monotonic()
+        previous = self.stats.get(coin)
+        volatility = previous['volatility'] if previous else None
+        if pct is not None and previous and previous['pct'] is not None:
+            # Saniyenin kareköküne göre ölçeklenen değişim (yoklama aralığından bağımsız)
+            sample = abs(pct - previous['pct']) / math.sqrt(max(now - previous['observed_at'], 1e-3))
+            volatility = sample if volatility is None else (1 - self.smoothing) * volatility + self.smoothing * sample
+
+        if pct is None:
+            # Yol yok veya ticker alınamadı (geçici borsa hatası olabilir): varsayılan aralıkla yeniden denenir
+            interval, heat = default_interval, 0.0
+        elif pct >= threshold:
+            interval, heat = self.min_interval, math.inf
+        elif volatility is None:
+            interval, heat = default_interval, 0.0
+        elif volatility <= 0:
+            interval, heat = self.max_interval, 0.0
+        else:
+            gap = threshold - pct
+            interval, heat = self.horizon * (gap / volatility) ** 2, volatility / gap
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        self.stats[coin] = {'pct': pct, 'volatility': volatility, 'interval': interval, 'heat': heat, 'observed_at': now}
+        if coin in self.due:
+            self.due[coin] = now + interval
+            heapq.heappush(self.heap, (now + interval, coin))
+
+    def record_scan(self, coins, opportunities, threshold, default_interval):
+        """Tarama sonucunu yoklanan coinlere işler ve derinlik için çekilen defterleri bütçeden düşer"""
+        by_coin = {o['coin']: o for o in opportunities}
+        for coin in coins:
+            opportunity = by_coin.get(coin)
+            self.observe(coin, opportunity['profit_percentage'] if opportunity else None, threshold, default_interval)
+            if opportunity and 'buy_vwap' in opportunity:
+                self.charge(opportunity['buy_exchange'])
+                self.charge(opportunity['sell_exchange'])
+
+    def hottest(self, limit=10):
+        return sorted(self.stats.items(), key=lambda item: (-item[1]['heat'], item[1]['interval']))[:limit]
+
+
+class NotificationDispatcher:
+    """Telegram bildirimlerini sınırlı bir kuyruktan arka planda gönderir; patlamaları tek özet mesajda birleştirir"""
+
+    def __init__(self, chat_id, max_queue=100, min_interval=1.0, digest_window=0.5, dedupe_window=300, max_length=4000):
+        self.chat_id = chat_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.min_interval = min_interval  # Aynı sohbete iki mesaj arasındaki en kısa süre (Telegram ~1 mesaj/sn)
+        self.digest_window = digest_window  # İlk mesajdan sonra aynı özete eklenecekler için bekleme (saniye)
+        self.dedupe_window = dedupe_window  # Aynı anahtarlı mesajların bastırıldığı süre (saniye)
+        self.max_length = max_length  # Telegram sınırı 4096 karakter
+        self.recent = {}  # Anahtar -> [son gönderim zamanı, bastırılan tekrar sayısı]
+        self.dropped = 0  # Kuyruk dolduğu için atılan mesaj sayısı
+        self.last_sent = 0.0
+        self.bot = None
+        self.task = None
+
+    def submit(self, text, key=None):
+        """Mesajı beklemeden kuyruğa ekler; aynı anahtarlı tekrarlar pencere boyunca bastırılır"""
+        if not self.chat_id:
+            return False
+        if key is not None:
+            now = time.monotonic()
+            entry = self.recent.get(key)
+            if entry and now - entry[0] < self.dedupe_window:
+                entry[1] += 1
+                return False
+            if entry and entry[1]:
+                text += f"\n_(önceki {self.dedupe_window:.0f} sn içinde {entry[1]} kez tekrarlandı)_"
+            self.recent[key] = [now, 0]
+            if len(self.recent) > 1000:
+                self.recent = {k: v for k, v in self.recent.items() if now - v[0] < self.dedupe_window}
+        if self.queue.full():
+            # En eski mesaj atılır; güncel durum her zaman kuyruğa girer
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(text)
+        return True
+
+    def start(self, bot):
+        """Gönderici görevini başlatır; bağlanmadan önce kuyruğa eklenen mesajlar da gönderilir"""
+        self.bot = bot
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout=10):
+        """Göndericiyi durdurur ve kuyrukta kalanları son bir özet olarak göndermeyi dener"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        batch = self.drain([])
+        if batch and self.bot:
+            try:
+                await asyncio.wait_for(self.send_batch(batch), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Kapanışta {len(batch)} bildirim gönderilemedi")
+
+    def drain(self, batch):
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Pencere (ve hız limiti) boyunca gelenler aynı özete eklenir
+            wait = max(self.digest_window, self.min_interval - (time.monotonic() - self.last_sent))
+            await asyncio.sleep(wait)
+            await self.send_batch(self.drain(batch))
+
+    def build_digests(self, batch):
+        """Mesajları Telegram uzunluk sınırını aşmayan özet metinlerine böler"""
+        if self.dropped:
+            batch.insert(0, f"⚠️ _Kuyruk doldu, {self.dropped} eski bildirim atlandı._")
+            self.dropped = 0
+        digests, current = [], ''
+        for text in batch:
+            text = text.strip()[:self.max_length]
+            if current and len(current) + len(text) + 2 > self.max_length:
+                digests.append(current)
+                current = ''
+            current = f"{current}\n\n{text}" if current else text
+        if current:
+            digests.append(current)
+        return digests
+
+    async def send_batch(self, batch):
+        for text in self.build_digests(batch):
+            await self.deliver(text)
+
+    async def deliver(self, text, attempts=3):
+        """Tek mesajı hız limitine ve RetryAfter yanıtlarına uyarak gönderir"""
+        parse_mode = 'Markdown'
+        for _ in range(attempts):
+            wait = self.min_interval - (time.monotonic() - self.last_sent)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                with latency_metrics.time('telegram_send'):
+                    await self.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=parse_mode)
+                self.last_sent = time.monotonic()
+                return True
+            except RetryAfter as e:
+                logger.warning(f"Telegram hız limiti: {e.retry_after} sn bekleniyor")
+                await asyncio.sleep(float(e.retry_after))
+            except BadRequest as e:
+                # Birleştirilmiş Markdown bozulduysa düz metin olarak gönder
+                logger.warning(f"Bildirim Markdown hatası, düz metin gönderiliyor: {e}")
+                parse_mode = None
+            except Exception as e:
+                logger.error(f"Bildirim gönderme hatası: {e}")
+                self.last_sent = time.monotonic()
+        return False
+
+
+class FakeExchange:
+    """Botun kullandığı ccxt async arayüzünü bellekte taklit eden borsa (benchmark ve deneme için).
+    Çağrı gecikmesi, hata oranı, emir dolum süresi/oranı ve transferin hesaba geçme süresi ayarlanabilir.
+    Aynı `network` sözlüğünü paylaşan sahte borsalar arasında çekimler karşı tarafa yatırma olarak düşer."""
+
+    def __init__(self, exchange_id, coins, prices=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 fill_delay=0.0, fill_ratio=1.0, transfer_delay=0.0, taker_fee=0.001, withdraw_fee=0.1,
+                 networks=(USDT_NETWORK,), balance=1e6, network=None, seed=None):
+        self.id = exchange_id
+        self.name = f"{exchange_id} (fake)"
+        self.latency = latency  # Her çağrıya eklenen gecikme (saniye)
+        self.jitter = latency and jitter  # Gecikmeye eklenen rastgele [0, jitter) saniye
+        self.error_rate = error_rate  # Çağrıların ccxt.NetworkError ile başarısız olma olasılığı
+        self.fill_delay = fill_delay  # Market emrinin kapanma süresi (0: oluşturma yanıtında kapalı)
+        self.fill_ratio = fill_ratio  # Emrin gerçekleşen oranı (kısmi dolum için < 1)
+        self.transfer_delay = transfer_delay  # Çekimden karşı borsada hesaba geçişe kadar (saniye)
+        self.taker_fee = taker_fee
+        self.withdraw_fee = withdraw_fee  # Coin cinsinden, tüm coinler ve USDT için
+        self.networks = tuple(networks)  # Tüm varlıklarda çekim/yatırmaya açık ağlar
+        self.random = random.Random(seed)
+        self.prices = dict(prices or {})  # Coin -> (bid, ask)
+        for coin in coins:
+            self.prices.setdefault(coin, (1.0, 1.001))
+        self.markets = {}
+        self.currencies = {}
+        self.balances = {coin: balance for coin in self.prices}
+        self.balances['USDT'] = balance
+        self.orders = {}
+        self.withdrawals = []
+        self.deposits = []
+        self.calls = {}  # Yöntem -> çağrı sayısı
+        self.sequence = 0
+        self.network = network if network is not None else {}  # Borsa kimliği -> FakeExchange
+        self.network[self.id] = self
+
+    async def _call(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        delay = self.latency + (self.random.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise ccxt.NetworkError(f"{self.id} {method}: simüle edilmiş ağ hatası")
+
+    def _next_id(self):
+        self.sequence += 1
+        return f"{self.id}-{self.sequence}"
+
+    def set_price(self, coin, bid, ask):
+        self.prices[coin] = (bid, ask)
+
+    def build_markets(self):
+        markets = {
+            f"{coin}/USDT": {
+                'id': f"{coin}_USDT", 'symbol': f"{coin}/USDT", 'base': coin, 'quote': 'USDT',
+                'spot': True, 'active': True, 'taker': self.taker_fee,
+                'precision': {'amount': 1e-8, 'price': 1e-8},
+                'limits': {'amount': {'min': 1e-8, 'max': None}, 'cost': {'min': 1.0, 'max': None}},
+            }
+            for coin in self.prices
+        }
+        currencies = {
+            code: {'id': code, 'code': code, 'networks': {network: {
+                'id': network, 'network': network, 'fee': self.withdraw_fee, 'withdraw': True, 'deposit': True,
+                'limits': {'withdraw': {'min': 0.0, 'max': None}},
+            } for network in self.networks}}
+            for code in list(self.prices) + ['USDT']
+        }
+        return markets, currencies
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        if currencies is not None:
+            self.currencies = currencies
+        return markets
+
+    async def load_markets(self, reload=False):
+        if self.markets and not reload:
+            return self.markets
+        await self._call('load_markets')
+        return self.set_markets(*self.build_markets())
+
+    async def fetch_currencies(self, params=None):
+        await self._call('fetch_currencies')
+        return self.build_markets()[1]
+
+    async def fetch_deposit_withdraw_fees(self, codes=None, params=None):
+        await self._call('fetch_deposit_withdraw_fees')
+        return {
+            code: {'networks': {
+                network: {'withdraw': {'fee': self.withdraw_fee, 'percentage': False}} for network in self.networks
+            }}
+            for code in (codes or list(self.prices) + ['USDT'])
+        }
+
+    def _ticker(self, symbol):
+        bid, ask = self.prices[symbol.split('/')[0]]
+        return {'symbol': symbol, 'bid': bid, 'ask': ask, 'bidVolume': 1000.0, 'askVolume': 1000.0,
+                'timestamp': int(time.time() * 1000)}
+
+    async def fetch_ticker(self, symbol, params=None):
+        await self._call('fetch_ticker')
+        return self._ticker(symbol)
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        await self._call('fetch_tickers')
+        symbols = symbols or [f"{coin}/USDT" for coin in self.prices]
+        return {symbol: self._ticker(symbol) for symbol in symbols if symbol.split('/')[0] in self.prices}
+
+    async def fetch_order_book(self, symbol, limit=None, params=None):
+        await self._call('fetch_order_book')
+        bid, ask = self.prices[symbol.split('/')[0]]
+        # Her kademe %0.05 uzaklaşır ve ~10.000 USDT'lik miktar taşır
+        levels = range(limit or 20)
+        return {
+            'symbol': symbol,
+            'bids': [[bid * (1 - 0.0005 * i), 10000.0 / bid] for i in levels],
+            'asks': [[ask * (1 + 0.0005 * i), 10000.0 / ask] for i in levels],
+            'nonce': self.sequence,
+            'timestamp': int(time.time() * 1000),
+        }
+
+    async def fetch_balance(self, params=None):
+        await self._call('fetch_balance')
+        return {'free': dict(self.balances), 'used': {}, 'total': dict(self.balances)}
+
+    def _fill(self, order):
+        """Dolum süresi geçmiş emri kapatır ve bakiyelere yansıtır"""
+        if order['status'] != 'open' or time.monotonic() < order['ready_at']:
+            return order
+        base, quote = order['symbol'].split('/')
+        bid, ask = self.prices[base]
+        if order['side'] == 'buy':
+            # createMarketBuyOrderRequiresPrice=False: miktar harcanacak USDT'dir
+            cost = min(order['amount'] * self.fill_ratio, self.balances.get(quote, 0.0))
+            filled = cost / ask
+            fee = {'currency': base, 'cost': filled * self.taker_fee}
+            self.balances[quote] = self.balances.get(quote, 0.0) - cost
+            self.balances[base] = self.balances.get(base, 0.0) + filled - fee['cost']
+            price = ask
+        else:
+            filled = min(order['amount'] * self.fill_ratio, self.balances.get(base, 0.0))
+            cost = filled * bid
+            fee = {'currency': quote, 'cost': cost * self.taker_fee}
+            self.balances[base] = self.balances.get(base, 0.0) - filled
+            self.balances[quote] = self.balances.get(quote, 0.0) + cost - fee['cost']
+            price = bid
+        order.update({
+            'status': 'closed', 'filled': filled, 'cost': cost, 'average': price, 'price': price,
+            'remaining': 0.0 if order['side'] == 'sell' else None, 'fee': fee, 'fees': [fee],
+        })
+        return order
+
+    async def _create_order(self, symbol, side, amount):
+        await self._call(f"create_market_{side}_order")
+        if symbol.split('/')[0] not in self.prices:
+            raise ccxt.BadSymbol(f"{self.id} {symbol} marketi yok")
+        order = {
+            'id': self._next_id(), 'symbol': symbol, 'type': 'market', 'side': side, 'amount': amount,
+            'status': 'open', 'filled': 0.0, 'cost': 0.0, 'average': None, 'price': None,
+            'timestamp': int(time.time() * 1000), 'ready_at': time.monotonic() + self.fill_delay,
+        }
+        self.orders[order['id']] = order
+        return dict(self._fill(order))
+
+    async def create_market_buy_order(self, symbol, amount, params=None):
+        return await self._create_order(symbol, 'buy', amount)
+
+    async def create_market_sell_order(self, symbol, amount, params=None):
+        return await self._create_order(symbol, 'sell', amount)
+
+    async def fetch_order(self, id, symbol=None, params=None):
+        await self._call('fetch_order')
+        if id not in self.orders:
+            raise ccxt.OrderNotFound(f"{self.id} emri {id} bulunamadı")
+        return dict(self._fill(self.orders[id]))
+
+    async def fetch_deposit_address(self, code, params=None):
+        await self._call('fetch_deposit_address')
+        network = (params or {}).get('network', self.networks[0])
+        return {'currency': code, 'address': f"fake:{self.id}:{code}", 'tag': None, 'network': network}
+
+    async def withdraw(self, code, amount, address, tag=None, params=None):
+        await self._call('withdraw')
+        if self.balances.get(code, 0.0) < amount:
+            raise ccxt.InsufficientFunds(f"{self.id} {code} bakiyesi yetersiz ({self.balances.get(code, 0.0)} < {amount})")
+        self.balances[code] -= amount
+        now = time.monotonic()
+        record = {
+            'id': self._next_id(), 'txid': f"0x{self.id}{self.sequence:08x}", 'currency': code, 'amount': amount,
+            'address': address, 'tag': tag, 'network': (params or {}).get('network'), 'status': 'pending',
+            'timestamp': int(time.time() * 1000), 'fee': {'currency': code, 'cost': self.withdraw_fee},
+            'ready_at': now + self.transfer_delay,
+        }
+        self.withdrawals.append(record)
+        # Adres bu ağdaki bir sahte borsaya aitse transfer süresi sonunda orada hesaba geçer
+        parts = (address or '').split(':')
+        destination = self.network.get(parts[1]) if len(parts) == 3 and parts[0] == 'fake' else None
+        if destination is not None:
+            destination.deposits.append({**record, 'id': destination._next_id(), 'amount': amount - self.withdraw_fee, 'fee': None})
+        return {k: v for k, v in record.items() if k != 'ready_at'}
+
+    @staticmethod
+    def _transfer_records(records, code):
+        """Süresi dolan transferleri 'ok' olarak, iç alanlar olmadan döndürür"""
+        now = time.monotonic()
+        return [
+            {**{k: v for k, v in record.items() if k not in ('ready_at', 'credited')},
+             'status': 'ok' if now >= record['ready_at'] else 'pending'}
+            for record in records if not code or record['currency'] == code
+        ]
+
+    async def fetch_withdrawals(self, code=None, since=None, limit=None, params=None):
+        await self._call('fetch_withdrawals')
+        return self._transfer_records(self.withdrawals, code)
+
+    async def fetch_deposits(self, code=None, since=None, limit=None, params=None):
+        await self._call('fetch_deposits')
+        # Hesaba geçen yatırmalar bakiyeye bir kez eklenir
+        now = time.monotonic()
+        for record in self.deposits:
+            if now >= record['ready_at'] and not record.get('credited'):
+                record['credited'] = True
+                self.balances[record['currency']] = self.balances.get(record['currency'], 0.0) + record['amount']
+        return self._transfer_records(self.deposits, code)
+
+    async def close(self):
+        pass
+
+
+def calculate_depth_profit(buy_asks, sell_bids, trade_amount_usdt, transfer_fee, min_profit_percentage=0.0):
+    """Emir defteri kademelerini yürüyerek gerçekleşebilir VWAP, kayma ve kârı hesaplar.
+
+    buy_asks: alış yapılacak borsanın satış kademeleri [(fiyat, miktar), ...] (artan fiyat)
+    sell_bids: satış yapılacak borsanın alış kademeleri [(fiyat, miktar), ...] (azalan fiyat)
+    transfer_fee: coin cinsinden çekim ücreti
+    Defterlerden biri boşsa None döner.
+    """
+    asks = np.asarray(buy_asks, dtype=np.float64).reshape(-1, 2) if len(buy_asks) else None
+    bids = np.asarray(sell_bids, dtype=np.float64).reshape(-1, 2) if len(sell_bids) else None
+    if asks is None or bids is None or trade_amount_usdt <= 0:
+        return None
+
+    # Kümülatif miktar/tutar eğrileri (başa 0 eklenir ki np.interp doğrusal parçalı eğriyi tam versin)
+    ask_qty = np.concatenate(([0.0], np.cumsum(asks[:, 1])))
+    ask_cost = np.concatenate(([0.0], np.cumsum(asks[:, 0] * asks[:, 1])))
+    bid_qty = np.concatenate(([0.0], np.cumsum(bids[:, 1])))
+    bid_revenue = np.concatenate(([0.0], np.cumsum(bids[:, 0] * bids[:, 1])))
+
+    def profit_for(budget):
+        # budget (USDT) harcanınca alınan coin, ücret düşülünce satılan coin ve gelir
+        coins = np.interp(budget, ask_cost, ask_qty)
+        sellable = np.clip(coins - transfer_fee, 0.0, bid_qty[-1])
+        revenue = np.interp(sellable, bid_qty, bid_revenue)
+        return coins, sellable, revenue, revenue - budget
+
+    budget = min(float(trade_amount_usdt), ask_cost[-1])
+    coins, sellable, revenue, profit = profit_for(budget)
+    if coins <= 0 or sellable <= 0:
+        return None
+
+    buy_vwap = budget / coins
+    sell_vwap = revenue / sellable
+    best_ask = asks[0, 0]
+    best_bid = bids[0, 0]
+
+    # Maksimum kârlı büyüklük: kâr eğrisi, alış defterinin kümülatif tutar noktaları ile
+    # satış defteri kademelerine denk gelen alış tutarlarında kırılan doğrusal parçalı bir fonksiyondur.
+    grid = np.union1d(ask_cost[1:], np.interp(bid_qty[1:] + transfer_fee, ask_qty, ask_cost))
+    grid = grid[grid > 0]
+    _, _, _, grid_profit = profit_for(grid)
+    threshold = grid_profit - (min_profit_percentage / 100.0) * grid
+    max_profitable_usdt = 0.0
+    passing = np.nonzero(threshold >= 0)[0]
+    if passing.size:
+        last = passing[-1]
+        max_profitable_usdt = grid[last]
+        if last + 1 < grid.size:
+            # Eşik, iki kırılma noktası arasında doğrusal olarak kesilir
+            t0, t1 = threshold[last], threshold[last + 1]
+            max_profitable_usdt += (grid[last + 1] - grid[last]) * t0 / (t0 - t1)
+    best_index = int(np.argmax(grid_profit))
+
+    return {
+        'buy_vwap': float(buy_vwap),
+        'sell_vwap': float(sell_vwap),
+        'buy_slippage_percentage': float((buy_vwap / best_ask - 1) * 100),
+        'sell_slippage_percentage': float((1 - sell_vwap / best_bid) * 100),
+        'expected_coin_amount': float(coins),
+        'sellable_coin_amount': float(sellable),
+        'profit': float(profit),
+        'profit_percentage': float(profit / budget * 100),
+        'fillable_usdt': float(budget),
+        'fully_fillable': bool(budget >= trade_amount_usdt and coins - transfer_fee <= bid_qty[-1]),
+        'max_profitable_usdt': float(max_profitable_usdt),
+        'optimal_usdt': float(grid[best_index]),
+        'optimal_profit': float(grid_profit[best_index]),
+    }
+
+
+def best_spread_pairs(bids, asks, transfer_fees, min_withdraws, trade_amount_usdt):
+    """Coin x borsa alış/satış matrislerinden her coin için en kârlı (alış borsası, satış borsası) çiftini
+    dizi işlemleriyle bulur. bids/asks: (C, E), fiyat yoksa NaN. transfer_fees/min_withdraws: (C, E, E)
+    [coin, alış borsası, satış borsası], transfer yolu yoksa NaN. Çekilebilir çiftler önceliklidir.
+    Dönüş: alış indeksleri, satış indeksleri, tahmini kâr yüzdeleri (geçerli çift yoksa -inf)."""
+    coin_count, exchange_count = asks.shape
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coins_bought = (trade_amount_usdt / asks)[:, :, None]  # Alış borsasında alınan miktar
+        coins_sold = coins_bought - transfer_fees  # Transfer ücreti düşülmüş, satış borsasına giden miktar
+        profit_percentage = (coins_sold * bids[:, None, :] / trade_amount_usdt - 1) * 100
+        valid = np.isfinite(profit_percentage) & (coins_sold > 0)
+        withdrawable = valid & ~(coins_bought < min_withdraws)  # plan_withdrawal kuralı; NaN minimum = sınır yok
+    profit_percentage = profit_percentage.reshape(coin_count, -1)
+    rows = np.arange(coin_count)
+    preferred = np.where(withdrawable.reshape(coin_count, -1), profit_percentage, -np.inf)
+    best = preferred.argmax(axis=1)
+    # Hiç çekilebilir çift yoksa (gösterim için) en iyi geçerli çift seçilir
+    fallback = ~np.isfinite(preferred[rows, best])
+    if fallback.any():
+        scores = np.where(valid.reshape(coin_count, -1), profit_percentage, -np.inf)
+        best[fallback] = scores[fallback].argmax(axis=1)
+        preferred[fallback] = scores[fallback]
+    buy_index, sell_index = np.divmod(best, exchange_count)
+    return buy_index, sell_index, preferred[rows, best]
 
 
 class ArbitrageBot:
@@ -38,10 +2092,91 @@ class ArbitrageBot:
         self.min_profit_percentage = 2.0  # Minimum %2 kâr
         self.trade_amount_usdt = 100  # Varsayılan işlem miktarı
         self.check_interval = 30  # 30 saniye kontrol aralığı
+        # REST tarama modunda evren her aralıkta topluca değil, coin başına uyarlanır aralıklarla yoklanır
+        # (check_interval geçmişi olmayan coinlerin ilk aralığı olur)
+        self.poll_scheduler = PollScheduler() if ADAPTIVE_POLLING else None
+        # SCAN_WORKERS > 0 iken tarayıcı modunda taramayı işçi süreçler yapar (main içinde başlatılır)
+        self.shard_pool = None
+        
+        # Tarayıcı modu: tek coin yerine coin evrenindeki tüm coinleri her döngüde tarar
+        self.scan_mode = False
+        self.coin_universe = [c.strip().upper() for c in SCAN_COINS.split(',') if c.strip()]
+        self.universe_from_markets = not self.coin_universe  # SCAN_COINS boşsa evren market verisinden türetilir
+        
+        # Akış (WebSocket) verileri: açıkken fiyatlar REST yerine bellekteki defterlerden okunur
+        self.streaming_enabled = STREAMING_ENABLED
+        self.order_book_store = OrderBookStore()
+        self.quote_engine = None
+        self.max_quote_age = 5  # Saniye; bundan eski defterler kullanılmaz
+        # Akış açıkken fırsatlar sabit aralıkla değil, fiyat değiştikçe değerlendirilir
+        self.evaluator = OpportunityEvaluator(debounce=0.05)
+        self.order_book_store.add_listener(self.on_quote_update)
+        
+        # Tick kaydı (replay, spread analizi ve kaçan işlemlerin incelenmesi için)
+        self.tick_recorder = TickRecorder() if TICK_RECORDING else None
+        self.tick_flush_task = None
+        if self.tick_recorder:
+            self.order_book_store.add_listener(self.record_book_update)
         
-        # Exchange bağlantıları
+        # Derinlik (VWAP) hesaplaması
+        self.depth_levels = 20  # Her defterden kullanılacak kademe sayısı
+        self.max_slippage_percentage = 0.5  # Gerçekleşen alışın VWAP ile beklenen miktardan izin verilen sapması (%)
+        self.quote_deadline = QUOTE_DEADLINE  # İşlem yolu fırsatın fiyat görüntüsünü en fazla bu yaşta kullanır (saniye)
+        
+        # Exchange bağlantıları: tüm borsalar kayıtta tutulur, Gate.io/MEXC kısayolları akış ve sabit
+        # cüzdan adresleri gibi borsaya özgü kısımlar için korunur
+        self.exchanges = ExchangeRegistry()
         self.gate_exchange = None
         self.mexc_exchange = None
+        # Tüm borsa istemcilerinin paylaştığı bağlantı havuzu (initialize_exchanges içinde oluşturulur);
+        # emir sunucularına bağlantılar arka planda sıcak tutulur
+        self.http_session = None
+        self.prewarm_task = None
+        # Transfer yolu satırları (coin başına alış x satış) ücret kayıtları değişene kadar önbellekte tutulur
+        self.route_cache = None
+        self.route_cache_ttl = 60  # Saniye; kayıt süreleri dolan yollar için üst sınır
+        # float64 elemenin kesin (Decimal) hesapla yuvarlama farkına karşı eşiğe eklenen pay (yüzde puanı)
+        self.screen_margin_percentage = 1e-6
+        self.ticker_cache = {}  # Akışı olmayan borsalar için akış modunda kısa süreli ticker önbelleği
+        
+        # Market verisi önbelleği
+        self.market_cache = MarketCache()
+        self.markets_version = 0  # refresh_markets her yenilemede artırır
+        self.market_refresh_task = None
+        
+        # Çekim ücreti / ağ kayıtları (get_transfer_info bunlardan okur)
+        self.fee_registry = FeeRegistry()
+        # Gidiş-dönüşü tamamlanabilecek coinler; tarayıcı, /coin ve işlem yolu API çağrısı yapmadan buna bakar
+        self.eligibility = EligibilityIndex(self.fee_registry)
+        # Emir/çekim miktarları gönderilmeden önce market hassasiyet ve limitleriyle yerelde yuvarlanıp doğrulanır
+        self.order_builder = OrderBuilder()
+        self.fee_refresh_task = None
+        
+        # Emir gerçekleşme ve transfer takibi (sabit beklemeler + bakiye sorguları yerine)
+        self.order_tracker = OrderTracker()
+        self.transfer_watcher = TransferWatcher()
+        self.trades = deque(maxlen=50)  # Son işlemler ve durumları (/trades)
+        
+        # Bildirimler kuyruktan arka planda gönderilir; işlem yolu hiçbir zaman Telegram'ı beklemez
+        self.notifier = NotificationDispatcher(ADMIN_CHAT_ID)
+        
+        # Arka plan işlemleri: izleme döngüsü işlem sürerken fırsatları değerlendirmeye devam eder
+        self.trade_limiter = TradeLimiter(MAX_CONCURRENT_TRADES)
+        self.shutting_down = False  # Kapanışta sırada bekleyen işlemler başlatılmaz
+        self.active_trades = set()  # Çalışan veya sırada bekleyen işlem görevleri
+        self.trading_coins = set()  # Coin başına kilit: aynı coinde iki işlem açılmaz
+        # Borsa bakiyesini tüketen emirler (alış/satış) borsa başına sıralı verilir
+        self.balance_locks = {}  # Borsa adı -> kilit (initialize_exchanges içinde her borsa için oluşturulur)
+        
+        # Envanter modu
+        self.inventory_mode = INVENTORY_MODE
+        self.inventory_coins = [c.strip().upper() for c in INVENTORY_COINS.split(',') if c.strip()] or [self.current_coin]
+        self.inventory = {}  # Borsa -> varlık -> serbest bakiye (önbellek)
+        self.inventory_reserved = {}  # (borsa, varlık) -> süren envanter işlemlerinin ayırdığı miktar
+        self.inventory_version = 0  # Her bakiye sorgusunda artar; süren işlem önbelleğin yenilendiğini bununla anlar
+        self.pending_rebalances = {}  # Varlık -> süren dengeleme görevi
+        self.deposit_addresses = {}
+        self.rebalance_task = None
         
         # İstatistikler
         self.stats = {
@@ -51,416 +2186,1304 @@ class ArbitrageBot:
             'last_trade_time': None
         }
     
-    async def initialize_exchanges(self):
-        """Exchange bağlantılarını başlatır"""
+    async def initialize_exchanges(self, trading=True, background_tasks=True):
+        """Exchange bağlantılarını başlatır (trading kapalıysa yalnızca tarama için: emir
+        bağlantıları ısıtılmaz, envanter dengelenmez; background_tasks kapalıysa market/ücret
+        verisi yenilenmez, tarama işçilerinde olduğu gibi dışarıdan beslenir)"""
         try:
-            self.gate_exchange = ccxt.gateio({
+            # Tüm istemciler tek bir ayarlı bağlantı havuzunu paylaşır (istemci başına ayrı oturum yerine)
+            self.http_session = create_http_session()
+            self.exchanges.session = self.http_session
+            # Düzeltme: Gate.io (ve MEXC) market buy için fiyat istemesin (ExchangeRegistry varsayılanı)
+            self.gate_exchange = self.exchanges.add('gate', 'gateio', {
                 'apiKey': self.gate_api_key,
                 'secret': self.gate_secret,
-                'sandbox': False,
-                'enableRateLimit': True,
-                'options': {
-                    'defaultType': 'spot', # Ensure spot trading
-                    'createMarketBuyOrderRequiresPrice': False, # Düzeltme: Gate.io market buy için fiyat istemesin
-                },
             })
-            
-            self.mexc_exchange = ccxt.mexc({
+            self.mexc_exchange = self.exchanges.add('mexc', 'mexc', {
                 'apiKey': self.mexc_api_key,
                 'secret': self.mexc_secret,
-                'sandbox': False,
-                'enableRateLimit': True,
-                'options': {
-                    'defaultType': 'spot', # Ensure spot trading
-                },
             })
-            
-            # Bağlantıları test et
-            await self.gate_exchange.load_markets()
-            await self.mexc_exchange.load_markets()
-            
-            logger.info("Exchange bağlantıları başarıyla kuruldu")
+            self.exchanges.add_from_env(EXTRA_EXCHANGES)
+            await self.setup_exchanges(background_tasks=background_tasks, trading=trading)
+            logger.info(f"Exchange bağlantıları başarıyla kuruldu: {', '.join(self.exchanges.names())}")
             return True
             
         except Exception as e:
             logger.error(f"Exchange bağlantısında hata: {e}")
             if ADMIN_CHAT_ID:
                 # Admin'e hata bildirimi gönder
-                await self.send_admin_message(f"🚨 **Hata: Exchange bağlantısı kurulamadı!**\n\nDetay: `{e}`")
+                self.send_admin_message(f"🚨 **Hata: Exchange bağlantısı kurulamadı!**\n\nDetay: `{e}`")
             return False
     
-    async def send_admin_message(self, message: str):
-        """Admin chat ID'ye mesaj gönderir."""
-        if ADMIN_CHAT_ID:
+    async def setup_exchanges(self, background_tasks=True, trading=True):
+        """Kayıttaki borsalar için kilitleri, market verisini ve ücret kayıtlarını hazırlar;
+        background_tasks açıksa yenileme döngülerini, trading de açıksa dengeleme ve bağlantı ısıtma döngülerini başlatır"""
+        self.balance_locks = {name: asyncio.Lock() for name in self.exchanges.names()}
+        self.inventory = {name: {} for name in self.exchanges.names()}
+        
+        # Market verisini tüm borsalar için eşzamanlı yükle (önbellek varsa diskten)
+        cache_ages = await asyncio.gather(
+            *(self.load_exchange_markets(exchange) for _, exchange in self.exchanges.items())
+        )
+
+        if self.universe_from_markets:
+            self.coin_universe = self.build_default_universe()
+
+        # Ücret kayıtlarını eldeki currency verisiyle doldur, ardından arka planda canlı verilerle yenile
+        for (name, exchange), age in zip(self.exchanges.items(), cache_ages):
+            self.fee_registry.update_from_currencies(name, exchange.currencies or {}, time.time() - age)
+        for name, exchange in self.exchanges.items():
+            self.eligibility.update_markets(name, exchange.markets)
+            self.order_builder.load(name, exchange)
+        self.eligibility.refresh()
+        if not background_tasks:
+            return
+        self.fee_refresh_task = asyncio.create_task(self.fee_refresh_loop())
+        if self.tick_recorder:
+            self.tick_flush_task = asyncio.create_task(self.tick_flush_loop())
+
+        # Önbellek süresi dolduğunda market verisi arka planda yenilenir
+        first_refresh = max(0, self.market_cache.ttl - max(cache_ages))
+        self.market_refresh_task = asyncio.create_task(self.market_refresh_loop(first_refresh))
+        if not trading:
+            return
+        self.rebalance_task = asyncio.create_task(self.inventory_rebalance_loop())
+        if self.http_session:
+            self.prewarm_task = asyncio.create_task(self.connection_warm_loop())
+
+    async def prewarm_connections(self):
+        """Emir uç noktalarının sunucularına HTTP_PREWARM_CONNECTIONS adet bağlantıyı eşzamanlı açar (veya
+        havuzdakileri kullanarak canlı tutar); emir anında soğuk TLS el sıkışması beklenmez. Açılan host sayısını döndürür."""
+        hosts = sorted({host for name in self.exchanges.names() for host in self.exchanges.private_hosts(name)})
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        async def touch(host):
+            # Yanıt kodu önemsiz (kök adres 404 dönebilir); gövde okunup bağlantı havuza geri bırakılır
+            async with self.http_session.head(host, timeout=timeout, allow_redirects=False) as response:
+                await response.read()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(touch(host) for host in hosts for _ in range(HTTP_PREWARM_CONNECTIONS)), return_exceptions=True
+        )
+        failed = {host for host, result in zip(
+            (host for host in hosts for _ in range(HTTP_PREWARM_CONNECTIONS)), results
+        ) if isinstance(result, Exception)}
+        for host in failed:
+            logger.warning(f"{host} bağlantısı ısıtılamadı")
+        logger.debug(f"Bağlantılar ısıtıldı: {', '.join(hosts)} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return len(hosts) - len(failed)
+
+    async def connection_warm_loop(self):
+        """Boştaki bağlantılar HTTP_KEEPALIVE ile kapanmadan önce emir sunucularına bağlantıları yeniler"""
+        while True:
             try:
-                # Telegram bot objesine dışarıdan erişmek için bir yol:
-                # Bu bot sınıfının doğrudan Telegram Application objesine erişimi olmadığından,
-                # bu fonksiyonu çağırırken bot objesini veya context'i parametre olarak geçmelisiniz.
-                # Şimdilik, bot objesi main'de tanımlandığı için dışarıdan erişilemez.
-                # Bu yüzden, monitoring_loop ve execute_arbitrage_trade'deki
-                # `context.bot.send_message` kullanımları daha doğru.
-                # Eğer başka yerlerden de admin mesajı göndermek isterseniz,
-                # bot objesini __init__ içinde tutmak veya bir 'context' parametresi eklemek gerekebilir.
-                # Örnek: await self.application.bot.send_message(chat_id=ADMIN_CHAT_ID, text=message, parse_mode='Markdown')
-                pass
+                await self.prewarm_connections()
             except Exception as e:
-                logger.error(f"Admin mesajı gönderme hatası: {e}")
+                logger.error(f"Bağlantı ısıtma hatası: {e}")
+            await asyncio.sleep(max(1, HTTP_KEEPALIVE / 2))
 
-    async def get_price_from_gate(self, symbol):
-        """Gate.io'dan fiyat bilgisi alır"""
-        try:
-            ticker = await self.gate_exchange.fetch_ticker(f"{symbol}/USDT")
-            return ticker['bid']  # Alış fiyatı (en yüksek alım emri)
-        except Exception as e:
-            logger.error(f"Gate.io fiyat alma hatası: {e}")
-            if ADMIN_CHAT_ID:
-                await self.send_admin_message(f"🚨 **Hata: Gate.io fiyat bilgisi alınamadı!**\n\nCoin: `{symbol}`\nDetay: `{e}`")
+    async def shutdown(self):
+        """Arka plan görevlerini iptal eder, akışı durdurur, borsa istemcilerini ve paylaşılan HTTP oturumunu kapatır"""
+        self.is_running = False
+        await self.finish_active_trades()
+        tasks = [
+            task for task in (self.fee_refresh_task, self.market_refresh_task, self.rebalance_task,
+                              self.tick_flush_task, self.prewarm_task, *self.pending_rebalances.values())
+            if task
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.shard_pool:
+            await self.shard_pool.stop()
+        await self.stop_streaming()
+        # İstemciler paylaşılan oturumu kapatmaz (ccxt own_session=False); oturum en son kapatılır
+        await self.exchanges.close()
+        if self.http_session:
+            await self.http_session.close()
+            self.http_session = None
+        if self.tick_recorder:
+            self.tick_recorder.close()
+
+    async def finish_active_trades(self, timeout=SHUTDOWN_TRADE_TIMEOUT):
+        """Kapanışta sıradaki işlemleri başlatmaz, süren işlemlerin bitmesini timeout kadar bekler ve
+        bitmeyenleri iptal eder; borsa istemcileri ve oturum ancak bundan sonra kapatılır"""
+        self.shutting_down = True
+        trades = set(self.active_trades)
+        if not trades:
+            return
+        logger.info(f"Kapanış: {len(trades)} işlemin bitmesi bekleniyor ({', '.join(sorted(self.trading_coins))})")
+        _, pending = await asyncio.wait(trades, timeout=timeout)
+        if pending:
+            coins = ', '.join(sorted(self.trading_coins))
+            logger.warning(f"Kapanışta {timeout:g} sn içinde bitmeyen işlemler iptal ediliyor: {coins}")
+            self.send_admin_message(f"🚨 **Kapanışta yarıda kalan işlemler iptal edildi:** {coins}\nBakiyeleri ve açık transferleri kontrol edin.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def load_exchange_markets(self, exchange):
+        """Market verisini önbellekten (varsa) ya da ağdan yükler; verinin yaşını saniye olarak döndürür"""
+        cached = self.market_cache.load(exchange.id)
+        if cached:
+            markets, currencies, age = cached
+            exchange.set_markets(markets, currencies)
+            logger.info(f"{exchange.id} market verisi önbellekten yüklendi ({len(markets)} market, {age:.0f} sn önce kaydedilmiş)")
+            return age
+
+        await exchange.load_markets(reload=True)
+        await asyncio.to_thread(self.market_cache.save, exchange.id, exchange.markets, exchange.currencies)
+        logger.info(f"{exchange.id} market verisi ağdan yüklendi ({len(exchange.markets)} market)")
+        return 0
+
+    async def refresh_markets(self):
+        """Tüm borsaların market verisini ağdan eşzamanlı yeniler ve önbelleğe yazar"""
+        await asyncio.gather(
+            *(exchange.load_markets(reload=True) for _, exchange in self.exchanges.items())
+        )
+        for name, exchange in self.exchanges.items():
+            # Sıkıştırma/yazma event loop'u bloklamasın
+            await asyncio.to_thread(self.market_cache.save, exchange.id, exchange.markets, exchange.currencies)
+            self.eligibility.update_markets(name, exchange.markets)
+            self.order_builder.load(name, exchange)
+        self.markets_version += 1  # Tarama işçileri önbellekten yeniden yükler
+
+        if self.universe_from_markets:
+            self.coin_universe = self.build_default_universe()
+
+    async def market_refresh_loop(self, first_delay):
+        """Market önbelleğini TTL aralıklarıyla arka planda yeniler"""
+        delay = first_delay
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.market_cache.ttl
+            try:
+                await self.refresh_markets()
+                logger.info("Market verisi arka planda yenilendi")
+            except Exception as e:
+                logger.error(f"Market verisi yenileme hatası: {e}")
+                delay = 60  # Geçici hatada kısa süre sonra tekrar dene
+
+    def send_admin_message(self, message: str, key=None):
+        """Admin chat ID'ye mesajı kuyruk üzerinden gönderir; çağıran Telegram'ı beklemez"""
+        self.notifier.submit(message, key)
+
+    def on_quote_update(self, exchange, symbol):
+        """Akıştan gelen her defter güncellemesinde ilgili coini değerlendirme kuyruğuna ekler"""
+        self.evaluator.mark_dirty(symbol.split('/')[0])
+
+    def record_book_update(self, exchange, symbol):
+        """Akıştan gelen her defter güncellemesini tick kaydına ekler"""
+        book = self.order_book_store.get(exchange, symbol)
+        if book and book.valid:
+            depth = self.tick_recorder.depth
+            self.tick_recorder.record(exchange, symbol.split('/')[0], book.levels('bids', depth), book.levels('asks', depth))
+
+    async def tick_flush_loop(self, interval=5):
+        """Tamponlanan tick kayıtlarını düzenli aralıklarla diske yazar (çökme sonrası inceleme için)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.tick_recorder.flush()
+            except Exception as e:
+                logger.error(f"Tick kaydı yazma hatası: {e}")
+
+    def scan_pacing(self):
+        """İzleme turunun nasıl tetiklendiğini döndürür: 'stream' (akışta defteri değişen coinler),
+        'poll' (REST tarayıcıda vadesi gelen coinler) veya 'interval' (check_interval aralıklarla)"""
+        if self.quote_engine is not None:
+            return 'stream'
+        if self.scan_mode and self.poll_scheduler is not None:
+            return 'poll'
+        return 'interval'
+
+    async def next_scan_batch(self, pacing):
+        """'stream' ve 'poll' turlarında değerlendirilecek coinleri bekler; boş liste bu turda iş olmadığını gösterir"""
+        if pacing == 'stream':
+            # check_interval burada sadece sessiz dönemlerde döngünün uyanma süresidir
+            changed = await self.evaluator.next_batch(timeout=self.check_interval)
+            return [c for c in self.streaming_coins() if c in changed]
+        names = self.exchanges.names()
+        coins = self.poll_scheduler.take(self.tradable_universe(), names)
+        if not coins:
+            await asyncio.sleep(self.poll_scheduler.delay(names))
+        return coins
+
+    def tradable_universe(self):
+        """Coin evreninden gidiş-dönüşü tamamlanabilecek olanlar (uygunluk dizinine göre)"""
+        self.eligibility.refresh()  # Ücret kaydı yenilenemeyip süresi dolan coinler hemen düşer
+        return [coin for coin in self.coin_universe if self.eligibility.is_eligible(coin)]
+
+    def streaming_coins(self):
+        """WebSocket üzerinden izlenmesi gereken coinleri döndürür"""
+        return self.tradable_universe() if self.scan_mode else [self.current_coin]
+
+    async def ensure_streaming(self):
+        """Akış açıksa, izlenen coin listesiyle uyumlu bir WebSocket motorunun çalışmasını sağlar"""
+        if not self.streaming_enabled:
+            return
+        coins = self.streaming_coins()
+        if self.quote_engine and self.quote_engine.is_running and self.quote_engine.coins == coins:
+            return
+        if self.quote_engine is None:
+            self.quote_engine = StreamingQuoteEngine(
+                self.order_book_store, snapshot_fetcher=self.fetch_gate_snapshot, session=self.http_session
+            )
+        await self.quote_engine.start(coins)
+
+    async def stop_streaming(self):
+        """WebSocket motorunu durdurur"""
+        if self.quote_engine:
+            await self.quote_engine.stop()
+            self.quote_engine = None
+
+    async def fetch_gate_snapshot(self, symbol):
+        """Gate.io artımlı akışı için REST'ten emir defteri anlık görüntüsü alır"""
+        order_book = await self.gate_exchange.fetch_order_book(symbol, 100)
+        return order_book['bids'], order_book['asks'], order_book.get('nonce')
+
+    def get_streamed_quote(self, exchange, coin):
+        """Akıştan güncel fiyatı döndürür; akış kapalıysa veya defter bayatsa None"""
+        if not self.quote_engine:
             return None
-    
-    async def get_price_from_mexc(self, symbol):
-        """MEXC'den fiyat bilgisi alır"""
+        return self.order_book_store.get_quote(exchange, f"{coin}/USDT", self.max_quote_age)
+
+    def get_streamed_tickers(self, coins):
+        """Akıştaki defterlerden borsa adı -> fetch_tickers biçiminde ticker sözlükleri üretir
+        (akışı olmayan veya verisi henüz gelmemiş borsalar dahil edilmez)"""
+        tickers = {}
+        for name in StreamingQuoteEngine.EXCHANGES:
+            streamed = {}
+            for coin in coins:
+                quote = self.get_streamed_quote(name, coin)
+                if quote:
+                    streamed[f"{coin}/USDT"] = quote
+            if streamed:
+                tickers[name] = streamed
+        return tickers
+
+    async def get_ticker(self, exchange_name, coin):
+        """Borsadaki en iyi alış/satış fiyatlarını döndürür (önce akıştan, yoksa REST'ten)"""
+        quote = self.get_streamed_quote(exchange_name, coin)
+        if quote:
+            return quote
         try:
-            ticker = await self.mexc_exchange.fetch_ticker(f"{symbol}/USDT")
-            return ticker['ask']  # Satış fiyatı (en düşük satış emri)
+            with latency_metrics.time('ticker_fetch', exchange_name):
+                ticker = await self.exchange_by_name(exchange_name).fetch_ticker(f"{coin}/USDT")
+            if self.tick_recorder:
+                self.tick_recorder.record_ticker(exchange_name, coin, ticker)
+            return {'bid': ticker['bid'], 'ask': ticker['ask']}
         except Exception as e:
-            logger.error(f"MEXC fiyat alma hatası: {e}")
+            label = EXCHANGE_NAMES[exchange_name]
+            logger.error(f"{label} fiyat alma hatası: {e}")
             if ADMIN_CHAT_ID:
-                await self.send_admin_message(f"🚨 **Hata: MEXC fiyat bilgisi alınamadı!**\n\nCoin: `{symbol}`\nDetay: `{e}`")
+                self.send_admin_message(f"🚨 **Hata: {label} fiyat bilgisi alınamadı!**\n\nCoin: `{coin}`\nDetay: `{e}`", key=f"{exchange_name}_price:{coin}")
             return None
     
-    async def get_transfer_fee(self, symbol):
-        """Transfer ücreti hesaplar (yaklaşık)"""
-        # BU DEĞERLER GERÇEK API'DEN ALINMALI VEYA GÜNCEL TUTULMALIDIR.
-        # Sabit değerler piyasa koşullarına göre değişebilir ve yanlış kâr hesaplamalarına yol açabilir.
-        transfer_fees = {
-            'WHITE': 0.1,  # Örnek değer (Bu değeri Gate.io'nun WHITE çekme ücretinden kontrol edin)
-            'BTC': 0.0005, # Örnek değer
-            'ETH': 0.01, # Örnek değer
-            'BNB': 0.01 # Örnek değer
+    def build_default_universe(self):
+        """En az iki borsada aktif USDT paritesi olan coinleri döndürür"""
+        listings = {}
+        for _, exchange in self.exchanges.items():
+            for base in EligibilityIndex.usdt_bases(exchange.markets):
+                listings[base] = listings.get(base, 0) + 1
+        universe = sorted(base for base, count in listings.items() if count >= 2)
+        logger.info(f"Varsayılan coin evreni oluşturuldu: {len(universe)} coin")
+        return universe
+
+    async def fetch_bulk_tickers(self, coins, names=None):
+        """Borsalardan toplu ticker bilgisini eşzamanlı olarak alır (borsa başına tek istek).
+        Dönüş: borsa adı -> fetch_tickers sonucu; hata veren borsa boş sözlükle döner."""
+        names = names or self.exchanges.names()
+        symbols = [f"{coin}/USDT" for coin in coins]
+        results = await asyncio.gather(
+            *(latency_metrics.timed('ticker_fetch', name, self.exchanges.get(name).fetch_tickers(symbols)) for name in names),
+            return_exceptions=True
+        )
+
+        tickers = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"{EXCHANGE_NAMES[name]} toplu ticker alma hatası: {result}")
+                result = {}
+            elif self.tick_recorder:
+                for symbol, ticker in result.items():
+                    self.tick_recorder.record_ticker(name, symbol.split('/')[0], ticker)
+            tickers[name] = result
+        return tickers
+
+    async def get_tickers(self, coins):
+        """Tarama için borsa adı -> ticker sözlüklerini döndürür. Akış açıkken Gate.io/MEXC bellekten okunur,
+        akışı olmayan borsalar REST'ten toplu çekilir ve max_quote_age boyunca önbellekten kullanılır."""
+        if not self.quote_engine:
+            return await self.fetch_bulk_tickers(coins)
+
+        tickers = self.get_streamed_tickers(coins)
+        now = time.monotonic()
+        missing = [
+            name for name in self.exchanges.names()
+            if name not in tickers
+            and (name not in self.ticker_cache or now - self.ticker_cache[name][0] > self.max_quote_age)
+        ]
+        if missing:
+            for name, result in (await self.fetch_bulk_tickers(coins, missing)).items():
+                self.ticker_cache[name] = (now, result)
+        for name in self.exchanges.names():
+            if name not in tickers and name in self.ticker_cache:
+                tickers[name] = self.ticker_cache[name][1]
+        return tickers
+
+    async def get_order_books(self, coin, direction='gate_to_mexc'):
+        """Yöne göre alış borsasının satış ve satış borsasının alış kademelerini döndürür
+        (önce akıştan, yoksa REST'ten eşzamanlı)"""
+        symbol = f"{coin}/USDT"
+        buy_name, sell_name = split_direction(direction)
+        if self.quote_engine:
+            buy_book = self.order_book_store.get(buy_name, symbol)
+            sell_book = self.order_book_store.get(sell_name, symbol)
+            if (buy_book and sell_book and buy_book.valid and sell_book.valid
+                    and max(buy_book.age(), sell_book.age()) <= self.max_quote_age):
+                return buy_book.levels('asks', self.depth_levels), sell_book.levels('bids', self.depth_levels)
+
+        buy_order_book, sell_order_book = await asyncio.gather(
+            latency_metrics.timed('order_book_fetch', buy_name, self.exchange_by_name(buy_name).fetch_order_book(symbol, self.depth_levels)),
+            latency_metrics.timed('order_book_fetch', sell_name, self.exchange_by_name(sell_name).fetch_order_book(symbol, self.depth_levels))
+        )
+        if self.tick_recorder:
+            for name, order_book in ((buy_name, buy_order_book), (sell_name, sell_order_book)):
+                self.tick_recorder.record(name, coin, order_book['bids'], order_book['asks'])
+        return buy_order_book['asks'], sell_order_book['bids']
+
+    def apply_depth(self, opportunity, buy_asks, sell_bids):
+        """Fırsatı emir defteri derinliğine göre gerçekleşebilir VWAP, kayma ve kâr değerleriyle günceller"""
+        depth = calculate_depth_profit(
+            buy_asks, sell_bids, self.trade_amount_usdt,
+            opportunity['transfer_fee'], self.min_profit_percentage
+        )
+        if depth is None:
+            opportunity['is_profitable'] = False
+            return opportunity
+
+        opportunity.update(depth)
+        # Defter işlem miktarını karşılamıyorsa en iyi fiyat ne olursa olsun işlem yapılmaz
+        opportunity['is_profitable'] = depth['fully_fillable'] and depth['profit_percentage'] >= self.min_profit_percentage
+        return opportunity
+
+    def get_transfer_info(self, coin, source='gate', destination='mexc'):
+        """Kaynak borsadan hedef borsaya transfer için ağ, ücret ve minimum çekim bilgisini bellekten döndürür.
+        Güncel kayıt yoksa veya ortak bir ağda çekim/yatırma kapalıysa None döner."""
+        selected = self.fee_registry.select_network(source, destination, coin, WITHDRAW_NETWORKS.get(coin))
+        if not selected:
+            return None
+        network, entry = selected
+        return {'network': network, 'fee': entry['fee'], 'min_withdraw': entry['min_withdraw']}
+
+    async def refresh_fee_registry(self):
+        """Çekim ücreti ve ağ bilgilerini tüm borsalardan toplu ve eşzamanlı olarak yeniler"""
+        exchanges = dict(self.exchanges.items())
+        results = await asyncio.gather(
+            *(call for exchange in exchanges.values()
+              for call in (exchange.fetch_currencies(), exchange.fetch_deposit_withdraw_fees())),
+            return_exceptions=True
+        )
+        for i, name in enumerate(exchanges):
+            currencies, fees = results[2 * i], results[2 * i + 1]
+            if isinstance(currencies, Exception):
+                logger.error(f"{name} currency bilgisi alınamadı: {currencies}")
+            else:
+                self.fee_registry.update_from_currencies(name, currencies)
+            if isinstance(fees, Exception):
+                logger.error(f"{name} çekim ücretleri alınamadı: {fees}")
+            else:
+                self.fee_registry.update_from_fees(name, fees)
+        changed = self.eligibility.refresh()
+        if changed:
+            logger.info(f"Uygunluk dizini güncellendi: {len(changed)} coin yeniden hesaplandı, {len(self.eligibility.routes)} coin uygun")
+
+    async def fee_refresh_loop(self):
+        """Ücret/ağ kayıtlarını FEE_REFRESH_INTERVAL aralıklarıyla arka planda yeniler"""
+        while True:
+            try:
+                await self.refresh_fee_registry()
+                logger.info(f"Çekim ücreti kayıtları yenilendi ({len(self.fee_registry.entries)} kayıt)")
+            except Exception as e:
+                logger.error(f"Çekim ücreti kayıtları yenileme hatası: {e}")
+            await asyncio.sleep(FEE_REFRESH_INTERVAL)
+
+    def calculate_opportunity(self, coin, buy_price, sell_price, transfer, direction='gate_to_mexc', captured_at=None):
+        """Verilen yönde, alış borsasının satış (ask) ve satış borsasının alış (bid) fiyatıyla ve
+        transfer bilgisiyle (get_transfer_info) bir coin için kâr hesaplar (ağ çağrısı yapmaz)"""
+        transfer_fee = transfer['fee']
+        # Kâr hesaplama
+        # Alış borsasından trade_amount_usdt karşılığı ne kadar coin alınabilir?
+        coin_to_buy = Decimal(str(self.trade_amount_usdt)) / Decimal(str(buy_price))
+        
+        # Alış maliyeti (USDT cinsinden)
+        buy_cost_usdt = Decimal(str(self.trade_amount_usdt))
+
+        # Satış borsasında satılacak coin miktarı (transfer ücreti düşülmüş hali)
+        # Transfer ücreti genellikle coin cinsinden olur.
+        # Örneğin, WHITE çekim ücreti 0.1 WHITE ise:
+        # Coin_to_transfer = coin_to_buy - transfer_fee
+        # Eğer transfer ücreti USDT cinsinden verilmişse, hesaplama farklılaşır.
+        # Şimdilik, transfer ücretini USDT cinsinden, satış fiyatı üzerinden düşelim.
+        # Bu kısım, gerçek transfer ücretlerinin nasıl hesaplandığına göre ayarlanmalı.
+        
+        # Basit bir yaklaşımla, transfer ücretini direkt coin miktarından düşelim
+        # Eğer transfer_fee coin cinsindense
+        coin_after_transfer_fee = coin_to_buy - Decimal(str(transfer_fee))
+        
+        if coin_after_transfer_fee <= 0:
+            logger.warning(f"Transfer sonrası coin miktarı sıfır veya negatif. Coin: {coin}, Alınan Miktar: {coin_to_buy:.6f}, Transfer Ücreti: {transfer_fee:.6f}")
+            return None
+
+        # Satış geliri (USDT cinsinden)
+        sell_revenue_usdt = coin_after_transfer_fee * Decimal(str(sell_price))
+        
+        profit = sell_revenue_usdt - buy_cost_usdt
+        
+        if buy_cost_usdt == 0: # Division by zero prevention
+            profit_percentage = 0
+        else:
+            profit_percentage = (profit / buy_cost_usdt) * 100
+        
+        # Borsanın minimum çekim miktarının altındaki alımlar transfer edilemez (işlem yolu aynı kuralla çeker)
+        withdrawable = self.plan_withdrawal(coin_to_buy, transfer) is not None
+        
+        return self.make_opportunity(
+            coin, direction, buy_price, sell_price, transfer, float(profit), float(profit_percentage),
+            withdrawable and profit_percentage >= self.min_profit_percentage, captured_at
+        )
+
+    @staticmethod
+    def plan_withdrawal(amount, transfer):
+        """Alınan coin miktarı için ücret kayıtlarındaki (get_transfer_info) çekim ücreti ve minimumuyla çekim planı.
+        Çekim ücreti çekilen miktardan kesilir: alınan coinin tamamı çekilir, satış borsasına miktar - ücret geçer.
+        Miktar minimum çekimin altındaysa veya ücreti karşılamıyorsa None döner. Fırsat hesabı, float64 eleme
+        (best_spread_pairs) ve işlem yolu aynı kuralı kullanır."""
+        amount = Decimal(str(amount))
+        fee = Decimal(str(transfer['fee']))
+        if transfer['min_withdraw'] is not None and amount < Decimal(str(transfer['min_withdraw'])):
+            return None
+        if amount - fee <= 0:
+            return None
+        return {'amount': amount, 'fee': fee, 'received': amount - fee}
+
+    @staticmethod
+    def make_opportunity(coin, direction, buy_price, sell_price, transfer, profit, profit_percentage, is_profitable,
+                         captured_at=None):
+        """Fırsat sözlüğünü kurar (kesin Decimal hesabı ve float64 eleme aynı alanları üretir).
+        'quote' alanı işlem yolunun yeniden fiyat çekmeden kullandığı değiştirilemez fiyat görüntüsüdür."""
+        buy_name, sell_name = split_direction(direction)
+        return {
+            'quote': QuoteSnapshot(buy_name, sell_name, buy_price, sell_price, captured_at or time.time()),
+            'coin': coin,
+            'direction': direction,
+            'buy_exchange': buy_name,
+            'sell_exchange': sell_name,
+            'buy_price': buy_price,
+            'sell_price': sell_price,
+            'transfer_fee': transfer['fee'], # Coin cinsinden, seçilen ağın güncel çekim ücreti
+            'withdraw_network': transfer['network'],
+            'min_withdraw': transfer['min_withdraw'],
+            'profit': profit,
+            'profit_percentage': profit_percentage,
+            'is_profitable': is_profitable
         }
-        return transfer_fees.get(symbol, 0.1) # Belirtilmeyen coinler için varsayılan ücret
-    
-    async def check_arbitrage_opportunity(self):
-        """Arbitraj fırsatı kontrol eder"""
+
+    def get_route_matrices(self, coins, names):
+        """Coin x alış borsası x satış borsası transfer ücreti ve minimum çekim matrislerini döndürür
+        (yol yoksa NaN). Coin başına satırlar, ücret kayıtları değişene veya route_cache_ttl dolana kadar
+        önbellekte tutulur; böylece değişen coin alt kümeleriyle yapılan çağrılar da önbellekten beslenir."""
+        key = (tuple(names), self.fee_registry.version)
+        cache = self.route_cache
+        if not cache or cache['key'] != key or time.monotonic() - cache['built_at'] >= self.route_cache_ttl:
+            cache = self.route_cache = {'key': key, 'built_at': time.monotonic(), 'rows': {}, 'stacked': {}}
+
+        # Tarama her döngüde aynı coin listesini ister: birleştirilmiş matrisler de listeye göre saklanır
+        stacked = cache['stacked'].get(tuple(coins))
+        if stacked:
+            return stacked
+
+        rows = cache['rows']
+        for coin in coins:
+            if coin in rows:
+                continue
+            fees = np.full((len(names), len(names)), np.nan)
+            min_withdraws = np.full((len(names), len(names)), np.nan)
+            transfers = {}
+            for i, buy_name in enumerate(names):
+                for j, sell_name in enumerate(names):
+                    if i == j:
+                        continue
+                    transfer = self.get_transfer_info(coin, buy_name, sell_name)
+                    if not transfer:
+                        continue
+                    fees[i, j] = transfer['fee']
+                    if transfer['min_withdraw'] is not None:
+                        min_withdraws[i, j] = transfer['min_withdraw']
+                    transfers[(i, j)] = transfer
+            rows[coin] = (fees, min_withdraws, transfers)
+
+        stacked = (
+            np.stack([rows[coin][0] for coin in coins]),
+            np.stack([rows[coin][1] for coin in coins]),
+            [rows[coin][2] for coin in coins],
+        )
+        if len(cache['stacked']) >= 64:
+            cache['stacked'].clear()  # Olay güdümlü modda değişen alt kümeler sınırsız birikmesin
+        cache['stacked'][tuple(coins)] = stacked
+        return stacked
+
+    def evaluate_matrix(self, coins, tickers, names=None, captured_at=None):
+        """Borsa adı -> ticker sözlüklerinden coin x borsa alış/satış matrisini kurar, her coin için en kârlı
+        alış/satış borsası çiftini dizi işlemleriyle seçer ve sadece seçilen çiftler için fırsat üretir.
+        captured_at: ticker'ların alınmaya başlandığı an (verilmezse şimdi)"""
+        captured_at = captured_at or time.time()
+        names = [name for name in (names or self.exchanges.names()) if tickers.get(name)]
+        if len(names) < 2 or not coins:
+            return []
+
+        symbols = [f"{coin}/USDT" for coin in coins]
+        bids = np.empty((len(coins), len(names)))
+        asks = np.empty((len(coins), len(names)))
+        for e, name in enumerate(names):
+            quotes = [ticker or {} for ticker in map(tickers[name].get, symbols)]
+            bids[:, e] = [quote.get('bid') or np.nan for quote in quotes]
+            asks[:, e] = [quote.get('ask') or np.nan for quote in quotes]
+
+        fees, min_withdraws, transfers = self.get_route_matrices(coins, names)
+        buy_index, sell_index, profit_percentage = best_spread_pairs(
+            bids, asks, fees, min_withdraws, self.trade_amount_usdt
+        )
+
+        # Tüm coinler float64 ile elenir; kesin Decimal hesabı yalnızca eşiği (yuvarlama payıyla) geçen,
+        # çekilebilir adaylar için yapılır. Diğerlerinin kâr alanları float64 sonucundan doldurulur.
+        rows = np.flatnonzero(np.isfinite(profit_percentage))
+        buy_columns, sell_columns = buy_index[rows], sell_index[rows]
+        buy_prices, sell_prices = asks[rows, buy_columns], bids[rows, sell_columns]
+        percentages = profit_percentage[rows]
+        with np.errstate(invalid='ignore'):
+            withdrawable = ~(self.trade_amount_usdt / buy_prices < min_withdraws[rows, buy_columns, sell_columns])
+        shortlist = withdrawable & (percentages >= self.min_profit_percentage - self.screen_margin_percentage)
+        profits = percentages * (self.trade_amount_usdt / 100)
+
+        opportunities = []
+        for c, i, j, buy_price, sell_price, profit, percentage, exact in zip(
+            rows.tolist(), buy_columns.tolist(), sell_columns.tolist(), buy_prices.tolist(),
+            sell_prices.tolist(), profits.tolist(), percentages.tolist(), shortlist.tolist()
+        ):
+            direction = make_direction(names[i], names[j])
+            transfer = transfers[c][(i, j)]
+            if exact:
+                opportunity = self.calculate_opportunity(coins[c], buy_price, sell_price, transfer, direction, captured_at)
+            else:
+                opportunity = self.make_opportunity(
+                    coins[c], direction, buy_price, sell_price, transfer, profit, percentage, False, captured_at
+                )
+            if opportunity:
+                opportunities.append(opportunity)
+        return opportunities
+
+    async def check_arbitrage_opportunity(self, coin=None):
+        """Arbitraj fırsatını tüm borsa çiftlerinde kontrol eder ve en kârlı yönü döndürür"""
+        coin = coin or self.current_coin
         try:
-            gate_price = await self.get_price_from_gate(self.current_coin)
-            mexc_price = await self.get_price_from_mexc(self.current_coin)
-            
-            if not gate_price or not mexc_price:
-                logger.warning(f"Fiyat bilgileri eksik. Gate.io: {gate_price}, MEXC: {mexc_price}")
+            reason = self.eligibility.reason(coin)
+            if reason:
+                logger.warning(f"{reason}; kontrol atlandı.")
                 return None
+            names = self.exchanges.names()
+            captured_at = time.time()
+            results = await asyncio.gather(*(self.get_ticker(name, coin) for name in names))
+            tickers = {name: {f"{coin}/USDT": ticker} for name, ticker in zip(names, results) if ticker}
             
-            transfer_fee = await self.get_transfer_fee(self.current_coin)
-            
-            # Kâr hesaplama
-            # Gate.io'dan trade_amount_usdt karşılığı ne kadar coin alınabilir?
-            coin_to_buy = Decimal(str(self.trade_amount_usdt)) / Decimal(str(gate_price))
-            
-            # Gate.io'da alış maliyeti (USDT cinsinden)
-            buy_cost_usdt = Decimal(str(self.trade_amount_usdt))
-
-            # MEXC'de satılacak coin miktarı (transfer ücreti düşülmüş hali)
-            # Transfer ücreti genellikle coin cinsinden olur.
-            # Örneğin, WHITE çekim ücreti 0.1 WHITE ise:
-            # Coin_to_transfer = coin_to_buy - transfer_fee
-            # Eğer transfer ücreti USDT cinsinden verilmişse, hesaplama farklılaşır.
-            # Şimdilik, transfer ücretini USDT cinsinden, satış fiyatı üzerinden düşelim.
-            # Bu kısım, gerçek transfer ücretlerinin nasıl hesaplandığına göre ayarlanmalı.
-            
-            # Basit bir yaklaşımla, transfer ücretini direkt coin miktarından düşelim
-            # Eğer transfer_fee coin cinsindense
-            coin_after_transfer_fee = coin_to_buy - Decimal(str(transfer_fee))
-            
-            if coin_after_transfer_fee <= 0:
-                logger.warning(f"Transfer sonrası coin miktarı sıfır veya negatif. Coin: {self.current_coin}, Alınan Miktar: {coin_to_buy:.6f}, Transfer Ücreti: {transfer_fee:.6f}")
+            if len(tickers) < 2:
+                logger.warning(f"Fiyat bilgileri eksik. " + ", ".join(f"{EXCHANGE_NAMES[n]}: {t}" for n, t in zip(names, results)))
                 return None
-
-            # MEXC'de satış geliri (USDT cinsinden)
-            sell_revenue_usdt = coin_after_transfer_fee * Decimal(str(mexc_price))
             
-            profit = sell_revenue_usdt - buy_cost_usdt
-            
-            if buy_cost_usdt == 0: # Division by zero prevention
-                profit_percentage = 0
-            else:
-                profit_percentage = (profit / buy_cost_usdt) * 100
-            
-            opportunity = {
-                'gate_price': gate_price,
-                'mexc_price': mexc_price,
-                'transfer_fee': transfer_fee, # Bu değerin birimi önemli (coin mi, USDT mi)
-                'profit': float(profit),
-                'profit_percentage': float(profit_percentage),
-                'is_profitable': profit_percentage >= self.min_profit_percentage
-            }
+            with latency_metrics.time('profit_calculation'):
+                opportunities = self.evaluate_matrix([coin], tickers, captured_at=captured_at)
+            opportunity = opportunities[0] if opportunities else None
+            if not opportunity:
+                logger.warning(f"{coin} için güncel çekim ücreti/ağ bilgisi yok veya ortak ağda çekim/yatırma kapalı.")
+                return None
             
+            buy_asks, sell_bids = await self.get_order_books(coin, opportunity['direction'])
+            with latency_metrics.time('depth_calculation'):
+                self.apply_depth(opportunity, buy_asks, sell_bids)
             return opportunity
             
         except Exception as e:
             logger.error(f"Arbitraj kontrolü hatası: {e}")
             if ADMIN_CHAT_ID:
-                await self.send_admin_message(f"🚨 **Hata: Arbitraj fırsatı kontrol edilirken bir sorun oluştu!**\n\nDetay: `{e}`")
+                self.send_admin_message(f"🚨 **Hata: Arbitraj fırsatı kontrol edilirken bir sorun oluştu!**\n\nDetay: `{e}`", key=f"check:{type(e).__name__}")
             return None
-    
-    async def execute_arbitrage_trade(self, context: ContextTypes.DEFAULT_TYPE):
-        """Arbitraj işlemini gerçekleştirir"""
+
+    async def scan_arbitrage_opportunities(self, coins=None):
+        """Coin evrenindeki (veya verilen) coinleri tek geçişte tarar ve kâra göre sıralı fırsat listesi döndürür.
+        Gidiş-dönüşü tamamlanamayacak coinler için ticker/defter istenmez."""
+        coins = [coin for coin in (coins or self.coin_universe) if self.eligibility.is_eligible(coin)]
+        if not coins:
+            logger.warning("Coin evreninde işlem yapılabilir coin yok, tarama yapılamadı.")
+            return []
+
+        captured_at = time.time()
+        tickers = await self.get_tickers(coins)
+        if sum(1 for result in tickers.values() if result) < 2:
+            # Akış verisi henüz gelmedi: REST üzerinden toplu çek
+            captured_at = time.time()
+            tickers = await self.fetch_bulk_tickers(coins)
+
+        # Tüm borsa çiftleri aynı ticker görüntüsünden tek matris işlemiyle değerlendirilir,
+        # coin başına en kârlı alış/satış borsası çifti tutulur
+        with latency_metrics.time('profit_calculation'):
+            opportunities = self.evaluate_matrix(list(coins), tickers, captured_at=captured_at)
+
+        # Derinlik hesabı: defterleri akışta bellekte olan çiftler için tüm coinlerde yapılır,
+        # diğerlerinde sadece en iyi fiyatta kârlı görünenlerin defterleri eşzamanlı çekilir.
+        streamed = StreamingQuoteEngine.EXCHANGES if self.quote_engine else ()
+        candidates = [
+            o for o in opportunities
+            if o['is_profitable'] or (o['buy_exchange'] in streamed and o['sell_exchange'] in streamed)
+        ]
+        if candidates:
+            books = await asyncio.gather(
+                *(self.get_order_books(o['coin'], o['direction']) for o in candidates), return_exceptions=True
+            )
+            with latency_metrics.time('depth_calculation'):
+                for opportunity, book in zip(candidates, books):
+                    if isinstance(book, Exception):
+                        logger.error(f"{opportunity['coin']} emir defteri alma hatası: {book}")
+                        opportunity['is_profitable'] = False
+                        continue
+                    self.apply_depth(opportunity, *book)
+
+        opportunities.sort(key=lambda o: (o['is_profitable'], o['profit_percentage']), reverse=True)
+        return opportunities
+
+    def snapshot_error(self, opportunity):
+        """Fırsatın fiyat görüntüsü yoksa veya süresi geçtiyse nedenini, kullanılabilirse None döndürür.
+        Eski görüntü yeniden fiyat çekilerek tazelenmez; fırsat bir sonraki taramada yeniden tespit edilir."""
+        quote = opportunity.get('quote')
+        if quote is None:
+            return "fırsatın fiyat görüntüsü yok"
+        age = quote.age()
+        if age > self.quote_deadline:
+            return f"fiyat görüntüsü {age:.2f} sn eski (sınır {self.quote_deadline:g} sn)"
+        return None
+
+    def reject_stale(self, coin, opportunity):
+        """Fiyat görüntüsü kullanılamıyorsa bildirir ve True döndürür. İşlem başında ve bakiye kilidi
+        alındıktan sonra emirlerden hemen önce çağrılır (kilit beklerken görüntü eskiyebilir)."""
+        stale = self.snapshot_error(opportunity)
+        if stale:
+            logger.info(f"{coin} işlemi atlandı: {stale}")
+            self.send_admin_message(f"⌛ **{coin} işlemi başlatılmadı:** {stale}", key=f"stale:{coin}")
+        return bool(stale)
+
+    async def execute_arbitrage_trade(self, context: ContextTypes.DEFAULT_TYPE, coin, opportunity):
+        """Arbitraj işlemini fırsatın yönünde (alış borsası → satış borsası, örn. Gate.io → MEXC) gerçekleştirir"""
+        direction = opportunity['direction']
+        buy_name, sell_name = split_direction(direction)
+        buy_exchange, sell_exchange = self.exchange_by_name(buy_name), self.exchange_by_name(sell_name)
+        buy_label, sell_label = EXCHANGE_NAMES[buy_name], EXCHANGE_NAMES[sell_name]
+        if not self.eligibility.is_eligible(coin, direction):
+            reason = self.eligibility.reason(coin) or f"{buy_label} → {sell_label} yönünde {coin} için ortak ağ yok"
+            self.send_admin_message(f"❌ **İşlem başlatılamadı:** {reason}", key=f"ineligible:{coin}")
+            return False
+        if self.reject_stale(coin, opportunity):
+            return False
+        trade = ArbitrageTrade(coin)
+        self.trades.append(trade)
         try:
-            gate_price = await self.get_price_from_gate(self.current_coin)
-            if not gate_price:
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"❌ **İşlem başlatılamadı: Gate.io'dan {self.current_coin} fiyatı alınamadı!**",
-                    parse_mode='Markdown'
-                )
-                return False
+            # Alış fiyatı tespit anındaki fiyat görüntüsünden (yeniden sorgulanmaz)
+            buy_price = opportunity['quote'].buy_price
 
-            # 1. Gate.io'dan coin satın al
+            # 1. Alış borsasından coin satın al
             # Hassasiyet için Decimal kullanmak önemli
             buy_amount_usdt_decimal = Decimal(str(self.trade_amount_usdt))
-            # Gate.io'da piyasa alış emri verirken, 'createMarketBuyOrderRequiresPrice: False' ayarlandığında,
+            # Piyasa alış emri verirken, 'createMarketBuyOrderRequiresPrice: False' ayarlandığında (iki borsada da),
             # 'amount' argümanı harcanacak USDT miktarını (quote quantity) temsil eder.
             
-            # Satın alınacak coin miktarı Gate.io'nun kendisi tarafından belirlenecektir.
+            # Satın alınacak coin miktarı borsanın kendisi tarafından belirlenecektir.
             # Biz sadece ne kadar USDT harcayacağımızı söylüyoruz.
             # Bu nedenle 'coin_to_buy_decimal' hesaplaması burada doğrudan kullanılmayacak.
             # buy_order'dan dönen gerçek miktarı takip edeceğiz.
             
             if buy_amount_usdt_decimal <= 0:
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"❌ **İşlem başarısız: Hesaplanan alış miktarı sıfır veya negatif!**\n\nCoin: {self.current_coin}\nUSDT Miktarı: ${self.trade_amount_usdt}",
-                    parse_mode='Markdown'
-                )
+                self.send_admin_message(f"❌ **İşlem başarısız: Hesaplanan alış miktarı sıfır veya negatif!**\n\nCoin: {coin}\nUSDT Miktarı: ${self.trade_amount_usdt}")
                 return False
 
-            # Düzeltme: Gate.io'da piyasa alış emri verirken harcanacak USDT miktarını gönderiyoruz.
-            buy_order = await self.gate_exchange.create_market_buy_order(
-                f"{self.current_coin}/USDT", 
-                float(buy_amount_usdt_decimal) # Düzeltme yapıldı: harcanacak USDT miktarı
-            )
-            
-            logger.info(f"Gate.io alış emri: {buy_order}")
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"🛒 **Gate.io'da {self.current_coin} alış emri verildi.**\n\nEmir ID: `{buy_order.get('id', 'N/A')}`\nMiktar: `{buy_order.get('amount', 'N/A')}`\nFiyat: `{buy_order.get('price', 'N/A')}`",
-                parse_mode='Markdown'
-            )
+            # Alış ve (fırsattaki tahmini miktarla) satış emri yerel kurallarla önceden doğrulanır:
+            # satış bacağı geçersizse alış hiç yapılmaz
+            buy_request = self.order_builder.market_buy(buy_name, f"{coin}/USDT", buy_amount_usdt_decimal, buy_price)
+            if opportunity.get('expected_coin_amount'):
+                self.order_builder.market_sell(
+                    sell_name, f"{coin}/USDT",
+                    Decimal(str(opportunity['expected_coin_amount'])) - Decimal(str(opportunity['transfer_fee'])),
+                    opportunity['quote'].sell_price
+                )
+
+            # Alış borsasındaki USDT bakiyesi eşzamanlı işlemler arasında paylaşılır: alışlar sırayla verilir
+            # ve bir sonraki alış, önceki gerçekleşip bakiyeye yansıdıktan sonra gönderilir.
+            async with self.balance_locks[buy_name]:
+                if self.reject_stale(coin, opportunity):
+                    return False
+                # Düzeltme: Piyasa alış emri verirken harcanacak USDT miktarını gönderiyoruz.
+                with latency_metrics.time('order_placement', buy_name):
+                    # amount: harcanacak USDT miktarı (hassasiyete yuvarlanmış)
+                    buy_order = await buy_exchange.create_market_buy_order(**buy_request)
+                logger.info(f"{buy_label} alış emri: {buy_order}")
+                
+                # Emir gerçekleşene kadar izle (sabit bekleme ve bakiye sorgusu yerine)
+                with latency_metrics.time('fill_confirmation', buy_name):
+                    buy_fill = await self.order_tracker.wait_for_fill(buy_exchange, buy_order, f"{coin}/USDT")
             
-            # Biraz bekle (emir gerçekleşsin)
-            await asyncio.sleep(10) # Gerçekleşme süresine göre ayarlanmalı. `fetch_order` ile kontrol daha iyi
+            self.send_admin_message(f"🛒 **{buy_label}'da {coin} alış emri verildi.**\n\nEmir ID: `{buy_order.get('id', 'N/A')}`\nMiktar: `{buy_order.get('amount', 'N/A')}`\nFiyat: `{buy_order.get('price', 'N/A')}`")
+            logger.info(f"{buy_label} alış gerçekleşmesi: {buy_fill}")
+            if buy_fill['filled'] <= 0:
+                self.send_admin_message(f"❌ **{buy_label} alış emri gerçekleşmedi!**\n\nEmir ID: `{buy_fill['id']}`\nDurum: `{buy_fill['status']}`")
+                return False
 
-            # Emirin gerçekleştiğinden emin olmak için bakiyeyi kontrol et
-            gate_balance = await self.gate_exchange.fetch_balance()
-            actual_bought_coin = Decimal(str(gate_balance[self.current_coin]['free']))
+            # Ücret coin cinsinden kesildiyse net miktar üzerinden devam edilir
+            actual_bought_coin = Decimal(str(buy_fill['net_base']))
+            trade.transition(TradeState.BOUGHT, buy_fill=buy_fill)
 
             # Başlangıçta hedeflenen coin miktarı (referans için)
-            # Bu, Gate.io'nun o anki satış fiyatına göre yaklaşık bir değerdir.
-            estimated_coin_to_buy = buy_amount_usdt_decimal / Decimal(str(gate_price))
-
-            if actual_bought_coin < estimated_coin_to_buy * Decimal('0.95'): # %5 sapma toleransı
-                 await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"⚠️ **Gate.io alış emri tam olarak gerçekleşmemiş olabilir!**\n\nHesaplanan Yaklaşık Alış: `{estimated_coin_to_buy:.6f}`\nGerçekleşen Alış: `{actual_bought_coin:.6f}`",
-                    parse_mode='Markdown'
-                )
+            if opportunity.get('expected_coin_amount'):
+                # Emir defteri derinliğinden hesaplanan VWAP miktarı
+                estimated_coin_to_buy = Decimal(str(opportunity['expected_coin_amount']))
+            else:
+                # Bu, alış borsasının o anki fiyatına göre yaklaşık bir değerdir.
+                estimated_coin_to_buy = buy_amount_usdt_decimal / Decimal(str(buy_price))
+            fill_tolerance = Decimal('1') - Decimal(str(self.max_slippage_percentage)) / Decimal('100')
+
+            if actual_bought_coin < estimated_coin_to_buy * fill_tolerance:
+                 self.send_admin_message(f"⚠️ **{buy_label} alış emri tam olarak gerçekleşmemiş olabilir!**\n\nHesaplanan Yaklaşık Alış: `{estimated_coin_to_buy:.6f}`\nGerçekleşen Alış: `{actual_bought_coin:.6f}`")
                  # Burada iptal edip yeniden deneme veya hata mesajı mantığı eklenebilir.
                  # Şimdilik devam edelim ama bu bir risk.
             
-            # 2. Coin'i MEXC'ye transfer et
-            # ÖNEMLİ: Gerçekte, Gate.io'dan çekilebilecek minimum ve maksimum miktarları kontrol edin.
-            # Ayrıca, çekim adreslerini ve tag/memo bilgilerini doğru girdiğinizden emin olun.
-            # Bu kısımlar manuel olarak yapılandırılmalıdır.
-            
-            # Çekim ücreti Gate.io tarafından alınır. Çekilecek miktar:
-            amount_to_withdraw = actual_bought_coin * Decimal('0.99') # %1 güvenlik marjı (transfer ücretini hesaba katmak için)
-                                                                    # Bu oran doğru transfer ücretine göre ayarlanmalı
-            
-            if amount_to_withdraw <= 0:
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"❌ **İşlem başarısız: Çekilecek {self.current_coin} miktarı sıfır veya negatif!**",
-                    parse_mode='Markdown'
-                )
+            # 2. Coin'i satış borsasına transfer et
+            # Çekim ağı, ücreti ve minimum miktar güncel ücret kayıtlarından; fırsat hesabındaki kuralla
+            # (plan_withdrawal) alınan coinin tamamı çekilir, ücret çekilen miktardan kesilir.
+            transfer = self.get_transfer_info(coin, buy_name, sell_name)
+            if not transfer:
+                self.send_admin_message(f"❌ **İşlem başarısız: {coin} için {buy_label} → {sell_label} çekim ağı bulunamadı!** (Çekim/yatırma kapalı olabilir.)")
+                return False
+            withdraw_network = transfer['network']
+            withdrawal_plan = self.plan_withdrawal(actual_bought_coin, transfer)
+            if not withdrawal_plan:
+                self.send_admin_message(f"❌ **İşlem başarısız: Alınan {actual_bought_coin:.6f} {coin} çekilemiyor!** (Çekim ücreti: {transfer['fee']}, minimum çekim: {transfer['min_withdraw']})")
                 return False
+            withdrawal_request = self.order_builder.withdrawal(
+                buy_name, coin, withdrawal_plan['amount'], transfer['min_withdraw']
+            )
 
-            # Wallet adresleri global değişkenlerden veya ENV'den alınmalı.
-            # Placeholder adresler kullanımdan kaldırılmalı.
-            if MEXC_WALLET_ADDRESS == 'YOUR_MEXC_WALLET_ADDRESS_HERE':
-                 await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"❌ **İşlem başarısız: MEXC cüzdan adresi ayarlanmadı!** Lütfen kodu güncelleyin.",
-                    parse_mode='Markdown'
-                )
-                 return False
+            # Hedef adres: ENV'deki sabit adres veya satış borsasından sorgulanan yatırma adresi
+            address, tag = await self.get_withdraw_address(sell_name, coin, withdraw_network)
+            if not address:
+                self.send_admin_message(f"❌ **İşlem başarısız: {sell_label} {coin} yatırma adresi bulunamadı!** `MEXC_WALLET_ADDRESS`/`GATE_IO_WALLET_ADDRESS` ayarlarını kontrol edin.")
+                return False
 
-            transfer_result = await self.gate_exchange.withdraw(
-                self.current_coin,
-                float(amount_to_withdraw),
-                MEXC_WALLET_ADDRESS,
-                tag=None # Eğer tag/memo gerekiyorsa buraya eklenmeli
-            )
+            trade.transition(TradeState.WITHDRAWING, withdraw_network=withdraw_network)
+            with latency_metrics.time('withdrawal', buy_name):
+                transfer_result = await buy_exchange.withdraw(
+                    withdrawal_request['code'],
+                    withdrawal_request['amount'],
+                    address,
+                    tag=tag,
+                    params={'network': withdraw_network}
+                )
             
             logger.info(f"Transfer işlemi: {transfer_result}")
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"📤 **{self.current_coin} transferi Gate.io'dan MEXC'ye başlatıldı.**\n\nTransfer ID: `{transfer_result.get('id', 'N/A')}`\nMiktar: `{transfer_result.get('amount', 'N/A')}`",
-                parse_mode='Markdown'
-            )
-            
-            # Transfer onayını bekle (gerçek senaryoda webhook veya sürekli durum kontrolü kullanılabilir)
-            # Bu bekleme süresi, blok zinciri ağının yoğunluğuna ve transferin onay süresine bağlıdır.
-            # Minimum 5-15 dakika gerçekçi olabilir, hatta daha uzun.
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"⏳ **Transferin onaylanması bekleniyor...** Yaklaşık {self.check_interval * 10} saniye (bu süre, transferin hızına göre ayarlanmalı, şu an için varsayılan bir değerdir).",
-                parse_mode='Markdown'
-            )
-            await asyncio.sleep(self.check_interval * 10) # Örnek: Check interval'ın 10 katı bekle
+            self.send_admin_message(f"📤 **{coin} transferi {buy_label}'dan {sell_label}'ye başlatıldı.**\n\nTransfer ID: `{transfer_result.get('id', 'N/A')}`\nMiktar: `{transfer_result.get('amount', 'N/A')}`")
             
-            # 3. MEXC'de coin'i sat
-            mexc_balance = await self.mexc_exchange.fetch_balance()
-            coin_on_mexc = Decimal(str(mexc_balance[self.current_coin]['free']))
-
-            if coin_on_mexc <= 0:
-                 await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"❌ **MEXC'ye {self.current_coin} transferi henüz gelmedi veya miktar sıfır!** İşlem iptal ediliyor.",
-                    parse_mode='Markdown'
-                )
-                 # Burada bir kurtarma stratejisi (örn. manuel kontrol bildirimi) eklenebilir.
-                 return False
+            # Transferi izle: alış borsasının çekim kaydındaki txid, satış borsasının yatırma kaydıyla
+            # eşleşip hesaba geçtiği anda satışa geçilir (sabit süre beklenmez).
+            self.send_admin_message(f"⏳ **Transfer izleniyor...** {sell_label}'de hesaba geçtiği anda satış yapılacak.")
+            try:
+                with latency_metrics.time('deposit_credit', sell_name):
+                    deposit = await self.transfer_watcher.wait_for_credit(
+                        buy_exchange, sell_exchange, coin, transfer_result,
+                        on_txid=lambda txid: trade.transition(TradeState.IN_FLIGHT, txid=txid)
+                    )
+            except RuntimeError as e:
+                self.send_admin_message(f"❌ **{sell_label}'ye {coin} transferi tamamlanamadı!** İşlem iptal ediliyor.\n\nDetay: `{e}`")
+                # Burada bir kurtarma stratejisi (örn. manuel kontrol bildirimi) eklenebilir.
+                return False
+            trade.transition(TradeState.CREDITED, deposit=deposit)
 
-            # Satılacak miktar (MEXC'nin minimum satış miktarını kontrol edin)
-            # Transfer ücreti düşüldükten sonra MEXC'ye gelen miktar üzerinden satış.
-            # Buy_amount * 0.98 gibi sabit bir oran yerine, MEXC'deki gerçek bakiyeyi kullanmak daha güvenli.
+            # 3. Satış borsasında coin'i sat
+            # Satılacak miktar: satış borsasına gerçekten gelen (yatırma kaydındaki) miktar
+            coin_received = Decimal(str(deposit.get('amount') or 0))
+
+            if coin_received <= 0:
+                 self.send_admin_message(f"❌ **{sell_label}'ye gelen {coin} miktarı sıfır!** İşlem iptal ediliyor.")
+                 return False
             
-            sell_order = await self.mexc_exchange.create_market_sell_order(
-                f"{self.current_coin}/USDT",
-                float(coin_on_mexc)
-            )
             
-            logger.info(f"MEXC satış emri: {sell_order}")
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"💸 **MEXC'de {self.current_coin} satış emri verildi.**\n\nEmir ID: `{sell_order.get('id', 'N/A')}`\nMiktar: `{sell_order.get('amount', 'N/A')}`\nFiyat: `{sell_order.get('price', 'N/A')}`",
-                parse_mode='Markdown'
+            # Gelen miktar lot adımına yuvarlanır (artan küsurat satış borsasında kalır)
+            sell_request = self.order_builder.market_sell(
+                sell_name, f"{coin}/USDT", coin_received, opportunity['quote'].sell_price
             )
+            with latency_metrics.time('order_placement', sell_name):
+                sell_order = await sell_exchange.create_market_sell_order(**sell_request)
+            
+            logger.info(f"{sell_label} satış emri: {sell_order}")
+            self.send_admin_message(f"💸 **{sell_label}'de {coin} satış emri verildi.**\n\nEmir ID: `{sell_order.get('id', 'N/A')}`\nMiktar: `{sell_order.get('amount', 'N/A')}`\nFiyat: `{sell_order.get('price', 'N/A')}`")
             
-            # Biraz bekle (emir gerçekleşsin)
-            await asyncio.sleep(10)
+            with latency_metrics.time('fill_confirmation', sell_name):
+                sell_fill = await self.order_tracker.wait_for_fill(sell_exchange, sell_order, f"{coin}/USDT")
+            logger.info(f"{sell_label} satış gerçekleşmesi: {sell_fill}")
+            trade.transition(TradeState.SOLD, sell_fill=sell_fill)
+            if sell_fill['status'] != 'closed':
+                self.send_admin_message(f"⚠️ **{sell_label} satış emri tam gerçekleşmedi!**\n\nDurum: `{sell_fill['status']}`\nGerçekleşen: `{sell_fill['filled']}` / `{float(coin_received)}` {coin}")
 
-            # 4. USDT'yi Gate.io'ya geri gönder
+            # 4. USDT'yi alış borsasına geri gönder
             # Bu adım arbitraj döngüsünü tamamlamak için önemlidir, ancak riskli olabilir.
             # Exchange'ler arası USDT transfer ücretleri ve minimum çekim miktarları farklı olabilir.
             # Ayrıca, USDT transferleri için ağ seçimi (ERC20, TRC20, BEP20 vb.) kritiktir.
             # Bu örnekte basitleştirilmiş bir yaklaşım var. Gerçekte daha detaylı kontrol gerekli.
             
-            usdt_balance_on_mexc = await self.mexc_exchange.fetch_balance()
-            usdt_amount = Decimal(str(usdt_balance_on_mexc['USDT']['free']))
+            # Geri gönderilecek tutar: bu satıştan elde edilen net USDT (hesabın tamamı değil)
+            usdt_amount = Decimal(str(sell_fill['net_quote']))
+            usdt_fee_paid = 0  # Kâr hesabı için: geri transferde ödenen USDT çekim ücreti
             
-            if usdt_amount > Decimal('10'):  # Minimum 10 USDT çekim varsayımı
-                if GATE_IO_WALLET_ADDRESS == 'YOUR_GATE_IO_WALLET_ADDRESS_HERE':
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"❌ **İşlem başarısız: Gate.io USDT cüzdan adresi ayarlanmadı!** Lütfen kodu güncelleyin.",
-                        parse_mode='Markdown'
-                    )
-                    # USDT'yi MEXC'de bırakmak zorunda kalırsınız, bu da arbitraj döngüsünü bozar.
+            # USDT çekim ücreti, minimum çekim ve ağ durumu ücret kayıtlarından (USDT_NETWORK ağı)
+            usdt_withdrawal = self.fee_registry.get(sell_name, 'USDT', USDT_NETWORK)
+            usdt_withdraw_available = bool(usdt_withdrawal and usdt_withdrawal['withdraw_enabled'] and usdt_withdrawal['fee'] is not None)
+            usdt_min_withdraw = Decimal(str(usdt_withdrawal['min_withdraw'] or 0)) if usdt_withdraw_available else Decimal('0')
+            
+            if not usdt_withdraw_available:
+                self.send_admin_message(f"⚠️ **{sell_label}'de USDT ({USDT_NETWORK}) çekim bilgisi yok veya çekim kapalı.** USDT geri transferi yapılmadı.")
+            elif usdt_amount >= usdt_min_withdraw:
+                usdt_address, usdt_tag = await self.get_withdraw_address(buy_name, 'USDT', USDT_NETWORK)
+                if not usdt_address:
+                    self.send_admin_message(f"❌ **İşlem başarısız: {buy_label} USDT yatırma adresi bulunamadı!** `GATE_IO_WALLET_ADDRESS` ayarını kontrol edin.")
+                    # USDT'yi satış borsasında bırakmak zorunda kalırsınız, bu da arbitraj döngüsünü bozar.
                     return False
 
                 # USDT çekim ücretini düşerek çekilecek miktar
-                # USDT transfer ücreti (genellikle sabit bir miktar veya yüzde)
-                usdt_withdrawal_fee = Decimal('1.0') # Örnek USDT çekim ücreti, MEXC'den kontrol edin!
+                usdt_withdrawal_fee = Decimal(str(usdt_withdrawal['fee']))
                 amount_to_send_usdt = usdt_amount - usdt_withdrawal_fee
 
                 if amount_to_send_usdt <= 0:
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"⚠️ **MEXC'den çekilecek USDT miktarı transfer ücretinden düşük veya sıfır.** Transfer yapılmıyor.",
-                        parse_mode='Markdown'
-                    )
+                    self.send_admin_message(f"⚠️ **{sell_label}'den çekilecek USDT miktarı transfer ücretinden düşük veya sıfır.** Transfer yapılmıyor.")
                 else:
-                    usdt_transfer = await self.mexc_exchange.withdraw(
-                        'USDT',
-                        float(amount_to_send_usdt),
-                        GATE_IO_WALLET_ADDRESS,
-                        tag=None, # Eğer tag/memo gerekiyorsa buraya eklenmeli
-                        params={'network': 'TRC20'} # Ağ seçimi önemli! Örn: 'TRC20' veya 'ERC20'
-                    )
+                    usdt_request = self.order_builder.withdrawal(sell_name, 'USDT', amount_to_send_usdt)
+                    trade.transition(TradeState.RETURNING)
+                    # Satış borsasının USDT bakiyesi de işlemler arasında paylaşılır
+                    async with self.balance_locks[sell_name]:
+                        with latency_metrics.time('withdrawal', sell_name):
+                            usdt_transfer = await sell_exchange.withdraw(
+                                usdt_request['code'],
+                                usdt_request['amount'],
+                                usdt_address,
+                                tag=usdt_tag,
+                                params={'network': USDT_NETWORK} # Ağ seçimi önemli! Örn: 'TRC20' veya 'ERC20'
+                            )
                     
+                    usdt_fee_paid = float(usdt_withdrawal_fee)
                     logger.info(f"USDT transfer işlemi: {usdt_transfer}")
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"🔄 **USDT transferi MEXC'den Gate.io'ya başlatıldı.**\n\nTransfer ID: `{usdt_transfer.get('id', 'N/A')}`\nMiktar: `{usdt_transfer.get('amount', 'N/A')}`",
-                        parse_mode='Markdown'
-                    )
+                    self.send_admin_message(f"🔄 **USDT transferi {sell_label}'den {buy_label}'ya başlatıldı.**\n\nTransfer ID: `{usdt_transfer.get('id', 'N/A')}`\nMiktar: `{usdt_transfer.get('amount', 'N/A')}`")
             else:
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"ℹ️ **MEXC'deki USDT bakiyesi çok düşük (${usdt_amount:.2f})**. USDT geri transferi yapılmadı.",
-                    parse_mode='Markdown'
-                )
+                self.send_admin_message(f"ℹ️ **{sell_label}'deki USDT bakiyesi minimum çekimin altında (${usdt_amount:.2f} < ${usdt_min_withdraw:.2f})**. USDT geri transferi yapılmadı.")
 
             # İstatistikleri güncelle
             self.stats['total_trades'] += 1
             self.stats['successful_trades'] += 1
             
-            # Gerçekleşen kârı hesaplamak için son bakiyeleri kontrol etmek daha doğru olur.
-            # Basit bir tahminle, başlangıçta hesaplanan 'profit' değerini ekleyelim.
-            # Ancak bu, emirlerin tam gerçekleştiği varsayımına dayanır.
-            # Daha sağlam bir yaklaşım, işlem sonrası USDT bakiyelerindeki değişimi izlemektir.
-            opportunity_after_trade = await self.check_arbitrage_opportunity() # Son fiyatlarla bir daha kontrol
-            if opportunity_after_trade:
-                self.stats['total_profit'] += opportunity_after_trade['profit'] # İşlem sonrası kârı ekle
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=f"📈 **Tahmini İşlem Kârı: ${opportunity_after_trade['profit']:.2f}**",
-                    parse_mode='Markdown'
+            # Gerçekleşen kâr emir gerçekleşmelerinden hesaplanır (işlem sonrası fiyat yeniden çekilmez):
+            # satış geliri - alış maliyeti - USDT çekim ücreti; borsalarda kalan coin küsuratı
+            # (çekim yuvarlaması ve satılamayan kısım) satış fiyatından değerlenir
+            leftover_coin = (actual_bought_coin - Decimal(str(withdrawal_request['amount']))
+                             + coin_received - Decimal(str(sell_fill['filled'])))
+            profit = (sell_fill['net_quote'] - buy_fill['cost'] - buy_fill['quote_fee'] - usdt_fee_paid
+                      + float(leftover_coin) * (sell_fill['average'] or 0))
+            self.stats['total_profit'] += profit
+            self.send_admin_message(f"📈 **Gerçekleşen İşlem Kârı: ${profit:.2f}**")
+
+            self.stats['last_trade_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            trade.transition(TradeState.COMPLETED, profit=profit)
+            
+            return True
+            
+        except OrderValidationError as e:
+            logger.error(f"İşlem gerçekleştirme hatası (Yerel emir doğrulaması): {e}")
+            self.send_admin_message(f"❌ **Emir yerel doğrulamada reddedildi, borsaya gönderilmedi!**\n\nDetay: `{e}`")
+            return False
+        except ccxt.NetworkError as e:
+            logger.error(f"İşlem gerçekleştirme hatası (Ağ hatası): {e}")
+            self.send_admin_message(f"❌ **İşlem sırasında ağ hatası oluştu!**\n\nDetay: `{e}`\nLütfen internet bağlantınızı kontrol edin ve borsaların durumunu inceleyin.")
+            return False
+        except ccxt.ExchangeError as e:
+            logger.error(f"İşlem gerçekleştirme hatası (Borsa hatası): {e}")
+            self.send_admin_message(f"❌ **İşlem sırasında borsa hatası oluştu!**\n\nDetay: `{e}`\n(Örn: Yetersiz bakiye, geçersiz emir, API hatası)")
+            return False
+        except Exception as e:
+            logger.error(f"İşlem gerçekleştirme hatası (Genel hata): {e}", exc_info=True) # exc_info ile traceback göster
+            self.send_admin_message(f"❌ **İşlem gerçekleştirme sırasında beklenmedik bir hata oluştu!**\n\nDetay: `{type(e).__name__}: {e}`")
+            return False
+        finally:
+            # Başarıyla tamamlanmayan her işlem (erken dönüş veya hata) FAILED olarak kapanır
+            if not trade.is_finished:
+                trade.transition(TradeState.FAILED)
+    
+    def exchange_by_name(self, name):
+        """Kayıtlı borsa adından (örn. 'gate', 'mexc') ccxt istemcisini döndürür"""
+        return self.exchanges.get(name)
+
+    async def refresh_inventory(self):
+        """Tüm borsalardaki serbest bakiyeleri eşzamanlı çekip envanter önbelleğini günceller"""
+        # Sorgu sürerken işlemler ayırma veya mutabakat yapamaz; emirleri havada olan işlemler
+        # önbelleğin yenilendiğini inventory_version ile görür
+        async with self.hold_balances(*self.exchanges.names()):
+            await self.load_inventory()
+
+    async def load_inventory(self):
+        """Bakiyeleri kilit almadan çeker (çağıran bakiye kilitlerini tutmalıdır)"""
+        names = self.exchanges.names()
+        balances = await asyncio.gather(*(self.exchanges.get(name).fetch_balance() for name in names))
+        self.inventory = {name: dict(balance.get('free') or {}) for name, balance in zip(names, balances)}
+        self.inventory_version += 1
+
+    def available_inventory(self, name, asset):
+        """Önbellekteki bakiyeden süren işlemlerin ayırdığı miktar düşülmüş kullanılabilir bakiye"""
+        return self.inventory.get(name, {}).get(asset, 0) - self.inventory_reserved.get((name, asset), 0)
+
+    def reserve_inventory(self, amounts, release=False):
+        """(borsa, varlık, miktar) kayıtlarını ayırır; release=True ise ayrımı geri bırakır"""
+        for name, asset, amount in amounts:
+            key = (name, asset)
+            self.inventory_reserved[key] = self.inventory_reserved.get(key, 0) + (-amount if release else amount)
+            if self.inventory_reserved[key] <= 0:
+                del self.inventory_reserved[key]
+
+    async def get_deposit_address(self, exchange_name, code, network):
+        """Yatırma adresini döndürür (borsa/coin/ağ başına bir kez sorgulanır)"""
+        key = (exchange_name, code, network)
+        if key not in self.deposit_addresses:
+            self.deposit_addresses[key] = await self.exchange_by_name(exchange_name).fetch_deposit_address(
+                code, {'network': network}
+            )
+        return self.deposit_addresses[key]
+
+    async def get_withdraw_address(self, destination, code, network):
+        """Çekim hedefini (adres, tag) döndürür. ENV'deki sabit adresler yalnızca tanımlı oldukları rolde
+        (MEXC'ye coin, Gate.io'ya USDT) kullanılır; diğer durumlarda borsadan yatırma adresi sorgulanır."""
+        if destination == 'mexc' and code != 'USDT' and MEXC_WALLET_ADDRESS != 'YOUR_MEXC_WALLET_ADDRESS_HERE':
+            return MEXC_WALLET_ADDRESS, None
+        if destination == 'gate' and code == 'USDT' and GATE_IO_WALLET_ADDRESS != 'YOUR_GATE_IO_WALLET_ADDRESS_HERE':
+            return GATE_IO_WALLET_ADDRESS, None
+        try:
+            address = await self.get_deposit_address(destination, code, network)
+            return address.get('address'), address.get('tag')
+        except Exception as e:
+            logger.error(f"{EXCHANGE_NAMES[destination]} {code} yatırma adresi alınamadı: {e}")
+            return None, None
+
+    async def execute_inventory_trade(self, context: ContextTypes.DEFAULT_TYPE, coin, opportunity):
+        """Envanter modunda alış ve satış bacaklarını fırsatın yönünde eşzamanlı yürütür; transfer beklenmez"""
+        if not self.eligibility.is_eligible(coin, opportunity['direction']):
+            # Dengeleme transferleri de aynı ağlardan yapılır; yolu kapanmış coinde envanter biriktirilmez
+            reason = self.eligibility.reason(coin) or f"{opportunity['direction']} yönünde {coin} için ortak ağ yok"
+            self.send_admin_message(f"❌ **İşlem başlatılamadı:** {reason}", key=f"ineligible:{coin}")
+            return False
+        if self.reject_stale(coin, opportunity):
+            return False
+        trade = ArbitrageTrade(coin)
+        self.trades.append(trade)
+        symbol = f"{coin}/USDT"
+        quote = opportunity['quote']
+        buy_name, sell_name = split_direction(opportunity['direction'])
+        buy_exchange, sell_exchange = self.exchange_by_name(buy_name), self.exchange_by_name(sell_name)
+        buy_label, sell_label = EXCHANGE_NAMES[buy_name], EXCHANGE_NAMES[sell_name]
+        sell_amount = opportunity['expected_coin_amount']  # Alış borsasında alınacak miktar kadar satış borsasında satılır
+        reserved = ()
+        try:
+            # İki bacak da gönderilmeden yerelde doğrulanır; biri geçersizse hiçbiri gönderilmez
+            buy_request = self.order_builder.market_buy(buy_name, symbol, self.trade_amount_usdt, quote.buy_price)
+            sell_request = self.order_builder.market_sell(sell_name, symbol, sell_amount, quote.sell_price)
+
+            # Kilitler yalnızca ayırma ve mutabakat sırasında tutulur; emirler ve dolum beklemesi kilitsizdir
+            async with self.hold_balances(buy_name, sell_name):
+                if self.reject_stale(coin, opportunity):
+                    return False
+                # Yeterlilik kilit altında, eşzamanlı işlemlerin ayırdığı miktarlar düşülerek kontrol edilir;
+                # kullanılacak miktarlar işlem bitene kadar ayrılır
+                buy_usdt = self.available_inventory(buy_name, 'USDT')
+                sell_coin = self.available_inventory(sell_name, coin)
+                if buy_usdt < self.trade_amount_usdt or sell_coin < sell_amount:
+                    self.send_admin_message(f"⚠️ **Yetersiz envanter, {coin} işlemi atlandı.**\n\n{buy_label} USDT: `{buy_usdt:.2f}` (gereken `{self.trade_amount_usdt}`)\n{sell_label} {coin}: `{sell_coin:.6f}` (gereken `{sell_amount:.6f}`)", key=f"inventory_short:{coin}")
+                    return False
+                reserved = ((buy_name, 'USDT', self.trade_amount_usdt), (sell_name, coin, sell_amount))
+                self.reserve_inventory(reserved)
+                inventory_version = self.inventory_version
+
+            # İki bacak aynı anda gönderilir ve aynı anda izlenir
+            buy_order, sell_order = await asyncio.gather(
+                latency_metrics.timed('order_placement', buy_name, buy_exchange.create_market_buy_order(**buy_request)),
+                latency_metrics.timed('order_placement', sell_name, sell_exchange.create_market_sell_order(**sell_request)),
+                return_exceptions=True
+            )
+            buy_fill, sell_fill = await asyncio.gather(*(
+                self.settled_fill(name, exchange, order, symbol)
+                for name, exchange, order in ((buy_name, buy_exchange, buy_order), (sell_name, sell_exchange, sell_order))
+            ), return_exceptions=True)
+            buy_error = buy_order if isinstance(buy_order, Exception) else buy_fill if isinstance(buy_fill, Exception) else None
+            sell_error = sell_order if isinstance(sell_order, Exception) else sell_fill if isinstance(sell_fill, Exception) else None
+            unconfirmed = isinstance(buy_fill, Exception) or isinstance(sell_fill, Exception)
+
+            # Mutabakat: gerçekleşen bacaklar önbelleğe bakiye sorgusu yapmadan (eşzamanlı işlemlerin
+            # değişikliklerini ezmeden) işlenir. Dolumu doğrulanamayan bir bacak varsa veya emirler havadayken
+            # önbellek yenilendiyse (yeni bakiyeler dolumları zaten içeriyor olabilir) bakiyeler yeniden çekilir.
+            async with self.hold_balances(buy_name, sell_name):
+                if unconfirmed or self.inventory_version != inventory_version:
+                    await self.load_inventory()
+                else:
+                    changes = []
+                    if buy_fill:
+                        changes += [(buy_name, coin, buy_fill['net_base']),
+                                    (buy_name, 'USDT', -buy_fill['cost'] - buy_fill['quote_fee'])]
+                    if sell_fill:
+                        changes += [(sell_name, coin, -sell_fill['filled']),
+                                    (sell_name, 'USDT', sell_fill['net_quote'])]
+                    for name, asset, change in changes:
+                        self.inventory[name][asset] = self.inventory[name].get(asset, 0) + change
+                self.reserve_inventory(reserved, release=True)
+                reserved = ()
+
+            if buy_error or sell_error:
+                # Tek bacak gerçekleştiyse açık pozisyon kalır; önbellek güncellendi, dengeleme işi envanteri toparlar
+                logger.error(f"Envanter işlemi bacak hatası. Alış: {buy_error or 'OK'}, Satış: {sell_error or 'OK'}")
+                self.send_admin_message(f"🚨 **{coin} envanter işleminde bacak hatası!**\n\nAlış: `{buy_error or 'OK'}`\nSatış: `{sell_error or 'OK'}`\nEnvanteri kontrol edin.")
+                return False
+
+            trade.transition(TradeState.BOUGHT, buy_fill=buy_fill)
+            trade.transition(TradeState.SOLD, sell_fill=sell_fill)
+
+            # Gerçekleşen kâr: satış geliri - alış maliyeti; bacaklar arası coin farkı satış fiyatından değerlenir
+            coin_difference = buy_fill['net_base'] - sell_fill['filled']
+            profit = (sell_fill['net_quote'] - buy_fill['cost'] - buy_fill['quote_fee']
+                      + coin_difference * (sell_fill['average'] or 0))
+            self.stats['total_trades'] += 1
+            self.stats['successful_trades'] += 1
+            self.stats['total_profit'] += profit
+            self.stats['last_trade_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            trade.transition(TradeState.COMPLETED, profit=profit)
+
+            self.send_admin_message(f"⚡ **{coin} envanter işlemi tamamlandı ({trade.duration():.2f} sn)**\n\n{buy_label} alış: `{buy_fill['filled']}` @ `{buy_fill['average']}`\n{sell_label} satış: `{sell_fill['filled']}` @ `{sell_fill['average']}`\n📈 Kâr: ${profit:.2f}")
+            return True
+
+        except OrderValidationError as e:
+            logger.error(f"Envanter işlemi yerel emir doğrulamasında reddedildi: {e}")
+            self.send_admin_message(f"❌ **{coin} envanter işlemi yerel doğrulamada reddedildi, borsaya gönderilmedi!**\n\nDetay: `{e}`", key=f"order_rules:{coin}")
+            return False
+        except Exception as e:
+            logger.error(f"Envanter işlemi hatası: {e}", exc_info=True)
+            self.send_admin_message(f"❌ **{coin} envanter işleminde hata!**\n\nDetay: `{type(e).__name__}: {e}`")
+            return False
+        finally:
+            self.reserve_inventory(reserved, release=True)
+            if not trade.is_finished:
+                trade.transition(TradeState.FAILED)
+
+    async def rebalance_inventory(self):
+        """Eşik dışına kayan varlıkları toplu transferle hedef paya çeker (varlık başına tek çekim).
+        Hedef pay borsalar arasında eşit dağılımdır; en az paya sahip borsanın payı eşit payın
+        2 * INVENTORY_MIN_SHARE katının altına düşünce en çok paya sahip borsadan aktarım yapılır."""
+        names = self.exchanges.names()
+        for asset in list(self.inventory_coins) + ['USDT']:
+            if asset in self.pending_rebalances:
+                continue  # Önceki dengeleme transferi henüz hesaba geçmedi
+            amounts = {name: self.inventory.get(name, {}).get(asset, 0) for name in names}
+            total = sum(amounts.values())
+            if total <= 0:
+                continue
+            equal_share = total / len(names)
+            destination = min(amounts, key=amounts.get)
+            source = max(amounts, key=amounts.get)
+            if amounts[destination] >= equal_share * 2 * INVENTORY_MIN_SHARE:
+                continue
+            # Süren işlemlerin ayırdığı miktar kaynaktan çekilmez
+            amount = min(amounts[source] - equal_share, equal_share - amounts[destination],
+                         self.available_inventory(source, asset))
+            if amount <= 0:
+                continue
+            self.pending_rebalances[asset] = asyncio.create_task(
+                self.rebalance_transfer(asset, source, destination, amount)
+            )
+
+    async def rebalance_transfer(self, asset, source, destination, amount):
+        """Tek bir dengeleme çekimini yapar ve hesaba geçene kadar izler"""
+        try:
+            preferred = USDT_NETWORK if asset == 'USDT' else WITHDRAW_NETWORKS.get(asset)
+            selected = self.fee_registry.select_network(source, destination, asset, preferred)
+            if not selected:
+                logger.warning(f"{asset} için {source} → {destination} dengeleme ağı bulunamadı")
+                return
+            network, entry = selected
+            try:
+                request = self.order_builder.withdrawal(source, asset, amount, entry['min_withdraw'])
+            except OrderValidationError as e:
+                logger.info(f"{asset} dengeleme çekimi yapılmadı: {e}")
+                return
+            amount = request['amount']
+
+            address = await self.get_deposit_address(destination, asset, network)
+            source_exchange = self.exchange_by_name(source)
+            with latency_metrics.time('withdrawal', source):
+                withdrawal = await source_exchange.withdraw(
+                    request['code'], amount, address['address'], tag=address.get('tag'), params={'network': network}
+                )
+            logger.info(f"Envanter dengeleme: {amount} {asset} {source} → {destination} ({network}), çekim {withdrawal.get('id')}")
+            with latency_metrics.time('deposit_credit', destination):
+                await self.transfer_watcher.wait_for_credit(
+                    source_exchange, self.exchange_by_name(destination), asset, withdrawal
                 )
+            logger.info(f"Envanter dengeleme tamamlandı: {asset} {destination} hesabına geçti")
+            await self.refresh_inventory()
+        except Exception as e:
+            logger.error(f"{asset} envanter dengeleme hatası: {e}", exc_info=True)
+        finally:
+            self.pending_rebalances.pop(asset, None)
+
+    async def inventory_rebalance_loop(self):
+        """Envanter modu açıkken bakiyeleri periyodik olarak yeniler ve gerekirse dengeler"""
+        while True:
+            if self.inventory_mode:
+                try:
+                    await self.refresh_inventory()
+                    await self.rebalance_inventory()
+                except Exception as e:
+                    logger.error(f"Envanter dengeleme döngüsü hatası: {e}")
+            await asyncio.sleep(REBALANCE_INTERVAL)
+
+    async def settled_fill(self, name, exchange, order, symbol):
+        """Gönderilemeyen bacak için None, gönderilen bacak için dolum özetini döndürür"""
+        if isinstance(order, Exception):
+            return None
+        return await latency_metrics.timed(
+            'fill_confirmation', name, self.order_tracker.wait_for_fill(exchange, order, symbol)
+        )
+
+    @asynccontextmanager
+    async def hold_balances(self, *names):
+        """Verilen borsaların bakiye kilitlerini her zaman aynı (ada göre sıralı) sırayla alır; ters yönlü
+        eşzamanlı işlemler kilitleri çapraz tutup birbirini sonsuza kadar bekleyemez"""
+        async with AsyncExitStack() as stack:
+            for name in sorted(set(names)):
+                await stack.enter_async_context(self.balance_locks[name])
+            yield
+
+    @property
+    def max_concurrent_trades(self):
+        return self.trade_limiter.limit
+
+    def can_launch_trade(self):
+        """Yeni bir işlem için (çalışan + sırada bekleyen) kapasite olup olmadığını döndürür"""
+        return len(self.active_trades) < self.max_concurrent_trades + MAX_QUEUED_TRADES
+
+    def launch_trade(self, context: ContextTypes.DEFAULT_TYPE, opportunity):
+        """İşlemi izlenen bir arka plan görevi olarak başlatır"""
+        coin = opportunity['coin']
+        self.trading_coins.add(coin)
+        task = asyncio.create_task(self.run_trade(context, opportunity))
+        self.active_trades.add(task)
+        task.add_done_callback(self.active_trades.discard)
+        return task
 
-            self.stats['last_trade_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            return True
+    async def run_trade(self, context: ContextTypes.DEFAULT_TYPE, opportunity):
+        """Eşzamanlı işlem limitine uyarak işlemi yürütür ve sonucu bildirir"""
+        coin = opportunity['coin']
+        try:
+            async with self.trade_limiter:
+                if self.shutting_down:
+                    logger.info(f"{coin} işlemi kapanış nedeniyle başlatılmadı")
+                    return
+                if self.inventory_mode:
+                    success = await self.execute_inventory_trade(context, coin, opportunity)
+                else:
+                    success = await self.execute_arbitrage_trade(context, coin, opportunity)
             
-        except ccxt.NetworkError as e:
-            logger.error(f"İşlem gerçekleştirme hatası (Ağ hatası): {e}")
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"❌ **İşlem sırasında ağ hatası oluştu!**\n\nDetay: `{e}`\nLütfen internet bağlantınızı kontrol edin ve borsaların durumunu inceleyin.",
-                parse_mode='Markdown'
-            )
-            return False
-        except ccxt.ExchangeError as e:
-            logger.error(f"İşlem gerçekleştirme hatası (Borsa hatası): {e}")
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"❌ **İşlem sırasında borsa hatası oluştu!**\n\nDetay: `{e}`\n(Örn: Yetersiz bakiye, geçersiz emir, API hatası)",
-                parse_mode='Markdown'
-            )
-            return False
+            if ADMIN_CHAT_ID:
+                if success:
+                    self.send_admin_message(f"✅ **{coin} işlemi başarıyla tamamlandı!**")
+                else:
+                    self.send_admin_message(f"❌ **{coin} işlemi başarısız oldu! Detaylar için yukarıdaki hataları kontrol edin.**")
         except Exception as e:
-            logger.error(f"İşlem gerçekleştirme hatası (Genel hata): {e}", exc_info=True) # exc_info ile traceback göster
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=f"❌ **İşlem gerçekleştirme sırasında beklenmedik bir hata oluştu!**\n\nDetay: `{type(e).__name__}: {e}`",
-                parse_mode='Markdown'
-            )
-            return False
-    
+            logger.error(f"{coin} işlem görevi hatası: {e}", exc_info=True)
+        finally:
+            self.trading_coins.discard(coin)
+
     async def monitoring_loop(self, context: ContextTypes.DEFAULT_TYPE):
         """Ana izleme döngüsü"""
+        error_backoff = 1
         while self.is_running:
             try:
-                opportunity = await self.check_arbitrage_opportunity()
+                if self.shard_pool:
+                    # İşçilere güncel coin dilimleri ve ayarlar gönderilir (tarayıcı kapalıysa boşta beklerler)
+                    self.shard_pool.configure(self)
+                sharded = self.scan_mode and self.shard_pool is not None
+                if sharded:
+                    # Akış ve yoklama işçi süreçlerde yapılır
+                    await self.stop_streaming()
+                else:
+                    await self.ensure_streaming()
+
+                # Akış açıkken olay güdümlü çalışılır: sadece defteri değişen coinler değerlendirilir.
+                # Akış yokken tarayıcı modunda sadece vadesi gelen coinler, borsa başına bütçe içinde yoklanır.
+                pacing = 'shard' if sharded else self.scan_pacing()
+                # Olay güdümlü, uyarlanır ve bölünmüş modda her parti için log basmak gürültü yaratır
+                log_info = logger.info if pacing == 'interval' else logger.debug
+                coins = None
+                if sharded:
+                    opportunities = await self.shard_pool.next_candidates(self.check_interval, self.max_quote_age)
+                    if not opportunities:
+                        continue
+                elif pacing != 'interval':
+                    coins = await self.next_scan_batch(pacing)
+                    if not coins:
+                        continue
+
+                if self.scan_mode:
+                    if not sharded:
+                        # Coin evrenini (veya değişen coinleri) tek geçişte tara, en kârlı fırsatı değerlendir
+                        opportunities = await self.scan_arbitrage_opportunities(coins)
+                        if pacing == 'poll':
+                            self.poll_scheduler.record_scan(coins, opportunities, self.min_profit_percentage, self.check_interval)
+                    # Zaten işlemde olan (ve envanter modunda envanteri olmayan) coinler atlanır;
+                    # sıralama kârlı fırsatları öne alır
+                    opportunity = next((
+                        o for o in opportunities
+                        if o['coin'] not in self.trading_coins
+                        and (not self.inventory_mode or o['coin'] in self.inventory_coins)
+                    ), None)
+                    if sharded:
+                        log_info(f"İşçilerden {len(opportunities)} aday fırsat alındı")
+                    else:
+                        log_info(f"Tarama tamamlandı: {len(opportunities)}/{len(coins or self.coin_universe)} coin değerlendirildi")
+                else:
+                    opportunity = await self.check_arbitrage_opportunity()
+                coin = opportunity['coin'] if opportunity else self.current_coin
                 
-                if opportunity and opportunity['is_profitable']:
+                if opportunity and opportunity['is_profitable'] and coin in self.trading_coins:
+                    log_info(f"{coin} için süren bir işlem var, fırsat atlandı.")
+                elif opportunity and opportunity['is_profitable'] and not self.can_launch_trade():
+                    log_info(f"İşlem kuyruğu dolu ({len(self.active_trades)} işlem), {coin} fırsatı atlandı.")
+                elif opportunity and opportunity['is_profitable']:
                     message = f"""
 🚀 **ARBİTRAJ FIRSATI BULUNDU!**
 
-💰 Coin: {self.current_coin}
-📊 Gate.io Fiyatı: ${opportunity['gate_price']:.6f}
-📊 MEXC Fiyatı: ${opportunity['mexc_price']:.6f}
-💸 Transfer Ücreti: {opportunity['transfer_fee']:.6f} {self.current_coin} (tahmini)
+💰 Coin: {coin}
+🔀 Yön: {EXCHANGE_NAMES[opportunity['buy_exchange']]} → {EXCHANGE_NAMES[opportunity['sell_exchange']]}
+📊 {EXCHANGE_NAMES[opportunity['buy_exchange']]} Alış Fiyatı: ${opportunity['buy_price']:.6f}
+📊 {EXCHANGE_NAMES[opportunity['sell_exchange']]} Satış Fiyatı: ${opportunity['sell_price']:.6f}
+💸 Transfer Ücreti: {opportunity['transfer_fee']:.6f} {coin} ({opportunity['withdraw_network']} ağı)
+📐 VWAP Alış/Satış: ${opportunity['buy_vwap']:.6f} / ${opportunity['sell_vwap']:.6f}
+📉 Kayma: %{opportunity['buy_slippage_percentage']:.2f} alış, %{opportunity['sell_slippage_percentage']:.2f} satış
+📦 Maksimum Kârlı Büyüklük: ${opportunity['max_profitable_usdt']:.2f}
 🎯 Tahmini Kâr: ${opportunity['profit']:.2f} ({opportunity['profit_percentage']:.2f}%)
 
 ⚡ İşlem başlatılıyor...
@@ -468,48 +3491,899 @@ class ArbitrageBot:
                     
                     # Admin'e bildirim gönder
                     if ADMIN_CHAT_ID:
-                        await context.bot.send_message(
-                            chat_id=ADMIN_CHAT_ID,
-                            text=message,
-                            parse_mode='Markdown'
-                        )
+                        self.send_admin_message(message)
                     else:
                         logger.warning("ADMIN_CHAT_ID ayarlanmamış, arbitraj fırsatı bildirimi gönderilemedi.")
 
-                    # İşlemi gerçekleştir
-                    success = await self.execute_arbitrage_trade(context) # context'i buraya ekledik
-                    
-                    if ADMIN_CHAT_ID:
-                        if success:
-                            await context.bot.send_message(
-                                chat_id=ADMIN_CHAT_ID,
-                                text="✅ **İşlem başarıyla tamamlandı!**",
-                                parse_mode='Markdown'
-                            )
-                        else:
-                            await context.bot.send_message(
-                                chat_id=ADMIN_CHAT_ID,
-                                text="❌ **İşlem başarısız oldu! Detaylar için yukarıdaki hataları kontrol edin.**",
-                                parse_mode='Markdown'
-                            )
+                    # İşlemi arka planda başlat; döngü beklemeden fırsat aramaya devam eder
+                    self.launch_trade(context, opportunity)
                 else:
                     if opportunity:
-                        logger.info(f"Kârlı fırsat yok. {self.current_coin} - Kâr: {opportunity['profit_percentage']:.2f}% (Min: {self.min_profit_percentage}%)")
+                        log_info(f"Kârlı fırsat yok. {coin} - Kâr: {opportunity['profit_percentage']:.2f}% (Min: {self.min_profit_percentage}%)")
                     else:
-                        logger.warning(f"Arbitraj fırsatı kontrolü başarısız oldu veya veri alınamadı. {self.current_coin}")
+                        logger.warning(f"Arbitraj fırsatı kontrolü başarısız oldu veya veri alınamadı. {coin}")
                 
-                await asyncio.sleep(self.check_interval)
+                error_backoff = 1
+                # 'poll' turlarında bekleme next_scan_batch'tedir (vadesi gelen coin yoksa veya bütçe dolduysa)
+                if pacing == 'interval':
+                    await asyncio.sleep(self.check_interval)
                 
             except Exception as e:
                 logger.error(f"İzleme döngüsü hatası: {e}", exc_info=True)
                 if ADMIN_CHAT_ID:
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"🚨 **İzleme döngüsünde kritik hata!**\n\nDetay: `{type(e).__name__}: {e}`\nBot durdurulmuş olabilir veya stabil çalışmıyor.",
-                        parse_mode='Markdown'
-                    )
-                # Hata durumunda botun tamamen durmasını engellemek için daha uzun bekleyebiliriz.
-                await asyncio.sleep(60)
+                    self.send_admin_message(f"🚨 **İzleme döngüsünde kritik hata!**\n\nDetay: `{type(e).__name__}: {e}`\nBot durdurulmuş olabilir veya stabil çalışmıyor.", key=f"monitoring:{type(e).__name__}")
+                # Hata durumunda sabit 60 sn yerine artan bekleme: geçici hatalarda hızlı toparlanır,
+                # kalıcı hatalarda borsaları/Telegram'ı yormaz.
+                await asyncio.sleep(error_backoff)
+                error_backoff = min(error_backoff * 2, 60)
+
+        await self.stop_streaming()
+        if self.shard_pool:
+            # Bot durunca işçiler taramayı bırakır
+            self.shard_pool.configure(self)
+
+    async def apply_shard_settings(self, settings):
+        """Koordinatörden gelen ayar görüntüsünü işçi bota uygular. Market ve ücret verisi işçide
+        yenilenmez: koordinatör market önbelleğini yeniledikçe diskten okunur, ücret kayıtları
+        değiştikçe ayarlarla birlikte gelir."""
+        if settings['markets_version'] != self.markets_version:
+            if self.markets_version is not None:
+                for name, exchange in self.exchanges.items():
+                    await self.load_exchange_markets(exchange)
+                    self.eligibility.update_markets(name, exchange.markets)
+            self.markets_version = settings['markets_version']
+        if 'fee_entries' in settings:
+            self.fee_registry.restore(settings['fee_entries'])
+            self.eligibility.refresh()
+        self.coin_universe = settings['coins']
+        self.min_profit_percentage = settings['min_profit_percentage']
+        self.trade_amount_usdt = settings['trade_amount_usdt']
+        self.check_interval = settings['check_interval']
+        self.depth_levels = settings['depth_levels']
+        self.max_quote_age = settings['max_quote_age']
+        self.streaming_enabled = settings['streaming_enabled']
+
+    async def shard_scan_loop(self, index, results):
+        """İşçi süreçte coin dilimini izleme döngüsüyle aynı tetiklemelerle tarar ve
+        kârlı fırsatları (fiyat görüntüsüyle) koordinatörün sonuç kuyruğuna koyar"""
+        error_backoff = 1
+        while True:
+            try:
+                await self.ensure_streaming()
+                pacing = self.scan_pacing()
+                coins = None
+                if pacing != 'interval':
+                    coins = await self.next_scan_batch(pacing)
+                    if not coins:
+                        continue
+                opportunities = await self.scan_arbitrage_opportunities(coins)
+                if pacing == 'poll':
+                    self.poll_scheduler.record_scan(coins, opportunities, self.min_profit_percentage, self.check_interval)
+                candidates = [o for o in opportunities if o['is_profitable']]
+                if candidates:
+                    results.put((index, candidates))
+
+                error_backoff = 1
+                # 'poll' turlarında bekleme next_scan_batch'tedir (vadesi gelen coin yoksa veya bütçe dolduysa)
+                if pacing == 'interval':
+                    await asyncio.sleep(self.check_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Parça tarama döngüsü hatası: {e}", exc_info=True)
+                await asyncio.sleep(error_backoff)
+                error_backoff = min(error_backoff * 2, 60)
+
+
+class ShardPool:
+    """Tarayıcıyı işçi süreçlere böler: her işçi coin evreninin bir dilimini (coin adının CRC32'sine göre)
+    kendi borsa istemcileri ve event loop'uyla tarar, sadece kârlı fırsatları koordinatöre gönderir.
+    İşlem yürütme ve Telegram koordinatör süreçte kalır."""
+
+    def __init__(self, workers=SCAN_WORKERS, join_timeout=10):
+        self.workers = workers
+        self.join_timeout = join_timeout
+        # fork, event loop ve ccxt/aiohttp durumunu kopyalar; işçiler temiz bir yorumlayıcıyla başlatılır
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self.controls = []  # İşçi başına ayar kuyruğu (None: kapan)
+        self.results = None  # Tüm işçilerin (işçi, fırsatlar) gönderdiği kuyruk
+        self.candidates = None  # Okuyucu iş parçacığının sonuçları event loop'a aktardığı kuyruk
+        self.sent = {}  # İşçi -> son gönderilen ayar görüntüsü
+        self.reader = None
+
+    @staticmethod
+    def shard_of(coin, count):
+        # hash() süreçler arasında tuzlandığından kararlı bir özet kullanılır
+        return zlib.crc32(coin.encode()) % count
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.results = self.context.Queue()
+        self.candidates = asyncio.Queue()
+        for index in range(self.workers):
+            self.controls.append(self.context.Queue())
+            self.processes.append(self.spawn(index))
+        self.reader = threading.Thread(target=self.read_results, args=(loop,), name='shard-results', daemon=True)
+        self.reader.start()
+        logger.info(f"{self.workers} tarama işçisi başlatıldı")
+
+    def spawn(self, index):
+        process = self.context.Process(
+            target=run_scan_worker, args=(index, self.controls[index], self.results),
+            name=f"scan-shard-{index}", daemon=True
+        )
+        process.start()
+        self.sent.pop(index, None)  # Yeni sürece ayarlar baştan gönderilir
+        return process
+
+    def read_results(self, loop):
+        """Sonuç kuyruğunu ayrı iş parçacığında okur; event loop bloklanmaz"""
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            loop.call_soon_threadsafe(self.candidates.put_nowait, item)
+
+    def configure(self, bot):
+        """Ölen işçileri yeniden başlatır, değişen coin dilimlerini ve ayarları işçilere gönderir"""
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                logger.error(f"Tarama işçisi {index} durmuş (çıkış kodu {process.exitcode}), yeniden başlatılıyor")
+                self.processes[index] = self.spawn(index)
+
+        shards = [[] for _ in range(self.workers)]
+        for coin in bot.tradable_universe():
+            shards[self.shard_of(coin, self.workers)].append(coin)
+        for index, control in enumerate(self.controls):
+            settings = {
+                'active': bot.is_running and bot.scan_mode,
+                'coins': shards[index],
+                'min_profit_percentage': bot.min_profit_percentage,
+                'trade_amount_usdt': bot.trade_amount_usdt,
+                'check_interval': bot.check_interval,
+                'depth_levels': bot.depth_levels,
+                'max_quote_age': bot.max_quote_age,
+                'streaming_enabled': bot.streaming_enabled,
+                'markets_version': bot.markets_version,
+                'fee_version': bot.fee_registry.version,
+            }
+            sent = self.sent.get(index)
+            if settings != sent:
+                # Ücret kayıtları sadece değiştiklerinde gönderilir (her turda karşılaştırılmaz)
+                message = settings
+                if sent is None or sent['fee_version'] != settings['fee_version']:
+                    message = {**settings, 'fee_entries': bot.fee_registry.snapshot()}
+                control.put(message)
+                self.sent[index] = settings
+
+    async def next_candidates(self, timeout, max_age):
+        """İşçilerden gelen fırsatları bekler; birikenlerin hepsini alır, coin başına en yenisini tutar,
+        fiyat görüntüsü max_age saniyeden eski olanları atar ve kâra göre sıralı döndürür"""
+        try:
+            items = [await asyncio.wait_for(self.candidates.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.candidates.empty():
+            items.append(self.candidates.get_nowait())
+
+        latest = {}
+        for _, opportunities in items:
+            for opportunity in opportunities:
+                if opportunity['quote'].age() <= max_age:
+                    latest[opportunity['coin']] = opportunity
+        return sorted(latest.values(), key=lambda o: (o['is_profitable'], o['profit_percentage']), reverse=True)
+
+    def alive(self):
+        return sum(process.is_alive() for process in self.processes)
+
+    async def stop(self):
+        """İşçilere kapanma sinyali gönderir, join_timeout içinde kapanmayanları sonlandırır"""
+        for control in self.controls:
+            control.put(None)
+
+        def join():
+            for process in self.processes:
+                process.join(self.join_timeout)
+                if process.is_alive():
+                    logger.warning(f"{process.name} zamanında kapanmadı, sonlandırılıyor")
+                    process.terminate()
+                    process.join()
+
+        await asyncio.to_thread(join)
+        self.processes = []
+        if self.results is not None:
+            self.results.put(None)  # Okuyucu iş parçacığı çıkar
+
+
+def run_scan_worker(index, control, results):
+    """Tarama işçisi sürecinin girişi (spawn ile ayrı yorumlayıcıda çalışır)"""
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(f'%(asctime)s - %(name)s[parça {index}] - %(levelname)s - %(message)s'))
+    try:
+        asyncio.run(scan_worker_main(index, control, results))
+    except KeyboardInterrupt:
+        pass
+
+
+async def scan_worker_main(index, control, results):
+    """İşçi botu yalnızca tarama için kurar; koordinatörden ayar geldikçe tarama döngüsünü yeniden başlatır"""
+    bot = ArbitrageBot(None, os.getenv('GATE_API_KEY'), os.getenv('GATE_SECRET'),
+                       os.getenv('MEXC_API_KEY'), os.getenv('MEXC_SECRET'))
+    # İşçi işlem yapmaz, Telegram'a yazmaz ve tick kaydını koordinatöre bırakır
+    bot.notifier = NotificationDispatcher(None)
+    if bot.tick_recorder:
+        bot.order_book_store.listeners.remove(bot.record_book_update)
+        bot.tick_recorder = None
+    bot.inventory_mode = False
+    bot.universe_from_markets = False
+    bot.coin_universe = []
+    bot.scan_mode = True
+    # Market önbelleğini ve ücret kayıtlarını yalnızca koordinatör yeniler ve yazar
+    bot.market_cache = MarketCache(read_only=True)
+    bot.markets_version = None  # İlk ayarlarla eşitlenir; başlangıçta yüklenen veri güncel sayılır
+    if not await bot.initialize_exchanges(trading=False, background_tasks=False):
+        return
+
+    scan_task = None
+    try:
+        while True:
+            settings = await asyncio.to_thread(control.get)
+            if scan_task:
+                scan_task.cancel()
+                await asyncio.gather(scan_task, return_exceptions=True)
+                scan_task = None
+            if settings is None:
+                return
+            await bot.apply_shard_settings(settings)
+            if settings['active'] and settings['coins']:
+                scan_task = asyncio.create_task(bot.shard_scan_loop(index, results))
+            else:
+                await bot.stop_streaming()
+    finally:
+        if scan_task:
+            scan_task.cancel()
+            await asyncio.gather(scan_task, return_exceptions=True)
+        await bot.shutdown()
+
+
+class BacktestEngine:
+    """Kaydedilmiş emir defteri bantlarını check_arbitrage_opportunity ile aynı fırsat mantığından
+    (evaluate_matrix + apply_depth) geçirir; gecikmeli dolumları ve transfer sürelerini simüle eder.
+    Her gecikme değeri ayrı bir senaryodur ve hepsi bandın tek geçişinde değerlendirilir."""
+
+    def __init__(self, bot, latencies=(0.0,), transfer_delay=600.0, taker_fee_percentage=0.1, fees=None, default_fee_usdt=None):
+        self.bot = bot
+        # Bant süresince ücret kayıtları bayatlamaz
+        self.bot.fee_registry = FeeRegistry(ttl=float('inf'))
+        self.bot.eligibility = EligibilityIndex(self.bot.fee_registry)
+        self.fees = dict(fees or {})  # Coin -> {'fee': coin cinsinden, 'min_withdraw': ...}
+        self.transfer_delay = transfer_delay  # Saniye; çekimden karşı borsada hesaba geçişe kadar
+        self.taker_fee = taker_fee_percentage / 100  # Her iki bacakta alınan işlem ücreti
+        self.default_fee_usdt = default_fee_usdt  # Ücret dosyasında olmayan coinler için USDT cinsinden çekim ücreti
+        self.books = {}  # (borsa, coin) -> (bids, asks)
+        self.venues = []  # Bantta görülen borsalar (ilk görülme sırasıyla)
+        self.events = 0
+        self.opportunities = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.sequence = 0
+        self.scenarios = [
+            {'latency': latency, 'queue': [], 'busy': set(), 'trades': []}
+            for latency in latencies
+        ]
+
+    @staticmethod
+    def read_tape(path):
+        """JSON satırları bandını okur (.gz destekli). Her satır bir defter görüntüsüdür:
+        {"ts": saniye, "exchange": "gate", "coin": "WHITE", "bids": [[fiyat, miktar], ...], "asks": [...]}"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def fill_buy(asks, usdt):
+        """USDT tutarını satış kademelerinden harcar; (alınan coin, harcanan USDT) döndürür"""
+        coins = spent = 0.0
+        for level in asks:
+            price, amount = level[0], level[1]
+            if spent + price * amount >= usdt:
+                return coins + (usdt - spent) / price, usdt
+            coins += amount
+            spent += price * amount
+        return coins, spent
+
+    @staticmethod
+    def fill_sell(bids, coins):
+        """Coin miktarını alış kademelerine satar; (elde edilen USDT, satılan coin) döndürür"""
+        usdt = sold = 0.0
+        for level in bids:
+            price, amount = level[0], level[1]
+            if sold + amount >= coins:
+                return usdt + (coins - sold) * price, coins
+            usdt += price * amount
+            sold += amount
+        return usdt, sold
+
+    def add_venue(self, venue):
+        """Bantta yeni görülen borsaya bilinen ücret varsayımlarını işler"""
+        self.venues.append(venue)
+        load_backtest_fees(self.bot.fee_registry, self.fees, [venue])
+
+    def ensure_fee(self, coin, bids, asks):
+        """Ücret varsayımı olmayan coin için varsayılan USDT ücretini coin cinsine çevirip tüm borsalara işler"""
+        if coin in self.fees or self.default_fee_usdt is None or not bids or not asks:
+            return
+        mid = (bids[0][0] + asks[0][0]) / 2
+        self.fees[coin] = {'fee': self.default_fee_usdt / mid}
+        load_backtest_fees(self.bot.fee_registry, {coin: self.fees[coin]}, self.venues)
+
+    def schedule(self, scenario, due, action, position):
+        heapq.heappush(scenario['queue'], (due, self.sequence, action, position))
+        self.sequence += 1
+
+    def run_due(self, now):
+        """Zamanı gelmiş (now'a kadar) simüle emirleri o anki defterlerle gerçekleştirir"""
+        for scenario in self.scenarios:
+            queue = scenario['queue']
+            while queue and queue[0][0] <= now:
+                due, _, action, position = heapq.heappop(queue)
+                if action == 'buy':
+                    self.simulate_buy(scenario, due, position)
+                else:
+                    self.simulate_sell(scenario, position)
+
+    def simulate_buy(self, scenario, due, position):
+        _, asks = self.books[(position['buy_exchange'], position['coin'])]
+        coins, spent = self.fill_buy(asks, self.bot.trade_amount_usdt)
+        position['spent'] = spent
+        # İşlem ücreti ve çekim ücreti düşüldükten sonra karşı borsaya ulaşan miktar
+        position['coins'] = coins * (1 - self.taker_fee) - position['transfer_fee']
+        if position['coins'] <= 0:
+            self.close(scenario, position, 0.0)
+            return
+        self.schedule(scenario, due + self.transfer_delay + scenario['latency'], 'sell', position)
+
+    def simulate_sell(self, scenario, position):
+        bids, _ = self.books[(position['sell_exchange'], position['coin'])]
+        usdt, sold = self.fill_sell(bids, position['coins'])
+        # Defter yetmezse kalan coin en iyi alış fiyatından değerlenir
+        unsold = position['coins'] - sold
+        if unsold > 0 and bids:
+            usdt += unsold * bids[0][0]
+        self.close(scenario, position, usdt * (1 - self.taker_fee))
+
+    def close(self, scenario, position, proceeds):
+        position['pnl'] = proceeds - position['spent']
+        scenario['trades'].append(position)
+        scenario['busy'].discard(position['coin'])
+
+    def on_record(self, record):
+        ts = record['ts']
+        self.run_due(ts)
+        self.events += 1
+        self.first_ts = ts if self.first_ts is None else self.first_ts
+        self.last_ts = ts
+
+        exchange, coin = record['exchange'], record['coin']
+        if exchange not in self.venues:
+            self.add_venue(exchange)
+        bids, asks = record['bids'], record['asks']
+        previous = self.books.get((exchange, coin))
+        self.books[(exchange, coin)] = (bids, asks)
+        # En iyi fiyatlar değişmediyse fırsat da değişmemiştir
+        if previous and previous[0][:1] == bids[:1] and previous[1][:1] == asks[:1]:
+            return
+        self.ensure_fee(coin, bids, asks)
+        self.evaluate(ts, coin)
+
+    def evaluate(self, ts, coin):
+        tickers = {}
+        for venue in self.venues:
+            book = self.books.get((venue, coin))
+            if book and book[0] and book[1]:
+                tickers[venue] = {f"{coin}/USDT": {'bid': book[0][0][0], 'ask': book[1][0][0]}}
+        if len(tickers) < 2:
+            return
+        # Ön eleme: ücretler kârı sadece düşürür; en yüksek alış / en düşük satış oranı eşiği
+        # geçmiyorsa hiçbir çift kârlı olamaz (bantta olayların büyük çoğunluğu burada elenir)
+        quotes = [t[f"{coin}/USDT"] for t in tickers.values()]
+        best_spread = (max(q['bid'] for q in quotes) / min(q['ask'] for q in quotes) - 1) * 100
+        if best_spread < self.bot.min_profit_percentage:
+            return
+        opportunities = self.bot.evaluate_matrix([coin], tickers, self.venues, captured_at=ts)
+        if not opportunities or not opportunities[0]['is_profitable']:
+            return
+        opportunity = opportunities[0]
+        depth = self.bot.depth_levels
+        buy_asks = self.books[(opportunity['buy_exchange'], coin)][1][:depth]
+        sell_bids = self.books[(opportunity['sell_exchange'], coin)][0][:depth]
+        self.bot.apply_depth(opportunity, buy_asks, sell_bids)
+        if not opportunity['is_profitable']:
+            return
+
+        self.opportunities += 1
+        for scenario in self.scenarios:
+            if coin in scenario['busy'] or len(scenario['busy']) >= self.bot.max_concurrent_trades:
+                continue
+            scenario['busy'].add(coin)
+            position = {
+                'coin': coin,
+                'detected_at': ts,
+                'buy_exchange': opportunity['buy_exchange'],
+                'sell_exchange': opportunity['sell_exchange'],
+                'transfer_fee': opportunity['transfer_fee'],
+                'expected_profit': opportunity['profit'],
+            }
+            self.schedule(scenario, ts + scenario['latency'], 'buy', position)
+
+    def run(self, records):
+        """Bandı baştan sona oynatır; kayıtlar zamana göre sıralı olmalıdır"""
+        started = time.perf_counter()
+        for record in records:
+            self.on_record(record)
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self):
+        """Senaryo (gecikme) başına PnL, isabet oranı ve beklenen/gerçekleşen kâr özetini döndürür"""
+        scenarios = []
+        for scenario in self.scenarios:
+            trades = scenario['trades']
+            pnl = sum(t['pnl'] for t in trades)
+            wins = sum(1 for t in trades if t['pnl'] > 0)
+            scenarios.append({
+                'latency': scenario['latency'],
+                'trades': len(trades),
+                'open': len(scenario['queue']),  # Bant bittiğinde hâlâ transferde/emirde olanlar
+                'hit_rate': wins / len(trades) if trades else 0.0,
+                'pnl': pnl,
+                'avg_pnl': pnl / len(trades) if trades else 0.0,
+                'expected_pnl': sum(t['expected_profit'] for t in trades),
+            })
+        span = (self.last_ts - self.first_ts) if self.events else 0.0
+        return {
+            'min_profit_percentage': self.bot.min_profit_percentage,
+            'trade_amount_usdt': self.bot.trade_amount_usdt,
+            'events': self.events,
+            'opportunities': self.opportunities,
+            'tape_seconds': span,
+            'elapsed_seconds': self.elapsed,
+            'speedup': span / self.elapsed if self.elapsed else 0.0,
+            'scenarios': scenarios,
+        }
+
+
+def load_backtest_fees(registry, fees, venues, network='BACKTEST'):
+    """{"COIN": {"fee": ..., "min_withdraw": ...}} ücret varsayımlarını tüm borsa çiftlerine açık olarak işler"""
+    currencies = {
+        coin: {'networks': {network: {
+            'fee': info.get('fee', 0.0),
+            'limits': {'withdraw': {'min': info.get('min_withdraw')}},
+            'withdraw': True,
+            'deposit': True,
+        }}}
+        for coin, info in fees.items()
+    }
+    for venue in venues:
+        registry.update_from_currencies(venue, currencies)
+
+
+def run_backtest(argv):
+    """Komut satırı: python bot-3.py backtest BANT [--min-profit 0.5,1] [--amount 100,500] [--latency 0,1,5] ..."""
+    parser = argparse.ArgumentParser(prog='bot-3.py backtest', description='Kaydedilmiş bant üzerinde arbitraj geri testi')
+    parser.add_argument('tape', help='JSON satırları bandı (.jsonl veya .jsonl.gz) veya TickRecorder dizini')
+    parser.add_argument('--coin', help='Sadece bu coinin kayıtları (TickRecorder dizini için)')
+    parser.add_argument('--start', help='Başlangıç zamanı (unix saniye veya ISO tarih, TickRecorder dizini için)')
+    parser.add_argument('--end', help='Bitiş zamanı (unix saniye veya ISO tarih, TickRecorder dizini için)')
+    parser.add_argument('--fees', help='Coin başına çekim ücreti varsayımları (JSON): {"WHITE": {"fee": 0.1, "min_withdraw": 1}}')
+    parser.add_argument('--default-fee-usdt', type=float, default=1.0, help='Ücret dosyasında olmayan coinler için USDT cinsinden çekim ücreti')
+    parser.add_argument('--min-profit', default=None, help='Minimum kâr oranları (virgülle ayrılmış, %%)')
+    parser.add_argument('--amount', default=None, help='İşlem miktarları (virgülle ayrılmış, USDT)')
+    parser.add_argument('--latency', default='0,0.5,2,5', help='Emir gecikmeleri (virgülle ayrılmış, saniye)')
+    parser.add_argument('--transfer-delay', type=float, default=600.0, help='Transferin hesaba geçme süresi (saniye)')
+    parser.add_argument('--taker-fee', type=float, default=0.1, help='İşlem ücreti (%%, her bacak için)')
+    parser.add_argument('--json', dest='json_path', help='Raporun yazılacağı JSON dosyası')
+    args = parser.parse_args(argv)
+
+    def parse_list(value):
+        return [float(v) for v in value.split(',') if v.strip()] if value else [None]
+
+    def parse_time(value):
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
+
+    def records():
+        if os.path.isdir(args.tape):
+            return TickReader(args.tape).iter_books(args.coin, parse_time(args.start), parse_time(args.end))
+        return BacktestEngine.read_tape(args.tape)
+
+    fees = {}
+    if args.fees:
+        with open(args.fees) as f:
+            fees = json.load(f)
+    latencies = parse_list(args.latency)
+
+    reports = []
+    for min_profit in parse_list(args.min_profit):
+        for amount in parse_list(args.amount):
+            bot = ArbitrageBot(None, None, None, None, None)
+            if min_profit is not None:
+                bot.min_profit_percentage = min_profit
+            if amount is not None:
+                bot.trade_amount_usdt = amount
+            engine = BacktestEngine(bot, latencies, args.transfer_delay, args.taker_fee, fees, args.default_fee_usdt)
+            reports.append(engine.run(records()))
+
+    for report in reports:
+        print(f"\nMin kâr %{report['min_profit_percentage']} | İşlem ${report['trade_amount_usdt']} | "
+              f"{report['events']} olay, {report['opportunities']} fırsat | "
+              f"{report['tape_seconds'] / 3600:.1f} saatlik bant {report['elapsed_seconds']:.2f} sn'de "
+              f"(x{report['speedup']:.0f})")
+        print(f"{'Gecikme':>8} {'İşlem':>6} {'Açık':>5} {'İsabet':>7} {'PnL':>10} {'Ort. PnL':>9} {'Beklenen':>10}")
+        for row in report['scenarios']:
+            print(f"{row['latency']:>7.2f}s {row['trades']:>6} {row['open']:>5} {row['hit_rate'] * 100:>6.1f}% "
+                  f"{row['pnl']:>10.2f} {row['avg_pnl']:>9.2f} {row['expected_pnl']:>10.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+class BenchmarkSuite:
+    """FakeExchange üzerinde botun gerçek kod yollarını ölçer: tarama verimi (coin/sn),
+    akış güncellemesinden fırsat tespitine kadar geçen süre ve uçtan uca işlem yolu süresi"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, fill_delay=0.0, transfer_delay=0.1, poll=0.05, seed=1):
+        self.fake_options = {
+            'latency': latency, 'jitter': jitter, 'error_rate': error_rate,
+            'fill_delay': fill_delay, 'transfer_delay': transfer_delay,
+        }
+        self.poll = poll  # Emir/transfer izleme aralığı (sahte borsanın süreleriyle orantılı)
+        self.seed = seed
+        self.cache_dir = tempfile.TemporaryDirectory(prefix='bench-markets-')
+
+    def make_coins(self, count):
+        return [f"C{i:04d}" for i in range(count)]
+
+    def make_prices(self, coins):
+        """Borsa başına (bid, ask) fiyatları; MEXC fiyatları Gate.io'dan ±%0.3 sapar (varsayılan eşikte kârsız)"""
+        rng = random.Random(self.seed)
+        gate, mexc = {}, {}
+        for coin in coins:
+            mid = 10 ** rng.uniform(-3, 2)
+            gate[coin] = (mid * 0.9995, mid * 1.0005)
+            shifted = mid * (1 + rng.uniform(-0.003, 0.003))
+            mexc[coin] = (shifted * 0.9995, shifted * 1.0005)
+        return {'gate': gate, 'mexc': mexc}
+
+    async def build_bot(self, coins, **overrides):
+        """Gate.io/MEXC yerine FakeExchange kayıtlı, market ve ücret verisi yüklenmiş bir bot döndürür"""
+        bot = ArbitrageBot(None, None, None, None, None)
+        # Her bot kendi coin listesiyle market üretir; önbellek botlar arasında paylaşılmaz
+        bot.market_cache = MarketCache(tempfile.mkdtemp(dir=self.cache_dir.name))
+        bot.universe_from_markets = False
+        bot.coin_universe = list(coins)
+        bot.order_tracker = OrderTracker(initial_delay=self.poll, max_delay=self.poll, timeout=30)
+        bot.transfer_watcher = TransferWatcher(initial_delay=self.poll, max_delay=self.poll, timeout=30)
+        network = {}
+        for name, prices in self.make_prices(coins).items():
+            options = {**self.fake_options, **overrides}
+            bot.exchanges.register(name, FakeExchange(name, coins, prices, network=network, seed=self.seed, **options))
+        bot.gate_exchange, bot.mexc_exchange = bot.exchanges.get('gate'), bot.exchanges.get('mexc')
+        await bot.setup_exchanges(background_tasks=False)
+        await bot.refresh_fee_registry()
+        return bot
+
+    @staticmethod
+    def summarize(samples):
+        """Süre örneklerinden (saniye) milisaniye cinsinden özet"""
+        values = np.asarray(samples, dtype=np.float64) * 1000
+        return {
+            'samples': len(values),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max()),
+        }
+
+    async def bench_evaluations(self, sizes=(1, 100, 1000), duration=2.0):
+        """Tarama döngüsünün (toplu ticker + matris + derinlik) coin sayısına göre verimi"""
+        results = {}
+        for size in sizes:
+            bot = await self.build_bot(self.make_coins(size), latency=0.0, jitter=0.0, error_rate=0.0)
+            await bot.scan_arbitrage_opportunities()  # Isınma (rota önbelleği vb.)
+            samples = []
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline or len(samples) < 3:
+                started = time.perf_counter()
+                await bot.scan_arbitrage_opportunities()
+                samples.append(time.perf_counter() - started)
+            total = sum(samples)
+            results[str(size)] = {
+                'coins': size,
+                'scans_per_second': len(samples) / total,
+                'evaluations_per_second': len(samples) * size / total,
+                **self.summarize(samples),
+            }
+        return results
+
+    async def bench_kernel(self, sizes=(1, 100, 1000), duration=2.0):
+        """Sadece kâr hesabının (evaluate_matrix) verimi: ticker'lar bir kez çekilir, ağ/defter adımı yoktur"""
+        results = {}
+        for size in sizes:
+            bot = await self.build_bot(self.make_coins(size), latency=0.0, jitter=0.0, error_rate=0.0)
+            coins = list(bot.coin_universe)
+            tickers = await bot.fetch_bulk_tickers(coins)
+            bot.evaluate_matrix(coins, tickers)  # Isınma (rota önbelleği)
+            samples = []
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline or len(samples) < 3:
+                started = time.perf_counter()
+                bot.evaluate_matrix(coins, tickers)
+                samples.append(time.perf_counter() - started)
+            results[str(size)] = {
+                'coins': size,
+                'evaluations_per_second': len(samples) * size / sum(samples),
+                **self.summarize(samples),
+            }
+        return results
+
+    async def bench_detection(self, coin_count=100, samples=50):
+        """Akıştan gelen bir defter güncellemesinden izleme döngüsünün işlemi başlatmasına kadar geçen süre.
+        Defterler WebSocket yerine doğrudan OrderBookStore'a yazılır; işlem başlatılmaz, sadece zaman alınır."""
+        coins = self.make_coins(coin_count)
+        bot = await self.build_bot(coins)
+        bot.scan_mode = True
+        bot.check_interval = 1
+        bot.quote_engine = StreamingQuoteEngine(bot.order_book_store)  # Başlatılmaz; defterler elle beslenir
+        store = bot.order_book_store
+
+        def feed(name, coin, bid, ask):
+            levels = range(bot.depth_levels)
+            store.get_or_create(name, f"{coin}/USDT").apply_snapshot(
+                [(bid * (1 - 0.0005 * i), 10000.0 / bid) for i in levels],
+                [(ask * (1 + 0.0005 * i), 10000.0 / ask) for i in levels],
+            )
+            store.notify(name, f"{coin}/USDT")
+
+        prices = {name: bot.exchanges.get(name).prices for name in ('gate', 'mexc')}
+        for name, book in prices.items():
+            for coin, (bid, ask) in book.items():
+                feed(name, coin, bid, ask)
+
+        detected = asyncio.Event()
+        launched = {}
+
+        def launch_trade(context, opportunity):
+            launched.setdefault(opportunity['coin'], time.perf_counter())
+            detected.set()
+
+        bot.launch_trade = launch_trade
+        bot.is_running = True
+        loop_task = asyncio.create_task(bot.monitoring_loop(None))
+        # İlk (tüm coinleri içeren) partinin değerlendirilmesini bekle
+        await asyncio.sleep(bot.evaluator.debounce + 0.2)
+
+        latencies = []
+        missed = 0
+        for i in range(samples):
+            coin = coins[i % len(coins)]
+            gate_bid, gate_ask = prices['gate'][coin]
+            mexc_bid, mexc_ask = prices['mexc'][coin]
+            detected.clear()
+            started = time.perf_counter()
+            # Gate.io defteri tazelenir (max_quote_age), MEXC alışı Gate.io satışının %20 üstüne çıkar:
+            # transfer ücretine rağmen kârlı
+            feed('gate', coin, gate_bid, gate_ask)
+            feed('mexc', coin, gate_ask * 1.2, gate_ask * 1.201)
+            try:
+                await asyncio.wait_for(detected.wait(), 2)
+                latencies.append(launched.pop(coin) - started)
+            except asyncio.TimeoutError:
+                missed += 1
+            feed('mexc', coin, mexc_bid, mexc_ask)
+            await asyncio.sleep(bot.evaluator.debounce * 2 + 0.01)
+
+        bot.is_running = False
+        bot.evaluator.mark_dirty(None)
+        await loop_task
+        return {'coins': coin_count, 'debounce_seconds': bot.evaluator.debounce, 'missed': missed,
+                **(self.summarize(latencies) if latencies else {})}
+
+    async def bench_trade_path(self, samples=5):
+        """Transferli işlemin ve envanter işleminin execute_* çağrısından dönüşüne kadar süresi ve API çağrı sayısı"""
+        coin_count = max(samples, 1)
+        coins = self.make_coins(coin_count)
+        results = {}
+        for mode in ('transfer', 'inventory'):
+            bot = await self.build_bot(coins)
+            bot.inventory_mode = mode == 'inventory'
+            bot.inventory_coins = coins
+            fakes = [exchange for _, exchange in bot.exchanges.items()]
+            for coin in coins:
+                # Her coinde MEXC alışı Gate.io satışının %20 üstünde (kârlı fırsat)
+                bid, ask = fakes[0].prices[coin]
+                bot.exchanges.get('mexc').set_price(coin, ask * 1.2, ask * 1.201)
+            if bot.inventory_mode:
+                await bot.refresh_inventory()
+
+            durations = []
+            failures = 0
+            calls = []
+            for coin in coins[:samples]:
+                opportunity = await bot.check_arbitrage_opportunity(coin)
+                before = sum(sum(fake.calls.values()) for fake in fakes)
+                started = time.perf_counter()
+                if bot.inventory_mode:
+                    success = await bot.execute_inventory_trade(None, coin, opportunity)
+                else:
+                    success = await bot.execute_arbitrage_trade(None, coin, opportunity)
+                durations.append(time.perf_counter() - started)
+                calls.append(sum(sum(fake.calls.values()) for fake in fakes) - before)
+                failures += not success
+            results[mode] = {
+                'failures': failures,
+                'calls_per_trade': sum(calls) / len(calls),
+                **self.summarize(durations),
+            }
+        return results
+
+    async def run(self, sizes=(1, 100, 1000), duration=2.0, detection_samples=50, trade_samples=5):
+        try:
+            return {
+                'evaluations': await self.bench_evaluations(sizes, duration),
+                'kernel': await self.bench_kernel(sizes, duration),
+                'detection': await self.bench_detection(samples=detection_samples),
+                'trade_path': await self.bench_trade_path(trade_samples),
+            }
+        finally:
+            self.cache_dir.cleanup()
+
+
+def git_revision():
+    """Çalışma dizininin kısa git revizyonu (değişiklik varsa '-dirty' ekli); git yoksa 'unknown'"""
+    try:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def flatten_metrics(results, prefix=''):
+    """İç içe sonuç sözlüğünü 'bölüm.alt.metrik' -> sayı biçimine indirger"""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare_benchmarks(previous, current, threshold=10.0):
+    """İki benchmark sonucunu karşılaştırır; eşikten (%) fazla kötüleşen metriklerin listesini döndürür.
+    '_per_second' ile bitenlerde yüksek, '_ms' ile bitenlerde ve hata/çağrı sayılarında düşük değer iyidir."""
+    old, new = flatten_metrics(previous['results']), flatten_metrics(current['results'])
+    lower_is_better = ('missed', 'failures', 'calls_per_trade')
+    regressions = []
+    print(f"\n{previous['version']} ({previous['timestamp']}) → {current['version']} ({current['timestamp']})")
+    if previous.get('options') != current.get('options'):
+        print("⚠️ Ölçüm seçenekleri farklı, sonuçlar doğrudan karşılaştırılamayabilir.")
+    print(f"{'Metrik':<48} {'Önceki':>12} {'Şimdiki':>12} {'Değişim':>9}")
+    for name in sorted(set(old) & set(new)):
+        if name.endswith('_per_second'):
+            direction = -1
+        elif name.endswith('_ms') or name.rsplit('.', 1)[-1] in lower_is_better:
+            direction = 1
+        else:
+            continue  # Örnek sayısı, coin sayısı gibi yapılandırma değerleri
+        if name.endswith('max_ms'):
+            continue  # Tek örneğe bağlı, karşılaştırma için fazla gürültülü
+        if old[name]:
+            change = (new[name] - old[name]) / old[name] * 100
+        else:
+            change = 0.0 if not new[name] else float('inf')
+        flag = ' ⚠️' if direction * change > threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<48} {old[name]:>12.3f} {new[name]:>12.3f} {change:>+8.1f}%{flag}")
+    return regressions
+
+
+def run_benchmark(argv):
+    """Komut satırı: python bot-3.py benchmark [--sizes 1,100,1000] [--latency 0.01] [--compare DOSYA] ..."""
+    parser = argparse.ArgumentParser(prog='bot-3.py benchmark', description='Sahte borsalar üzerinde performans ölçümü')
+    parser.add_argument('--sizes', default='1,100,1000', help='Tarama verimi için coin sayıları (virgülle ayrılmış)')
+    parser.add_argument('--duration', type=float, default=2.0, help='Her coin sayısı için tarama süresi (saniye)')
+    parser.add_argument('--detection-samples', type=int, default=50, help='Tespit gecikmesi örnek sayısı')
+    parser.add_argument('--trade-samples', type=int, default=5, help='İşlem yolu örnek sayısı (mod başına)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Sahte borsa çağrı gecikmesi (saniye)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Gecikmeye eklenen rastgele süre üst sınırı (saniye)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Çağrıların ağ hatasıyla başarısız olma olasılığı')
+    parser.add_argument('--fill-delay', type=float, default=0.0, help='Market emirlerinin kapanma süresi (saniye)')
+    parser.add_argument('--transfer-delay', type=float, default=0.1, help='Transferin hesaba geçme süresi (saniye)')
+    parser.add_argument('--poll', type=float, default=0.05, help='Emir/transfer izleme aralığı (saniye)')
+    parser.add_argument('--dir', default=BENCHMARK_DIR, help='Sonuçların kaydedileceği dizin')
+    parser.add_argument('--compare', help='Karşılaştırılacak sonuç dosyası (varsayılan: dizindeki en son sonuç)')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Kötüleşme uyarı eşiği (%%)')
+    parser.add_argument('--no-save', action='store_true', help='Sonucu kaydetme')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Eşik aşılırsa 1 koduyla çık')
+    parser.add_argument('--verbose', action='store_true', help='Botun INFO loglarını göster')
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Sahte fırsatların bildirim uyarıları çıktıyı boğmasın
+        logging.getLogger().setLevel(logging.ERROR)
+    sizes = [int(v) for v in args.sizes.split(',') if v.strip()]
+    suite = BenchmarkSuite(args.latency, args.jitter, args.error_rate, args.fill_delay, args.transfer_delay, args.poll)
+    results = asyncio.run(suite.run(sizes, args.duration, args.detection_samples, args.trade_samples))
+    payload = {
+        'version': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'ccxt': ccxt.__version__,
+        'numpy': np.__version__,
+        'options': {k: v for k, v in vars(args).items() if k not in ('dir', 'compare', 'no_save', 'fail_on_regression', 'verbose')},
+        'results': results,
+    }
+
+    print("\nTarama verimi (bot tarafı; sahte borsa gecikmesiz ve hatasız)")
+    print(f"{'Coin':>6} {'Tarama/sn':>10} {'Değerlendirme/sn':>17} {'p50':>9} {'p99':>9}")
+    for row in results['evaluations'].values():
+        print(f"{row['coins']:>6} {row['scans_per_second']:>10.1f} {row['evaluations_per_second']:>17.0f} "
+              f"{row['p50_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms")
+    print("\nKâr hesabı (evaluate_matrix, ağ ve defter adımı olmadan)")
+    print(f"{'Coin':>6} {'Değerlendirme/sn':>17} {'p50':>9} {'p99':>9}")
+    for row in results['kernel'].values():
+        print(f"{row['coins']:>6} {row['evaluations_per_second']:>17.0f} {row['p50_ms']:>7.3f}ms {row['p99_ms']:>7.3f}ms")
+    detection = results['detection']
+    if detection.get('samples'):
+        print(f"\nTespit gecikmesi ({detection['coins']} coin, debounce {detection['debounce_seconds'] * 1000:.0f} ms): "
+              f"p50 {detection['p50_ms']:.2f} ms, p99 {detection['p99_ms']:.2f} ms, kaçan {detection['missed']}")
+    else:
+        print(f"\nTespit gecikmesi: hiçbir güncelleme tespit edilmedi (kaçan {detection['missed']})")
+    print(f"\nİşlem yolu (transfer {args.transfer_delay:.2f} sn, izleme aralığı {args.poll:.2f} sn)")
+    for mode, row in results['trade_path'].items():
+        print(f"{mode:>10}: p50 {row['p50_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms, "
+              f"{row['calls_per_trade']:.1f} API çağrısı/işlem, başarısız {row['failures']}")
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    elif os.path.isdir(args.dir):
+        files = sorted(name for name in os.listdir(args.dir) if name.startswith('bench-') and name.endswith('.json'))
+        if files:
+            with open(os.path.join(args.dir, files[-1])) as f:
+                previous = json.load(f)
+
+    if not args.no_save:
+        os.makedirs(args.dir, exist_ok=True)
+        path = os.path.join(args.dir, f"bench-{datetime.now():%Y%m%d-%H%M%S}-{payload['version']}.json")
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nSonuç kaydedildi: {path}")
+
+    regressions = compare_benchmarks(previous, payload, args.threshold) if previous else []
+    if regressions:
+        print(f"\n⚠️ %{args.threshold:.0f} eşiğini aşan kötüleşme: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    return payload
+
 
 # Telegram Bot Komutları
 arbitrage_bot = None # Bu global değişken main fonksiyonunda atanacak
@@ -578,11 +4452,27 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🎯 Minimum Kâr Oranı: %{arbitrage_bot.min_profit_percentage}
 ⏱️ Kontrol Aralığı: {arbitrage_bot.check_interval} saniye
 🪙 Aktif Coin: {arbitrage_bot.current_coin}
+🔭 Tarayıcı Modu: {'Açık' if arbitrage_bot.scan_mode else 'Kapalı'} ({len(arbitrage_bot.coin_universe)} coin)
+🧩 Tarama İşçileri: {f"{arbitrage_bot.shard_pool.alive()}/{arbitrage_bot.shard_pool.workers} süreç" if arbitrage_bot.shard_pool else 'Kapalı (tek süreç)'}
+📶 Uyarlanır Yoklama: {f"Açık (borsa başına {arbitrage_bot.poll_scheduler.budget:g} istek/sn)" if arbitrage_bot.poll_scheduler else 'Kapalı'}
+📡 WebSocket Akışı: {'Açık' if arbitrage_bot.streaming_enabled else 'Kapalı'}
+⏳ Debounce Penceresi: {arbitrage_bot.evaluator.debounce * 1000:.0f} ms
+🔀 Eşzamanlı İşlem Limiti: {arbitrage_bot.max_concurrent_trades} (aktif: {len(arbitrage_bot.active_trades)})
+📦 Envanter Modu: {'Açık' if arbitrage_bot.inventory_mode else 'Kapalı'} ({', '.join(arbitrage_bot.inventory_coins)})
+🏦 Borsalar: {', '.join(EXCHANGE_NAMES[name] for name in arbitrage_bot.exchanges.names())}
 
 Ayarları değiştirmek için ilgili komutu kullanın:
 /set_amount <miktar>
 /set_profit <oran>
 /set_interval <saniye>
+/scan <on|off>
+/universe <COIN1,COIN2,...>
+/stream <on|off>
+/set_debounce <milisaniye>
+/refresh_markets
+/set_max_trades <sayı>
+/inventory <on|off>
+/polling
         """
         await query.edit_message_text(settings_text, parse_mode='Markdown')
     
@@ -622,9 +4512,10 @@ Ayarları değiştirmek için ilgili komutu kullanın:
 🔍 **Anlık Fiyat Bilgileri:**
 
 💰 Coin: {arbitrage_bot.current_coin}
-📊 Gate.io: ${opportunity['gate_price']:.6f}
-📊 MEXC: ${opportunity['mexc_price']:.6f}
-💸 Transfer Ücreti: {opportunity['transfer_fee']:.6f} {arbitrage_bot.current_coin} (tahmini)
+🔀 Yön: {EXCHANGE_NAMES[opportunity['buy_exchange']]} → {EXCHANGE_NAMES[opportunity['sell_exchange']]}
+📊 {EXCHANGE_NAMES[opportunity['buy_exchange']]} (alış): ${opportunity['buy_price']:.6f}
+📊 {EXCHANGE_NAMES[opportunity['sell_exchange']]} (satış): ${opportunity['sell_price']:.6f}
+💸 Transfer Ücreti: {opportunity['transfer_fee']:.6f} {arbitrage_bot.current_coin} ({opportunity['withdraw_network']} ağı)
 🎯 Potansiyel Kâr: ${opportunity['profit']:.2f} ({opportunity['profit_percentage']:.2f}%)
 
 {'✅ KÂRLI!' if opportunity['is_profitable'] else '❌ Kârlı değil'}
@@ -650,6 +4541,11 @@ async def set_coin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if len(new_coin) < 2 or not new_coin.isalnum():
             await update.message.reply_text("❌ **Geçersiz coin sembolü!** Lütfen alfabetik ve en az 2 karakterli bir sembol girin.", parse_mode='Markdown')
             return
+        # Market/ağ uygunluğu bellekteki dizinden kontrol edilir (API çağrısı yapılmaz)
+        reason = arbitrage_bot.eligibility.reason(new_coin)
+        if reason:
+            await update.message.reply_text(f"❌ **{new_coin} işlem için uygun değil!**\n\n{reason}", parse_mode='Markdown')
+            return
 
         arbitrage_bot.current_coin = new_coin
         await update.message.reply_text(f"✅ **Aktif coin {new_coin} olarak değiştirildi!**", parse_mode='Markdown')
@@ -706,8 +4602,10 @@ async def set_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.args:
         try:
             interval = int(context.args[0])
-            if interval < 10:
-                await update.message.reply_text("❌ **Minimum aralık 10 saniye olmalıdır!**", parse_mode='Markdown')
+            # Uyarlanır yoklamada istek yükünü aralık değil borsa başına bütçe sınırlar
+            minimum = 1 if arbitrage_bot.poll_scheduler else 10
+            if interval < minimum:
+                await update.message.reply_text(f"❌ **Minimum aralık {minimum} saniye olmalıdır!**", parse_mode='Markdown')
                 return
             arbitrage_bot.check_interval = interval
             await update.message.reply_text(f"✅ **Kontrol aralığı {interval} saniye olarak ayarlandı!**", parse_mode='Markdown')
@@ -716,6 +4614,209 @@ async def set_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("❌ **Kullanım:** `/set_interval <saniye>`", parse_mode='Markdown')
 
+async def set_scan(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Tarayıcı modunu açma/kapama"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args and context.args[0].lower() in ('on', 'off'):
+        arbitrage_bot.scan_mode = context.args[0].lower() == 'on'
+        if arbitrage_bot.scan_mode:
+            await update.message.reply_text(f"✅ **Tarayıcı modu açıldı!** {len(arbitrage_bot.coin_universe)} coin izlenecek.", parse_mode='Markdown')
+        else:
+            await update.message.reply_text(f"✅ **Tarayıcı modu kapatıldı!** Sadece {arbitrage_bot.current_coin} izlenecek.", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/scan <on|off>`", parse_mode='Markdown')
+
+async def set_stream(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """WebSocket akışını açma/kapama"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args and context.args[0].lower() in ('on', 'off'):
+        arbitrage_bot.streaming_enabled = context.args[0].lower() == 'on'
+        if not arbitrage_bot.streaming_enabled:
+            await arbitrage_bot.stop_streaming()
+        # Açıldığında motor, izleme döngüsünün bir sonraki turunda başlatılır
+        await update.message.reply_text(f"✅ **WebSocket akışı {'açıldı' if arbitrage_bot.streaming_enabled else 'kapatıldı'}!**", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/stream <on|off>`", parse_mode='Markdown')
+
+async def set_debounce(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Olay güdümlü değerlendirmede debounce penceresini ayarlama"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args:
+        try:
+            debounce_ms = int(context.args[0])
+            if debounce_ms < 0 or debounce_ms > 5000:
+                await update.message.reply_text("❌ **Debounce penceresi 0-5000 ms arasında olmalıdır!**", parse_mode='Markdown')
+                return
+            arbitrage_bot.evaluator.debounce = debounce_ms / 1000
+            await update.message.reply_text(f"✅ **Debounce penceresi {debounce_ms} ms olarak ayarlandı!**", parse_mode='Markdown')
+        except ValueError:
+            await update.message.reply_text("❌ **Geçerli bir sayı girin!**", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/set_debounce <milisaniye>`", parse_mode='Markdown')
+
+async def force_refresh_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Market verisini önbelleği beklemeden ağdan yenileme"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    started = time.monotonic()
+    try:
+        await arbitrage_bot.refresh_markets()
+        await update.message.reply_text(
+            f"✅ **Market verisi yenilendi!** ({time.monotonic() - started:.1f} sn)\n\n"
+            + "\n".join(f"{EXCHANGE_NAMES[name]}: {len(exchange.markets)} market" for name, exchange in arbitrage_bot.exchanges.items()),
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        logger.error(f"Market verisi yenileme komutu hatası: {e}", exc_info=True)
+        await update.message.reply_text(f"❌ **Market verisi yenilenemedi!**\n\nDetay: `{e}`", parse_mode='Markdown')
+
+async def set_max_trades(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Eşzamanlı işlem limitini ayarlama"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args:
+        try:
+            limit = int(context.args[0])
+            if limit < 1:
+                await update.message.reply_text("❌ **Limit en az 1 olmalıdır!**", parse_mode='Markdown')
+                return
+            # Süren işlemler sayılmaya devam eder; limit düşürüldüyse yeni işlemler sayı altına inene kadar bekler
+            await arbitrage_bot.trade_limiter.set_limit(limit)
+            await update.message.reply_text(f"✅ **Eşzamanlı işlem limiti {limit} olarak ayarlandı!**", parse_mode='Markdown')
+        except ValueError:
+            await update.message.reply_text("❌ **Geçerli bir sayı girin!**", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/set_max_trades <sayı>`", parse_mode='Markdown')
+
+async def set_inventory(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Envanter modunu açma/kapama; argümansız kullanımda envanteri gösterir"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args and context.args[0].lower() in ('on', 'off'):
+        arbitrage_bot.inventory_mode = context.args[0].lower() == 'on'
+        if arbitrage_bot.inventory_mode:
+            try:
+                await arbitrage_bot.refresh_inventory()
+            except Exception as e:
+                logger.error(f"Envanter bakiyeleri alınamadı: {e}")
+                await update.message.reply_text(f"❌ **Envanter bakiyeleri alınamadı!**\n\nDetay: `{e}`", parse_mode='Markdown')
+                arbitrage_bot.inventory_mode = False
+                return
+        await update.message.reply_text(f"✅ **Envanter modu {'açıldı' if arbitrage_bot.inventory_mode else 'kapatıldı'}!**", parse_mode='Markdown')
+    elif not context.args:
+        lines = []
+        for asset in list(arbitrage_bot.inventory_coins) + ['USDT']:
+            amounts = " | ".join(
+                f"{EXCHANGE_NAMES[name]} `{balances.get(asset, 0):.6f}`"
+                for name, balances in arbitrage_bot.inventory.items()
+            )
+            pending = ' ⏳' if asset in arbitrage_bot.pending_rebalances else ''
+            lines.append(f"• {asset}: {amounts}{pending}")
+        await update.message.reply_text("📦 **Envanter:**\n\n" + "\n".join(lines), parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/inventory <on|off>`", parse_mode='Markdown')
+
+async def show_trades(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Son işlemleri ve durumlarını gösterme"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if not arbitrage_bot.trades:
+        await update.message.reply_text("ℹ️ **Henüz işlem yok.**", parse_mode='Markdown')
+        return
+
+    lines = []
+    for trade in list(arbitrage_bot.trades)[-10:]:
+        started = datetime.fromtimestamp(trade.history[0][1]).strftime("%H:%M:%S")
+        lines.append(f"• `{started}` {trade.coin}: **{trade.state.value}** ({trade.duration():.0f} sn)")
+    await update.message.reply_text("📋 **Son İşlemler:**\n\n" + "\n".join(lines), parse_mode='Markdown')
+
+def format_duration(seconds):
+    """Süreyi büyüklüğüne göre ms / sn / dk olarak biçimlendirir"""
+    if seconds < 1:
+        return f"{seconds * 1000:.1f} ms"
+    if seconds < 120:
+        return f"{seconds:.2f} sn"
+    return f"{seconds / 60:.1f} dk"
+
+async def show_latency(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Aşama bazında süre yüzdeliklerini (p50/p95/p99) gösterme"""
+    rows = latency_metrics.summary()
+    if not rows:
+        await update.message.reply_text("ℹ️ **Henüz süre ölçümü yok.**", parse_mode='Markdown')
+        return
+
+    lines = []
+    for stage, exchange, count, p50, p95, p99 in rows:
+        label = f"{stage} ({EXCHANGE_NAMES.get(exchange, exchange)})" if exchange else stage
+        lines.append(f"• `{label}` n={count}\n  p50 {format_duration(p50)} | p95 {format_duration(p95)} | p99 {format_duration(p99)}")
+    await update.message.reply_text("⏱️ **Aşama Süreleri:**\n\n" + "\n".join(lines), parse_mode='Markdown')
+
+async def show_polling(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Uyarlanır yoklamada en sık yoklanan coinleri gösterme"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+    scheduler = arbitrage_bot.poll_scheduler
+    if not scheduler:
+        await update.message.reply_text("ℹ️ **Uyarlanır yoklama kapalı** (`ADAPTIVE_POLLING=false`).", parse_mode='Markdown')
+        return
+    if not scheduler.stats:
+        await update.message.reply_text("ℹ️ **Henüz yoklanan coin yok.** Tarayıcı modunu açın: `/scan on`", parse_mode='Markdown')
+        return
+
+    lines = []
+    for coin, stat in scheduler.hottest():
+        pct = f"%{stat['pct']:.2f}" if stat['pct'] is not None else "yol yok"
+        volatility = f"{stat['volatility']:.4f}" if stat['volatility'] is not None else "-"
+        lines.append(f"• `{coin}` {pct} | oynaklık {volatility} | her {format_duration(stat['interval'])}")
+    await update.message.reply_text(
+        f"📶 **Uyarlanır Yoklama** ({len(scheduler.stats)} coin, borsa başına {scheduler.budget:g} coin/sn)\n\n"
+        + "\n".join(lines), parse_mode='Markdown'
+    )
+
+async def set_universe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Tarayıcı modunda izlenecek coin listesini ayarlama"""
+    global arbitrage_bot
+    if not arbitrage_bot:
+        await update.message.reply_text("❌ **Bot henüz başlatılmadı!** `/start` komutunu kullanarak botu başlatın.", parse_mode='Markdown')
+        return
+
+    if context.args:
+        coins = [c.strip().upper() for c in ' '.join(context.args).replace(',', ' ').split() if c.strip()]
+        invalid = [c for c in coins if len(c) < 2 or not c.isalnum()]
+        if invalid:
+            await update.message.reply_text(f"❌ **Geçersiz coin sembolleri:** {', '.join(invalid)}", parse_mode='Markdown')
+            return
+        arbitrage_bot.coin_universe = list(dict.fromkeys(coins))
+        await update.message.reply_text(f"✅ **Coin evreni {len(arbitrage_bot.coin_universe)} coin olarak ayarlandı!**", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("❌ **Kullanım:** `/universe <COIN1,COIN2,...>`", parse_mode='Markdown')
+
 async def initialize_bot_instance():
     """Bot'u başlatır ve global değişkene atar"""
     global arbitrage_bot
@@ -771,11 +4872,34 @@ async def main():
         application.add_handler(CommandHandler("set_amount", set_amount))
         application.add_handler(CommandHandler("set_profit", set_profit))
         application.add_handler(CommandHandler("set_interval", set_interval)) 
+        application.add_handler(CommandHandler("scan", set_scan))
+        application.add_handler(CommandHandler("universe", set_universe))
+        application.add_handler(CommandHandler("stream", set_stream))
+        application.add_handler(CommandHandler("set_debounce", set_debounce))
+        application.add_handler(CommandHandler("refresh_markets", force_refresh_markets))
+        application.add_handler(CommandHandler("trades", show_trades))
+        application.add_handler(CommandHandler("set_max_trades", set_max_trades))
+        application.add_handler(CommandHandler("inventory", set_inventory))
+        application.add_handler(CommandHandler("latency", show_latency))
+        application.add_handler(CommandHandler("polling", show_polling))
         
         # Bot'u başlat
         await application.initialize()
         await application.start()
         await application.updater.start_polling()
+        # Kuyrukta bekleyen (başlangıç sırasında oluşan) bildirimler de bu noktada gönderilir
+        arbitrage_bot.notifier.start(application.bot)
+        if SCAN_WORKERS > 0:
+            arbitrage_bot.shard_pool = ShardPool(SCAN_WORKERS)
+            arbitrage_bot.shard_pool.start()
+        metrics_server = MetricsServer(latency_metrics) if METRICS_PORT else None
+        if metrics_server:
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                # Port kullanımdaysa bot metriksiz çalışmaya devam eder (/latency yine çalışır)
+                logger.error(f"Metrik sunucusu başlatılamadı ({METRICS_HOST}:{METRICS_PORT}): {e}")
+                metrics_server = None
         
         logger.info("🚀 Arbitraj botu Railway üzerinde başlatıldı!")
         
@@ -786,6 +4910,11 @@ async def main():
         except KeyboardInterrupt:
             logger.info("Bot durduruluyor...")
         finally:
+            if metrics_server:
+                await metrics_server.stop()
+            await arbitrage_bot.shutdown()
+            # Kapanışta iptal edilen işlem uyarıları da gönderilsin diye bildirimler en son durdurulur
+            await arbitrage_bot.notifier.stop()
             if application.running: # Sadece çalışıyorsa durdur
                 await application.stop()
             
@@ -807,4 +4936,11 @@ async def main():
         raise # Hatanın Railway tarafından görülmesi için yeniden fırlat
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    if len(sys.argv) > 1 and sys.argv[1] == 'backtest':
+        # Geri test modu: Telegram/borsa bağlantısı kurulmaz
+        run_backtest(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        # Benchmark modu: sahte borsalarla çalışır, Telegram/borsa bağlantısı kurulmaz
+        run_benchmark(sys.argv[2:])
+    else:
+        asyncio.run(main())
@@ -0,0 +1,12 @@
+"""bot-3.py dosya adı doğrudan içe aktarılamadığı için testlerden önce `bot` modülü olarak yüklenir"""
+import importlib.util
+import os
+import sys
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot-3.py')
+
+if 'bot' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('bot', BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['bot'] = module
+    spec.loader.exec_module(module)
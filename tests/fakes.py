@@ -0,0 +1,70 @@
+"""Testlerde gerçek borsalar ve Telegram yerine kullanılan sahte sunucu, borsa istemcisi ve bot.
+FakeExchange benchmark da kullandığından bot modülündedir; buradan yeniden dışa aktarılır."""
+import asyncio
+import json
+
+import aiohttp
+import aiohttp.web
+
+from bot import FakeExchange  # noqa: F401
+
+
+class ScriptedWebSocketServer:
+    """Senaryolu mesajları tekrar oynatan yerel WebSocket sunucusu (gerçek borsa yerine test için)"""
+
+    def __init__(self, messages, host='127.0.0.1', port=0, delay=0.0):
+        self.messages = messages  # İstemci abone olduktan sonra sırayla gönderilecek dict'ler
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.received = []  # İstemciden gelen mesajlar (abonelik kontrolü için)
+        self.runner = None
+
+    async def start(self):
+        """Sunucuyu başlatır ve ws:// adresini döndürür"""
+        app = aiohttp.web.Application()
+        app.router.add_get('/ws', self._handle)
+        self.runner = aiohttp.web.AppRunner(app)
+        await self.runner.setup()
+        site = aiohttp.web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"ws://{self.host}:{port}/ws"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _handle(self, request):
+        ws = aiohttp.web.WebSocketResponse()
+        await ws.prepare(request)
+        # İlk mesajı (abonelik) bekle, sonra senaryoyu oynat
+        first = await ws.receive()
+        if first.type == aiohttp.WSMsgType.TEXT:
+            self.received.append(json.loads(first.data))
+        for message in self.messages:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            await ws.send_json(message)
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                self.received.append(json.loads(msg.data))
+        return ws
+
+
+class FakeTelegramBot:
+    """send_message çağrılarını kaydeder; `failures` sırayla fırlatılacak hatalardır (None: başarılı gönderim)"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []  # (metin, parse_mode)
+        self.attempts = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.attempts += 1
+        if self.failures:
+            error = self.failures.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append((text, parse_mode))
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import bot
+
+# Gate.io'da al, MEXC'de sat: t=0'da %7.9 kârlı spread açılır, sonra iki tarafta da kapanır
+TAPE = [
+    {'ts': 0.0, 'exchange': 'gate', 'coin': 'AAA', 'bids': [[0.99, 10000]], 'asks': [[1.00, 10000]]},
+    {'ts': 0.0, 'exchange': 'mexc', 'coin': 'AAA', 'bids': [[1.09, 10000]], 'asks': [[1.10, 10000]]},
+    {'ts': 1.0, 'exchange': 'gate', 'coin': 'AAA', 'bids': [[0.99, 10000]], 'asks': [[1.02, 10000]]},
+    {'ts': 5.0, 'exchange': 'gate', 'coin': 'AAA', 'bids': [[1.01, 10000]], 'asks': [[1.02, 10000]]},
+    {'ts': 10.0, 'exchange': 'mexc', 'coin': 'AAA', 'bids': [[1.00, 10000]], 'asks': [[1.01, 10000]]},
+    {'ts': 20.0, 'exchange': 'mexc', 'coin': 'AAA', 'bids': [[1.00, 10000]], 'asks': [[1.01, 10000]]},
+]
+
+
+def test_backtest_latency_scenarios_on_small_tape(tmp_path, capsys):
+    tape = tmp_path / 'tape.jsonl'
+    tape.write_text(''.join(json.dumps(record) + '\n' for record in TAPE))
+    fees = tmp_path / 'fees.json'
+    fees.write_text(json.dumps({'AAA': {'fee': 1.0}}))
+    report_path = tmp_path / 'report.json'
+
+    reports = bot.run_backtest([
+        str(tape), '--fees', str(fees), '--min-profit', '1', '--amount', '100', '--latency', '0,5',
+        '--transfer-delay', '10', '--taker-fee', '0.1', '--json', str(report_path),
+    ])
+    assert json.loads(report_path.read_text()) == reports
+    assert 'Gecikme' in capsys.readouterr().out
+
+    report, = reports
+    assert report['events'] == len(TAPE)
+    assert report['opportunities'] == 3  # t=0'da açılır; t=1 ve t=5'te coin zaten işlemde
+    assert report['tape_seconds'] == 20.0
+    fast, slow = report['scenarios']
+
+    # Gecikmesiz: t=0 defterinden 1.00'dan alınır, t=10'da 1.09'dan satılır
+    fast_pnl = ((100 / 1.00) * 0.999 - 1.0) * 1.09 * 0.999 - 100
+    assert (fast['latency'], fast['trades'], fast['open'], fast['hit_rate']) == (0.0, 1, 0, 1.0)
+    assert fast['pnl'] == fast['avg_pnl'] == pytest.approx(fast_pnl)
+    assert fast['expected_pnl'] == pytest.approx((100 - 1.0) * 1.09 - 100)
+
+    # 5 sn gecikme: alış 1.02'ye kayar, satış t=20'de kapanmış spread'den (1.00) yapılır
+    slow_pnl = ((100 / 1.02) * 0.999 - 1.0) * 1.00 * 0.999 - 100
+    assert slow['trades'] == 1 and slow['hit_rate'] == 0.0
+    assert slow['pnl'] == pytest.approx(slow_pnl)
+    assert slow['expected_pnl'] == fast['expected_pnl']
+
+
+def test_backtest_replays_recorded_ticks(tmp_path):
+    recorder = bot.TickRecorder(str(tmp_path / 'ticks'), depth=2)
+    for record in TAPE:
+        recorder.record(record['exchange'], record['coin'], record['bids'], record['asks'], ts=record['ts'])
+    recorder.close()
+
+    engine = bot.BacktestEngine(bot.ArbitrageBot(None, None, None, None, None), latencies=(0.0,),
+                                transfer_delay=10.0, fees={'AAA': {'fee': 1.0}})
+    engine.bot.min_profit_percentage, engine.bot.trade_amount_usdt = 1.0, 100.0
+    report = engine.run(bot.TickReader(str(tmp_path / 'ticks')).iter_books())
+    scenario, = report['scenarios']
+    assert (scenario['trades'], scenario['hit_rate']) == (1, 1.0)
+    assert scenario['pnl'] == pytest.approx(((100 / 1.00) * 0.999 - 1.0) * 1.09 * 0.999 - 100)
@@ -0,0 +1,97 @@
+import bot
+
+
+def currencies(networks):
+    """{ağ: (ücret, minimum, çekim açık, yatırma açık)} -> ccxt currencies biçimi"""
+    return {
+        network: {
+            'fee': fee, 'withdraw': withdraw, 'deposit': deposit,
+            'limits': {'withdraw': {'min': minimum, 'max': None}},
+        }
+        for network, (fee, minimum, withdraw, deposit) in networks.items()
+    }
+
+
+def markets(*bases, inactive=()):
+    return {
+        f"{base}/USDT": {'base': base, 'quote': 'USDT', 'spot': True, 'active': base not in inactive}
+        for base in bases
+    }
+
+
+def make_index(ttl=1800, fetched_at=None):
+    registry = bot.FeeRegistry(ttl=ttl)
+    registry.update_from_currencies('gate', {
+        'AAA': {'networks': currencies({'TRC20': (1.0, 5, True, True), 'BEP20': (0.2, 1, True, True)})},
+        'BBB': {'networks': currencies({'ERC20': (3.0, 10, False, True)})},
+    }, fetched_at=fetched_at)
+    registry.update_from_currencies('mexc', {
+        'AAA': {'networks': currencies({'TRC20': (1.5, 5, True, True), 'BEP20': (0.3, 1, True, False)})},
+        'BBB': {'networks': currencies({'ERC20': (2.0, 10, True, True)})},
+    }, fetched_at=fetched_at)
+    index = bot.EligibilityIndex(registry)
+    index.update_markets('gate', markets('AAA', 'BBB', 'CCC'))
+    index.update_markets('mexc', markets('AAA', 'BBB', inactive=('CCC',)))
+    index.refresh()
+    return registry, index
+
+
+def test_fee_registry_merges_fees_and_selects_cheapest_open_network():
+    registry, _ = make_index()
+    registry.update_from_fees('gate', {'AAA': {'networks': {'BEP20': {'withdraw': {'fee': 0.1}}}}})
+    assert registry.get('gate', 'AAA', 'BEP20')['fee'] == 0.1
+    assert registry.get('gate', 'AAA', 'BEP20')['min_withdraw'] == 1  # Ücret güncellemesi diğer alanları korur
+    assert registry.drain_changes() == {'AAA'}
+    assert registry.drain_changes() == set()
+
+    # BEP20 en ucuz, ama MEXC'de yatırma kapalı: Gate.io -> MEXC yönünde TRC20 seçilir
+    assert registry.select_network('gate', 'mexc', 'AAA')[0] == 'TRC20'
+    assert registry.select_network('mexc', 'gate', 'AAA')[0] == 'BEP20'
+    assert registry.select_network('gate', 'mexc', 'AAA', preferred='BEP20') is None
+    assert registry.get('gate', 'AAA', 'SOL') is None
+
+
+def test_eligibility_index_tracks_routes_and_reasons():
+    registry, index = make_index()
+    assert index.coins() == ['AAA', 'BBB']
+    assert index.routes['AAA'] == {'gate_to_mexc': 'TRC20', 'mexc_to_gate': 'BEP20'}
+    # BBB Gate.io'dan çekilemez: yalnızca MEXC -> Gate.io yönü açık
+    assert index.is_eligible('BBB', 'mexc_to_gate')
+    assert not index.is_eligible('BBB', 'gate_to_mexc')
+    assert 'en az iki borsada' in index.reason('CCC')
+    assert index.reason('AAA') is None
+
+    # Çekim kapanınca yalnızca değişen coin yeniden hesaplanır ve yol düşer
+    registry.update_from_currencies('mexc', {'BBB': {'networks': currencies({'ERC20': (2.0, 10, False, True)})}})
+    assert index.refresh() == {'BBB'}
+    assert not index.is_eligible('BBB')
+    assert 'ortak bir ağ yok' in index.reason('BBB')
+
+    # Market delist edilince coin dizinden çıkar
+    assert index.update_markets('mexc', markets('BBB')) == {'AAA'}
+    assert not index.is_eligible('AAA')
+
+
+def test_expired_fee_entries_invalidate_eligibility(monkeypatch):
+    now = bot.time.time()
+    registry, index = make_index(ttl=60, fetched_at=now - 30)
+    assert index.is_eligible('AAA') and index.is_eligible('BBB')
+    version = registry.version
+
+    # Kayıtlar yenilenmeden süresi dolar: get() None döner ve dizin coinleri düşürür
+    monkeypatch.setattr(bot.time, 'time', lambda: now + 31)
+    assert registry.get('gate', 'AAA', 'TRC20') is None
+    assert index.refresh() == {'AAA', 'BBB'}
+    assert index.coins() == []
+    assert registry.version > version
+    assert index.refresh() == set()  # Süresi dolan kayıt bir kez bildirilir
+
+    # Kayıtlar tazelenince coin yeniden uygun olur
+    registry.update_from_currencies('gate', {
+        'AAA': {'networks': currencies({'TRC20': (1.0, 5, True, True)})},
+    }, fetched_at=now + 31)
+    registry.update_from_currencies('mexc', {
+        'AAA': {'networks': currencies({'TRC20': (1.5, 5, True, True)})},
+    }, fetched_at=now + 31)
+    assert index.refresh() == {'AAA'}
+    assert index.routes['AAA'] == {'gate_to_mexc': 'TRC20', 'mexc_to_gate': 'TRC20'}
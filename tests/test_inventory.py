@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import ccxt
+import pytest
+
+import bot
+
+
+def inventory_bot(suite, coins):
+    """Her coinde MEXC alışı Gate.io satışının %20 üstünde olan, envanter modunda bir bot kurar"""
+
+    async def build():
+        test_bot = await suite.build_bot(coins)
+        test_bot.inventory_mode = True
+        test_bot.inventory_coins = coins
+        gate, mexc = test_bot.exchanges.get('gate'), test_bot.exchanges.get('mexc')
+        for coin in coins:
+            _, ask = gate.prices[coin]
+            mexc.set_price(coin, ask * 1.2, ask * 1.201)
+        await test_bot.refresh_inventory()
+        return test_bot
+
+    return build()
+
+
+def test_failed_leg_still_updates_inventory_cache():
+    suite = bot.BenchmarkSuite(seed=5)
+    coin = suite.make_coins(1)[0]
+
+    async def scenario():
+        test_bot = await inventory_bot(suite, [coin])
+        try:
+            gate, mexc = test_bot.exchanges.get('gate'), test_bot.exchanges.get('mexc')
+
+            async def rejected_sell(*args, **kwargs):
+                raise ccxt.InsufficientFunds("satış reddedildi")
+
+            mexc.create_market_sell_order = rejected_sell
+            opportunity = await test_bot.check_arbitrage_opportunity(coin)
+            before = {name: dict(balances) for name, balances in test_bot.inventory.items()}
+            assert not await test_bot.execute_inventory_trade(None, coin, opportunity)
+
+            # Gerçekleşen alış bacağı önbelleğe işlendi ve borsadaki bakiyeyle aynı
+            assert test_bot.inventory['gate'][coin] > before['gate'][coin]
+            assert test_bot.inventory['gate'][coin] == pytest.approx(gate.balances[coin])
+            assert test_bot.inventory['gate']['USDT'] == pytest.approx(gate.balances['USDT'])
+            assert test_bot.inventory['mexc'] == before['mexc']
+            assert not test_bot.inventory_reserved
+        finally:
+            await test_bot.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_balance_locks_are_not_held_while_orders_fill():
+    suite = bot.BenchmarkSuite(fill_delay=0.2, poll=0.02, seed=5)
+    coins = suite.make_coins(2)
+
+    async def scenario():
+        test_bot = await inventory_bot(suite, coins)
+        try:
+            opportunities = [await test_bot.check_arbitrage_opportunity(coin) for coin in coins]
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                test_bot.execute_inventory_trade(None, o['coin'], o) for o in opportunities
+            ))
+            elapsed = time.perf_counter() - started
+            # Aynı borsa çiftindeki iki işlemin dolum beklemeleri örtüşür
+            assert results == [True, True]
+            assert elapsed < 0.35
+            for name in ('gate', 'mexc'):
+                exchange = test_bot.exchanges.get(name)
+                for asset in coins + ['USDT']:
+                    assert test_bot.inventory[name][asset] == pytest.approx(exchange.balances[asset])
+        finally:
+            await test_bot.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+import asyncio
+
+import bot
+from tests.fakes import FakeTelegramBot
+
+
+def make_dispatcher(**options):
+    options = {'min_interval': 0.0, 'digest_window': 0.02, **options}
+    return bot.NotificationDispatcher(chat_id=1, **options)
+
+
+def test_repeated_keys_are_suppressed_and_counted(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: clock[0])
+    dispatcher = make_dispatcher(dedupe_window=60)
+
+    assert dispatcher.submit("bakiye düşük", key='low')
+    assert not dispatcher.submit("bakiye düşük", key='low')
+    assert not dispatcher.submit("bakiye düşük", key='low')
+    assert dispatcher.submit("başka uyarı", key='other')
+    assert dispatcher.submit("anahtarsız")
+    assert dispatcher.submit("anahtarsız")
+    clock[0] += 61
+    assert dispatcher.submit("bakiye düşük", key='low')
+
+    queued = dispatcher.drain([])
+    assert queued[:4] == ["bakiye düşük", "başka uyarı", "anahtarsız", "anahtarsız"]
+    assert queued[4].startswith("bakiye düşük\n") and "2 kez tekrarlandı" in queued[4]
+    assert not bot.NotificationDispatcher(chat_id=None).submit("sohbet yok")
+
+
+def test_burst_is_sent_as_one_digest():
+    dispatcher = make_dispatcher()
+    telegram = FakeTelegramBot()
+
+    async def scenario():
+        dispatcher.start(telegram)
+        for i in range(5):
+            dispatcher.submit(f"mesaj {i}")
+        await asyncio.sleep(0.1)
+        dispatcher.submit("geç gelen")
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert [text for text, _ in telegram.sent] == ["\n\n".join(f"mesaj {i}" for i in range(5)), "geç gelen"]
+    assert telegram.sent[0][1] == 'Markdown'
+
+
+def test_digests_respect_length_limit():
+    dispatcher = make_dispatcher(max_length=25)
+    digests = dispatcher.build_digests(["a" * 10, "b" * 10, "c" * 10, "d" * 40])
+    assert digests == ["a" * 10 + "\n\n" + "b" * 10, "c" * 10, "d" * 25]
+
+
+def test_full_queue_drops_oldest_and_reports_it():
+    dispatcher = make_dispatcher(max_queue=3)
+    telegram = FakeTelegramBot()
+
+    async def scenario():
+        for i in range(5):
+            dispatcher.submit(f"mesaj {i}")
+        assert dispatcher.dropped == 2
+        dispatcher.bot = telegram
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    text, = [text for text, _ in telegram.sent]
+    assert text.startswith("⚠️ _Kuyruk doldu, 2 eski bildirim atlandı._")
+    assert text.endswith("mesaj 2\n\nmesaj 3\n\nmesaj 4")
+    assert "mesaj 1" not in text
+    assert dispatcher.dropped == 0
+
+
+def test_send_failures_are_retried():
+    telegram = FakeTelegramBot(failures=[bot.RetryAfter(0), RuntimeError("ağ hatası"), None])
+    dispatcher = make_dispatcher()
+    dispatcher.bot = telegram
+    assert asyncio.run(dispatcher.deliver("tekrar dene"))
+    assert telegram.attempts == 3
+    assert telegram.sent == [("tekrar dene", 'Markdown')]
+
+    # Markdown reddedilirse düz metinle yeniden denenir
+    telegram = FakeTelegramBot(failures=[bot.BadRequest("Can't parse entities")])
+    dispatcher.bot = telegram
+    assert asyncio.run(dispatcher.deliver("*bozuk"))
+    assert telegram.sent == [("*bozuk", None)]
+
+    # Deneme hakkı biterse mesaj bırakılır
+    telegram = FakeTelegramBot(failures=[RuntimeError("kapalı")] * 3)
+    dispatcher.bot = telegram
+    assert not asyncio.run(dispatcher.deliver("kayıp"))
+    assert telegram.attempts == 3 and not telegram.sent
@@ -0,0 +1,69 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import ccxt.async_support as ccxt
+import pytest
+
+import bot
+
+
+def exchange(mode, amount_precision, cost_precision, currency_precision, limits=None):
+    limits = limits or {}
+    market = {
+        'base': 'AAA', 'quote': 'USDT', 'spot': True,
+        'precision': {'amount': amount_precision, 'cost': cost_precision},
+        'limits': {
+            'amount': {'min': limits.get('min_amount'), 'max': limits.get('max_amount')},
+            'cost': {'min': limits.get('min_cost'), 'max': None},
+        },
+    }
+    return SimpleNamespace(
+        precisionMode=mode,
+        markets={'AAA/USDT': market, 'AAA/BTC': {**market, 'quote': 'BTC'}},
+        currencies={'AAA': {'precision': currency_precision}, 'USDT': {'precision': currency_precision}},
+    )
+
+
+def test_tick_size_precision_rounds_down_to_step():
+    builder = bot.OrderBuilder()
+    builder.load('gate', exchange(ccxt.TICK_SIZE, 0.05, 0.01, 0.001))
+    assert 'AAA/BTC' not in builder.markets['gate']
+
+    assert builder.market_sell('gate', 'AAA/USDT', 1.2399)['amount'] == pytest.approx(1.2)
+    assert builder.market_buy('gate', 'AAA/USDT', 10.129)['amount'] == pytest.approx(10.12)
+    assert builder.withdrawal('gate', 'AAA', 3.14159)['amount'] == pytest.approx(3.141)
+    assert builder.quantize('gate', Decimal('0.07'), Decimal('0.05')) == Decimal('0.05')
+
+
+def test_decimal_places_precision_truncates_digits():
+    builder = bot.OrderBuilder()
+    builder.load('mexc', exchange(ccxt.DECIMAL_PLACES, 2, 4, 3))
+
+    assert builder.market_sell('mexc', 'AAA/USDT', 1.23999)['amount'] == pytest.approx(1.23)
+    assert builder.market_buy('mexc', 'AAA/USDT', 10.123456)['amount'] == pytest.approx(10.1234)
+    assert builder.withdrawal('mexc', 'AAA', 0.98765)['amount'] == pytest.approx(0.987)
+
+
+def test_orders_below_minimum_amount_or_cost_are_rejected():
+    builder = bot.OrderBuilder()
+    builder.load('gate', exchange(ccxt.TICK_SIZE, 0.01, 0.01, 0.01,
+                                  {'min_amount': 1, 'max_amount': 1000, 'min_cost': 5}))
+
+    with pytest.raises(bot.OrderValidationError, match='minimum'):
+        builder.market_sell('gate', 'AAA/USDT', 0.999)  # Yuvarlama sonrası 0.99 < 1
+    with pytest.raises(bot.OrderValidationError, match='maksimum'):
+        builder.market_sell('gate', 'AAA/USDT', 1001)
+    with pytest.raises(bot.OrderValidationError, match='tutarı'):
+        builder.market_sell('gate', 'AAA/USDT', 2, price=2)  # 4 USDT < 5 USDT
+    with pytest.raises(bot.OrderValidationError, match='alış tutarı'):
+        builder.market_buy('gate', 'AAA/USDT', 4.99)
+    with pytest.raises(bot.OrderValidationError, match='tahmini alış miktarı'):
+        builder.market_buy('gate', 'AAA/USDT', 10, price=20)  # 0.5 AAA < 1 AAA
+    with pytest.raises(bot.OrderValidationError, match='minimum'):
+        builder.withdrawal('gate', 'AAA', 4, min_withdraw=5)
+    with pytest.raises(bot.OrderValidationError, match='sıfır'):
+        builder.withdrawal('gate', 'AAA', 0.004)
+    with pytest.raises(bot.OrderValidationError, match='market kuralı yok'):
+        builder.market_buy('gate', 'BBB/USDT', 10)
+
+    assert builder.market_sell('gate', 'AAA/USDT', 3, price=2) == {'symbol': 'AAA/USDT', 'amount': 3.0}
@@ -0,0 +1,136 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+import bot
+
+
+def test_depth_profit_walks_multiple_ask_levels():
+    # 120 USDT: 5 @ 10 (50) + 5 @ 11 (55) + 1.25 @ 12 (15) = 11.25 coin
+    result = bot.calculate_depth_profit([(10, 5), (11, 5), (12, 10)], [(13, 100)], 120, 0)
+    assert result['expected_coin_amount'] == pytest.approx(11.25)
+    assert result['buy_vwap'] == pytest.approx(120 / 11.25)
+    assert result['buy_slippage_percentage'] == pytest.approx((120 / 11.25 / 10 - 1) * 100)
+    assert result['sell_vwap'] == pytest.approx(13)
+    assert result['profit'] == pytest.approx(11.25 * 13 - 120)
+    assert result['profit_percentage'] == pytest.approx((11.25 * 13 - 120) / 120 * 100)
+    assert result['fully_fillable']
+
+
+def test_depth_profit_shallow_books_are_not_fully_fillable():
+    # Alış defteri sadece 31 USDT taşıyor: bütçe defterle sınırlanır
+    shallow_asks = bot.calculate_depth_profit([(10, 2), (11, 1)], [(13, 100)], 100, 0)
+    assert shallow_asks['fillable_usdt'] == pytest.approx(31)
+    assert shallow_asks['expected_coin_amount'] == pytest.approx(3)
+    assert not shallow_asks['fully_fillable']
+
+    # Satış defteri sadece 1 coin alıyor: fazlası satılamaz
+    shallow_bids = bot.calculate_depth_profit([(10, 100)], [(13, 1)], 100, 0)
+    assert shallow_bids['expected_coin_amount'] == pytest.approx(10)
+    assert shallow_bids['sellable_coin_amount'] == pytest.approx(1)
+    assert shallow_bids['profit'] == pytest.approx(13 - 100)
+    assert not shallow_bids['fully_fillable']
+
+    assert bot.calculate_depth_profit([], [(13, 1)], 100, 0) is None
+    assert bot.calculate_depth_profit([(10, 1)], [], 100, 0) is None
+
+
+def test_depth_profit_applies_transfer_fee():
+    # 10 coin alınır, 0.5 coin çekim ücreti: 9.5 coin = 5 @ 12 + 4.5 @ 11 = 109.5 USDT
+    result = bot.calculate_depth_profit([(10, 100)], [(12, 5), (11, 100)], 100, 0.5)
+    assert result['expected_coin_amount'] == pytest.approx(10)
+    assert result['sellable_coin_amount'] == pytest.approx(9.5)
+    assert result['sell_vwap'] == pytest.approx(109.5 / 9.5)
+    assert result['sell_slippage_percentage'] == pytest.approx((1 - 109.5 / 9.5 / 12) * 100)
+    assert result['profit'] == pytest.approx(9.5)
+    assert result['profit_percentage'] == pytest.approx(9.5)
+
+    # Ücret alınan miktarı aşarsa satılacak coin kalmaz
+    assert bot.calculate_depth_profit([(10, 100)], [(12, 100)], 100, 10) is None
+
+
+def test_best_spread_pairs_prefers_withdrawable_pair():
+    bids = np.array([[10.0, 11.0, 12.0]])
+    asks = np.array([[10.1, 11.1, 9.0]])
+    fees = np.zeros((1, 3, 3))
+    fees[0, [0, 1, 2], [0, 1, 2]] = np.nan
+    min_withdraws = np.full((1, 3, 3), np.nan)
+    # En kârlı yol (2 -> 1, %22.2) minimum çekimin altında kalıyor; sonraki en iyi yol 0 -> 2 (%18.8)
+    min_withdraws[0, 2, 1] = 1000
+    buy_index, sell_index, percentages = bot.best_spread_pairs(bids, asks, fees, min_withdraws, 100)
+    assert (buy_index[0], sell_index[0]) == (0, 2)
+    assert percentages[0] == pytest.approx((100 / 10.1 * 12.0 / 100 - 1) * 100)
+
+
+def test_float_screen_agrees_with_decimal_path():
+    """float64 eleme (best_spread_pairs + evaluate_matrix) ile kesin Decimal hesabı aynı kârlı coinleri bulur"""
+    rng = random.Random(7)
+    suite = bot.BenchmarkSuite(seed=7)
+    coins = suite.make_coins(200)
+
+    async def scenario():
+        test_bot = await suite.build_bot(coins)
+        try:
+            test_bot.min_profit_percentage = 2.0
+            tickers = {name: {} for name in ('gate', 'mexc')}
+            for coin in coins:
+                gate_ask = 10 ** rng.uniform(-3, 2)
+                # Spread eşiğin etrafına yayılır: bir kısmı sınırın hemen altında/üstünde kalır
+                mexc_bid = gate_ask * (1 + rng.uniform(0.0, 0.04))
+                tickers['gate'][f"{coin}/USDT"] = {'bid': gate_ask * 0.999, 'ask': gate_ask}
+                tickers['mexc'][f"{coin}/USDT"] = {'bid': mexc_bid, 'ask': mexc_bid * 1.001}
+            opportunities = {o['coin']: o for o in test_bot.evaluate_matrix(coins, tickers)}
+
+            for coin in coins:
+                exact = [
+                    test_bot.calculate_opportunity(
+                        coin, tickers[buy][f"{coin}/USDT"]['ask'], tickers[sell][f"{coin}/USDT"]['bid'],
+                        test_bot.get_transfer_info(coin, buy, sell), bot.make_direction(buy, sell)
+                    )
+                    for buy, sell in (('gate', 'mexc'), ('mexc', 'gate'))
+                ]
+                best = max((o for o in exact if o), key=lambda o: o['profit_percentage'])
+                chosen = opportunities[coin]
+                assert chosen['direction'] == best['direction']
+                assert chosen['profit_percentage'] == pytest.approx(best['profit_percentage'], abs=1e-9)
+                assert chosen['is_profitable'] == best['is_profitable']
+            return sum(o['is_profitable'] for o in opportunities.values())
+        finally:
+            await test_bot.shutdown()
+
+    profitable = asyncio.run(scenario())
+    assert 0 < profitable < len(coins)
+
+
+def test_transfer_trade_withdraws_with_registry_fee_and_minimum():
+    """Fırsat hesabı ve işlem yolu aynı çekim kuralını kullanır: alınan coinin tamamı çekilir, ücret kayıttan kesilir"""
+    suite = bot.BenchmarkSuite(transfer_delay=0.0, poll=0.01, seed=3)
+    coin = suite.make_coins(1)[0]
+
+    async def scenario():
+        test_bot = await suite.build_bot([coin])
+        try:
+            gate, mexc = test_bot.exchanges.get('gate'), test_bot.exchanges.get('mexc')
+            _, ask = gate.prices[coin]
+            mexc.set_price(coin, ask * 1.2, ask * 1.201)
+            opportunity = await test_bot.check_arbitrage_opportunity(coin)
+            assert opportunity['is_profitable'] and opportunity['direction'] == 'gate_to_mexc'
+
+            coin_balance = gate.balances[coin]
+            assert await test_bot.execute_arbitrage_trade(None, coin, opportunity)
+            withdrawal = gate.withdrawals[0]
+            assert gate.balances[coin] == pytest.approx(coin_balance)  # Alınan miktarın tamamı çekildi
+            assert mexc.deposits[0]['amount'] == pytest.approx(withdrawal['amount'] - gate.withdraw_fee)
+
+            # Minimum çekim alınacak miktarın üstündeyse hem fırsat hesabı hem işlem yolu reddeder
+            transfer = test_bot.get_transfer_info(coin, 'gate', 'mexc')
+            transfer['min_withdraw'] = withdrawal['amount'] * 2
+            assert bot.ArbitrageBot.plan_withdrawal(withdrawal['amount'], transfer) is None
+            rejected = test_bot.calculate_opportunity(coin, ask, ask * 1.2, transfer, 'gate_to_mexc')
+            assert not rejected['is_profitable']
+        finally:
+            await test_bot.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,104 @@
+import asyncio
+
+import bot
+
+
+def make_scheduler(reserve, capacity=1, refill_per_second=20):
+    # ccxt birimi: refillRate ms başına token
+    return bot.RateLimitScheduler('test', {'refillRate': refill_per_second / 1000, 'capacity': capacity}, reserve)
+
+
+def submit(scheduler, lane, label, completed):
+    with bot.RequestPriority(lane):
+        future = scheduler()
+    future.add_done_callback(lambda _: completed.append(label))
+    return future
+
+
+def test_order_lane_goes_before_queued_market_requests():
+    async def scenario():
+        scheduler = make_scheduler(reserve=0)
+        completed = []
+        market = [submit(scheduler, 'market', f"market{i}", completed) for i in range(5)]
+        await asyncio.sleep(0.01)  # Kova boşaldı, piyasa istekleri dolumu bekliyor
+        order = submit(scheduler, 'order', 'order', completed)
+        await asyncio.gather(order, *market)
+        await scheduler.close()
+        return completed, scheduler.sent
+
+    completed, sent = asyncio.run(scenario())
+    sent_before_order = completed.index('order')
+    # Emir, kuyruğa kendisinden önce girmiş ve henüz gönderilmemiş tüm piyasa isteklerinin önüne geçer
+    assert completed[sent_before_order + 1:] == [f"market{i}" for i in range(sent_before_order, 5)]
+    assert sent_before_order < 5
+    assert sent == {'order': 1, 'fill': 0, 'market': 5}
+
+
+def test_reserve_lets_orders_through_during_market_burst():
+    async def scenario():
+        scheduler = make_scheduler(reserve=2, refill_per_second=10)
+        completed = []
+        market = [submit(scheduler, 'market', f"market{i}", completed) for i in range(20)]
+        await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await submit(scheduler, 'order', 'order', completed)
+        waited = loop.time() - started
+        pending = scheduler.pending()['market']
+        await scheduler.close()
+        return waited, pending, market
+
+    waited, pending, market = asyncio.run(scenario())
+    # Ayrılan tokenlar sayesinde emir dolum beklemeden (100 ms/token) gönderilir
+    assert waited < 0.05
+    assert pending > 0
+    # close() bekleyen piyasa isteklerini iptal eder
+    assert any(future.cancelled() for future in market)
+
+
+def test_scheduler_keeps_and_closes_its_task():
+    async def scenario():
+        scheduler = make_scheduler(reserve=0, refill_per_second=1)
+        futures = [submit(scheduler, 'market', i, []) for i in range(3)]
+        await asyncio.sleep(0)
+        task = scheduler.task
+        running = task is not None and not task.done()
+        await scheduler.close()
+        return running, task, futures, scheduler.task
+
+    running, task, futures, after = asyncio.run(scenario())
+    assert running
+    assert task.done() and after is None
+    assert futures[-1].cancelled()
+
+
+def test_poll_scheduler_budget_counts_requests(monkeypatch):
+    """Yoklama bütçesi istek sayar: toplu ticker borsa başına bir istek, derinlik defterleri birer istek"""
+    clock = [1000.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: clock[0])
+    scheduler = bot.PollScheduler(budget=4, min_interval=0.05, max_interval=0.05)
+    names = ['gate', 'mexc']
+    coins = [f"C{i}" for i in range(50)]
+    requests = {name: 0 for name in names}
+    scans = 0
+    duration = 10.0
+
+    while clock[0] < 1000.0 + duration:
+        batch = scheduler.take(coins, names)
+        if batch:
+            scans += 1
+            for name in names:
+                requests[name] += 1  # fetch_bulk_tickers: borsa başına tek fetch_tickers
+            # Her taramada bir coin eşiği geçer ve iki borsadan emir defteri çekilir
+            opportunities = [{'coin': batch[0], 'profit_percentage': 5.0, 'buy_vwap': 1.0,
+                              'buy_exchange': 'gate', 'sell_exchange': 'mexc'}]
+            for name in names:
+                requests[name] += 1
+            scheduler.record_scan(batch, opportunities, threshold=1.0, default_interval=0.05)
+            assert len(batch) == len(coins)  # Vadesi gelen tüm coinler aynı istekte
+        clock[0] += 0.01
+
+    # Bir saniyelik birikmiş bütçe dışında saniyede `budget` istek aşılmaz, bütçe de boşa harcanmaz
+    for name in names:
+        assert requests[name] <= scheduler.budget * (duration + 1) + 1
+    assert scans >= scheduler.budget * duration / 2 - 1
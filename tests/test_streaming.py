@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import bot
+from tests.fakes import ScriptedWebSocketServer
+
+
+async def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("koşul zaman aşımına kadar sağlanmadı")
+        await asyncio.sleep(0.01)
+
+
+def gate_update(symbol, bids, asks, first, last, full=False):
+    result = {'s': symbol, 'b': bids, 'a': asks, 'U': first, 'u': last}
+    if full:
+        result['full'] = True
+    return {'channel': 'spot.order_book_update', 'event': 'update', 'result': result}
+
+
+async def run_engine(gate_messages, mexc_messages, coins, snapshot_fetcher=None, until=None):
+    """Motoru iki senaryolu sunucuya bağlar, `until` sağlanana kadar çalıştırır ve (store, gate, mexc) döndürür"""
+    gate = ScriptedWebSocketServer(gate_messages)
+    mexc = ScriptedWebSocketServer(mexc_messages)
+    store = bot.OrderBookStore()
+    engine = bot.StreamingQuoteEngine(
+        store, gate_url=await gate.start(), mexc_url=await mexc.start(), snapshot_fetcher=snapshot_fetcher
+    )
+    try:
+        await engine.start(coins)
+        await wait_until(lambda: until(store))
+    finally:
+        await engine.stop()
+        await gate.stop()
+        await mexc.stop()
+    return store, gate, mexc
+
+
+def test_gate_snapshot_and_deltas_are_merged():
+    messages = [
+        gate_update('BTC_USDT', [['100', '1'], ['99', '2']], [['101', '1'], ['102', '3']], 10, 10, full=True),
+        gate_update('BTC_USDT', [['100', '0'], ['99.5', '4']], [['101', '0.5']], 11, 11),
+        gate_update('BTC_USDT', [], [['101.5', '2']], 12, 12),
+    ]
+
+    async def scenario():
+        return await run_engine(
+            messages, [], ['BTC'], until=lambda store: getattr(store.get('gate', 'BTC/USDT'), 'sequence', None) == 12
+        )
+
+    store, gate, _ = asyncio.run(scenario())
+    book = store.get('gate', 'BTC/USDT')
+    assert book.levels('bids') == [(99.5, 4.0), (99.0, 2.0)]
+    assert book.levels('asks') == [(101.0, 0.5), (101.5, 2.0), (102.0, 3.0)]
+    assert gate.received[0]['channel'] == 'spot.order_book_update'
+    assert gate.received[0]['payload'][0] == 'BTC_USDT'
+
+
+def test_gate_sequence_gap_triggers_resync():
+    requested = []
+
+    async def snapshot_fetcher(symbol):
+        requested.append(symbol)
+        return [(98.0, 5.0)], [(103.0, 6.0)], 200
+
+    messages = [
+        gate_update('BTC_USDT', [['100', '1']], [['101', '1']], 10, 10, full=True),
+        gate_update('BTC_USDT', [['100', '2']], [], 11, 11),
+        # 12-14 kayıp: boşluk defteri geçersizler ve REST anlık görüntüsü istenir
+        gate_update('BTC_USDT', [['97', '1']], [], 15, 15),
+    ]
+
+    async def scenario():
+        return await run_engine(
+            messages, [], ['BTC'], snapshot_fetcher,
+            until=lambda store: getattr(store.get('gate', 'BTC/USDT'), 'sequence', None) == 200
+        )
+
+    store, _, _ = asyncio.run(scenario())
+    book = store.get('gate', 'BTC/USDT')
+    assert requested == ['BTC/USDT']
+    assert book.valid
+    # Boşluktan sonraki güncelleme uygulanmamış, defter anlık görüntüden kurulmuştur
+    assert book.levels('bids') == [(98.0, 5.0)]
+    assert book.levels('asks') == [(103.0, 6.0)]
+
+
+def test_mexc_depth_message_parsing():
+    messages = [
+        {'c': 'spot@public.limit.depth.v3.api@ETHUSDT@20', 's': 'ETHUSDT', 't': 1700000000000,
+         'd': {'bids': [{'p': '2000.5', 'v': '1.2'}, {'p': '2000.1', 'v': '3'}],
+               'asks': [{'p': '2001', 'v': '0.7'}], 'e': 'spot@public.limit.depth.v3.api', 'r': '3407459756'}},
+        # Abonelik yanıtı ve başka kanallar yok sayılır
+        {'id': 0, 'code': 0, 'msg': 'spot@public.limit.depth.v3.api@ETHUSDT@20'},
+    ]
+
+    async def scenario():
+        return await run_engine(
+            [], messages, ['ETH'], until=lambda store: store.get('mexc', 'ETH/USDT') is not None
+        )
+
+    store, _, mexc = asyncio.run(scenario())
+    book = store.get('mexc', 'ETH/USDT')
+    assert book.sequence == 3407459756
+    assert book.levels('bids') == [(2000.5, 1.2), (2000.1, 3.0)]
+    assert book.levels('asks') == [(2001.0, 0.7)]
+    assert mexc.received[0] == {'method': 'SUBSCRIPTION', 'params': ['spot@public.limit.depth.v3.api@ETHUSDT@20']}
+
+
+def test_stop_cancels_pending_resync():
+    async def scenario():
+        fetch_started = asyncio.Event()
+
+        async def hanging_fetcher(symbol):
+            fetch_started.set()
+            await asyncio.Event().wait()
+
+        gate = ScriptedWebSocketServer([gate_update('BTC_USDT', [['100', '1']], [], 5, 6)])  # Görüntüsüz artımlı güncelleme
+        mexc = ScriptedWebSocketServer([])
+        engine = bot.StreamingQuoteEngine(
+            bot.OrderBookStore(), gate_url=await gate.start(), mexc_url=await mexc.start(),
+            snapshot_fetcher=hanging_fetcher
+        )
+        try:
+            await engine.start(['BTC'])
+            await asyncio.wait_for(fetch_started.wait(), 2)
+            tasks = set(engine.resync_tasks)
+            await engine.stop()
+        finally:
+            await gate.stop()
+            await mexc.stop()
+        return tasks, engine
+
+    tasks, engine = asyncio.run(scenario())
+    assert len(tasks) == 1 and all(task.cancelled() for task in tasks)
+    assert not engine.resync_tasks and not engine.resyncing
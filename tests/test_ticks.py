@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import bot
+
+
+def record_books(recorder, count):
+    """Gate.io ve MEXC için sırayla defter görüntüleri kaydeder; beklenen kayıtları döndürür"""
+    expected = []
+    for i in range(count):
+        exchange = ('gate', 'mexc')[i % 2]
+        coin = ('AAA', 'BBB')[i % 3 == 0]
+        bids = [(100.0 - i - k, 0.5 * (k + 1)) for k in range(1 + i % 3)]
+        asks = [(101.0 + i + k, 0.25 * (k + 1)) for k in range(3)]
+        recorder.record(exchange, coin, bids, asks, ts=1000.0 + i)
+        expected.append({'ts': 1000.0 + i, 'exchange': exchange, 'coin': coin,
+                         'bids': [list(level) for level in bids], 'asks': [list(level) for level in asks]})
+    return expected
+
+
+def test_recorded_ticks_round_trip_across_segments(tmp_path):
+    recorder = bot.TickRecorder(str(tmp_path), depth=3, buffer_size=4,
+                                segment_bytes=bot.tick_dtype(3).itemsize * 5)
+    expected = record_books(recorder, 23)
+    recorder.record_ticker('gate', 'AAA', {'bid': 9.5, 'bidVolume': None, 'ask': 10.5, 'askVolume': 2.0})
+    recorder.close()
+
+    reader = bot.TickReader(str(tmp_path))
+    segments = reader.segments()
+    assert len(segments) > 1  # Boyut sınırında yeni segmente geçildi
+    assert isinstance(reader.map_segment(segments[0][1]), np.memmap)
+
+    books = list(reader.iter_books())
+    assert books == expected
+
+    ticks = reader.read()
+    assert len(ticks) == len(expected) + 1
+    assert np.all(np.diff(ticks['ts']) >= 0)
+    ticker = reader.read(kind=bot.TickRecorder.TICKER)
+    assert ticker['bid_price'][0][0] == 9.5 and np.isnan(ticker['bid_amount'][0][0])
+    assert np.isnan(ticker['ask_price'][0][1:]).all()
+
+
+def test_reader_filters_by_coin_exchange_and_time(tmp_path):
+    recorder = bot.TickRecorder(str(tmp_path), depth=3, buffer_size=4,
+                                segment_bytes=bot.tick_dtype(3).itemsize * 5)
+    expected = record_books(recorder, 23)
+    recorder.close()
+
+    reader = bot.TickReader(str(tmp_path))
+    window = [book for book in expected if book['coin'] == 'AAA' and 1006.0 <= book['ts'] < 1017.0]
+    assert list(reader.iter_books(coin='AAA', start=1006.0, end=1017.0)) == window
+
+    mexc = reader.read(coin='BBB', exchange='mexc')
+    assert mexc['ts'].tolist() == [book['ts'] for book in expected if (book['coin'], book['exchange']) == ('BBB', 'mexc')]
+    assert len(reader.read(coin='ZZZ')) == 0
+    assert len(reader.read(start=2000.0)) == 0
+
+
+def test_recorder_rejects_directory_with_other_depth(tmp_path):
+    recorder = bot.TickRecorder(str(tmp_path), depth=3)
+    recorder.record('gate', 'AAA', [(1.0, 1.0)], [(2.0, 1.0)], ts=1.0)
+    recorder.close()
+    with pytest.raises(ValueError, match='kademe'):
+        bot.TickRecorder(str(tmp_path), depth=5)
@@ -0,0 +1,105 @@
+import asyncio
+
+import ccxt.async_support as ccxt
+import pytest
+
+import bot
+
+
+class ScriptedLedger:
+    """Her sorguda senaryodaki bir sonraki yanıtı döndüren borsa (son yanıt tekrarlanır); Exception fırlatılır"""
+
+    def __init__(self, exchange_id, withdrawals=(), deposits=(), orders=()):
+        self.id = exchange_id
+        self.scripts = {'withdrawals': list(withdrawals), 'deposits': list(deposits), 'orders': list(orders)}
+        self.calls = {name: 0 for name in self.scripts}
+
+    def next(self, name):
+        script = self.scripts[name]
+        self.calls[name] += 1
+        result = script.pop(0) if len(script) > 1 else script[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def fetch_withdrawals(self, code=None, since=None):
+        return self.next('withdrawals')
+
+    async def fetch_deposits(self, code=None, since=None):
+        return self.next('deposits')
+
+    async def fetch_order(self, order_id, symbol=None):
+        return self.next('orders')
+
+
+def watcher(**options):
+    return bot.TransferWatcher(**{'initial_delay': 0.001, 'max_delay': 0.001, 'timeout': 5, **options})
+
+
+def test_deposit_is_matched_to_withdrawal_by_txid():
+    withdrawal = {'id': 'w1', 'txid': None, 'timestamp': 0}
+    source = ScriptedLedger('gate', withdrawals=[
+        [{'id': 'w1', 'txid': None, 'status': 'pending'}],
+        ccxt.NetworkError("geçici"),
+        [{'id': 'w0', 'txid': '0xAAA', 'status': 'ok'}, {'id': 'w1', 'txid': '0xABC', 'status': 'pending'}],
+    ])
+    destination = ScriptedLedger('mexc', deposits=[
+        [{'id': 'd0', 'txid': 'aaa', 'status': 'ok'}],
+        [{'id': 'd0', 'txid': 'aaa', 'status': 'ok'}, {'id': 'd1', 'txid': 'abc', 'status': 'pending'}],
+        [{'id': 'd0', 'txid': 'aaa', 'status': 'ok'}, {'id': 'd1', 'txid': 'ABC', 'status': 'ok', 'amount': 9.9}],
+    ])
+    seen = []
+
+    deposit = asyncio.run(watcher().wait_for_credit(source, destination, 'AAA', withdrawal, on_txid=seen.append))
+    # txid yalnızca çekim kaydında görününce öğrenilir; başka transferin yatırması eşleşmez
+    assert deposit['id'] == 'd1' and deposit['amount'] == 9.9
+    assert seen == ['abc']
+    assert destination.calls['deposits'] == 3
+
+
+def test_failed_withdrawal_stops_watching_immediately():
+    source = ScriptedLedger('gate', withdrawals=[[{'id': 'w1', 'txid': '0x1', 'status': 'failed'}]])
+    destination = ScriptedLedger('mexc', deposits=[[]])
+    with pytest.raises(RuntimeError, match='başarısız'):
+        asyncio.run(watcher().wait_for_credit(source, destination, 'AAA', {'id': 'w1', 'txid': '0x1'}))
+    assert source.calls['withdrawals'] == 1
+
+
+def test_transfer_times_out_when_deposit_never_arrives():
+    source = ScriptedLedger('gate', withdrawals=[[{'id': 'w1', 'txid': '0x1', 'status': 'pending'}]])
+    destination = ScriptedLedger('mexc', deposits=[[{'id': 'd1', 'txid': '0x1', 'status': 'pending'}]])
+    with pytest.raises(RuntimeError, match='zaman aşımına uğradı'):
+        asyncio.run(watcher(timeout=0.05).wait_for_credit(source, destination, 'AAA', {'id': 'w1', 'txid': '0x1'}))
+    assert destination.calls['deposits'] > 1
+
+
+def test_order_tracker_polls_until_partial_fill_closes():
+    tracker = bot.OrderTracker(initial_delay=0.001, max_delay=0.001, timeout=5)
+    exchange = ScriptedLedger('gate', orders=[
+        {'id': 'o1', 'status': 'open', 'filled': 2.0, 'cost': 20.0},
+        ccxt.NetworkError("geçici"),
+        {'id': 'o1', 'status': 'canceled', 'filled': 4.0, 'cost': 41.0,
+         'fees': [{'currency': 'AAA', 'cost': 0.004}, {'currency': 'USDT', 'cost': 0.01}]},
+    ])
+    fill = asyncio.run(tracker.wait_for_fill(exchange, {'id': 'o1', 'status': 'open'}, 'AAA/USDT'))
+    assert fill['status'] == 'canceled'
+    assert fill['filled'] == 4.0 and fill['average'] == pytest.approx(10.25)
+    assert fill['net_base'] == pytest.approx(3.996)
+    assert fill['net_quote'] == pytest.approx(40.99)
+    assert exchange.calls['orders'] == 3
+
+
+def test_order_tracker_returns_last_state_on_timeout():
+    tracker = bot.OrderTracker(initial_delay=0.001, max_delay=0.001, timeout=0.02)
+    exchange = ScriptedLedger('gate', orders=[{'id': 'o1', 'status': 'open', 'filled': 1.5, 'cost': 15.0,
+                                               'fee': {'currency': 'USDT', 'cost': 0.015}}])
+    fill = asyncio.run(tracker.wait_for_fill(exchange, {'id': 'o1', 'status': 'open'}, 'AAA/USDT'))
+    assert fill['status'] == 'open' and fill['filled'] == 1.5
+    assert fill['net_quote'] == pytest.approx(14.985)
+
+    # Oluşturma yanıtında kapalı gelen emir hiç sorgulanmaz
+    calls = exchange.calls['orders']
+    closed = asyncio.run(tracker.wait_for_fill(exchange, {'id': 'o2', 'status': 'closed', 'filled': 1.0, 'cost': 10.0},
+                                               'AAA/USDT'))
+    assert closed['average'] == 10.0
+    assert exchange.calls['orders'] == calls